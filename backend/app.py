@@ -1,12 +1,53 @@
+import time
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from backend.routes.mood_routes import router as mood_router
 from backend.routes.spotify_auth_routes import router as spotify_auth_router
 from backend.routes.spotify_search_routes import router as spotify_search_router
-from backend.routes.spotify_recommend_v3_routes import router as rec_v3_router
+from backend.routes.spotify_recommend_v3_routes import router as rec_v3_router, LANGSEARCH
+from backend.utils.spotify_client import close_http_client, token_manager
+from backend.utils.inference_executor import inference_executor
+from backend.utils.track_crawler import TrackCrawler, TRACK_CRAWL
+from backend.utils.track_index import track_index
+from backend.utils.metrics import render as render_metrics, HTTP_REQUEST_SECONDS
+from backend.utils.audio_ingest import UploadSizeLimitMiddleware, MAX_UPLOAD_BYTES, MAX_BATCH_UPLOAD_BYTES
 
-app = FastAPI()
+# ---------------------------------------------------------
+# LIFESPAN (shared resources opened/closed once per worker)
+# ---------------------------------------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    inference_executor.start()
+    # warm the pool in the background; /ready reports when it is done
+    warmup = asyncio.create_task(inference_executor.warmup())
+    token_manager.start()
+    crawler = TrackCrawler(LANGSEARCH)
+    if TRACK_CRAWL:
+        crawler.start()
+    yield
+    await crawler.stop()
+    warmup.cancel()
+    await token_manager.stop()
+    inference_executor.shutdown()
+    await close_http_client()
+
+app = FastAPI(lifespan=lifespan)
+
+# Reject oversize uploads before the multipart body is spooled (added before
+# CORS so CORS wraps it and the 413/400 carry the CORS headers)
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    limits={
+        # room for the multipart envelope around the file
+        "/predict_audio": MAX_UPLOAD_BYTES + 64 * 1024,
+        "/predict_audio_timeline": MAX_UPLOAD_BYTES + 64 * 1024,
+        "/predict_audio_batch": MAX_BATCH_UPLOAD_BYTES + 64 * 1024,
+    },
+)
 
 # ---------------------------------------------------------
 # CORS MIDDLEWARE (Required for frontend communication)
@@ -19,6 +60,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency by matched route template (not raw path)
+@app.middleware("http")
+async def record_latency(request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - start,
+        route=route.path if route else "unmatched",
+        method=request.method,
+        status=response.status_code,
+    )
+    return response
+
 # ---------------------------------------------------------
 # ROUTERS
 # ---------------------------------------------------------
@@ -30,3 +85,21 @@ app.include_router(rec_v3_router)
 @app.get("/")
 def root():
     return {"message": "MoodCast backend is running"}
+
+@app.get("/ready")
+def ready():
+    if not inference_executor.ready:
+        return JSONResponse(
+            {"ready": False, "error": inference_executor.warmup_error},
+            status_code=503,
+        )
+    return {"ready": True, "models": inference_executor.model_info}
+
+@app.get("/track_index/stats")
+def track_index_stats():
+    return track_index.stats()
+
+@app.get("/metrics")
+def metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
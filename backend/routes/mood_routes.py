@@ -1,66 +1,281 @@
-from fastapi import APIRouter, UploadFile, File
-import shutil
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
+import asyncio
+import hashlib
+import json
 import os
-import tempfile
-import librosa
-import soundfile as sf
+import time
 
-from backend.utils.inference import run_inference
-from backend.utils.language_detection import detect_language
+from backend.utils.audio_ingest import (
+    INGEST_MODE, MAX_UPLOAD_BYTES, probe_stream, decode_window_stream, save_upload,
+)
+from backend.utils.audio_window import (
+    window_features, choose_window, load_window, load_middle_window, MAX_SECONDS, TARGET_SR,
+)
+from backend.utils.cache import make_cache
+from backend.utils.inference import predict_window_batch
+from backend.utils.inference_executor import inference_executor, Overloaded, predict_timeline_chunk
+from backend.utils.language_detection import language_service, UNKNOWN
+from backend.utils.metrics import timed, PREDICT_STAGE_SECONDS
+from backend.utils.timeline import plan_windows, chunk_jobs, aggregate, TIMELINE_MAX_SECONDS
 
 router = APIRouter()
 
-MAX_SECONDS = 10
+# Results memoized by upload content + window + model version; persisted to
+# sqlite by default so a restart keeps them
+result_cache = make_cache("RESULT_CACHE", default_ttl=30 * 24 * 3600, default_entries=50000,
+                          default_bytes=64 * 1024 * 1024, default_backend="sqlite")
+
+def upload_digest(file: UploadFile) -> str:
+    # hash the spooled upload without copying it anywhere
+    h = hashlib.sha256()
+    for chunk in iter(lambda: file.file.read(1024 * 1024), b""):
+        h.update(chunk)
+    file.file.seek(0)
+    return h.hexdigest()
+
+def result_key(digest: str) -> Optional[str]:
+    # keyed on the models the workers loaded, not the files on disk (a
+    # deploy replaces those before any worker picks them up); None, so no
+    # caching, until the workers have reported a version
+    version = inference_executor.model_version
+    return f"result:{digest}:{MAX_SECONDS}s@{TARGET_SR}:{version}" if version else None
+
+def cacheable(result) -> bool:
+    # "unknown" language means the detector timed out, was busy or failed;
+    # that's transient, so don't pin it to the upload for the cache TTL
+    return result.get("language") != UNKNOWN[0]
+
+def overloaded(e: Overloaded):
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+def undecodable():
+    return HTTPException(status_code=415, detail="unsupported or corrupt audio file")
+
+async def decode_streamed(file: UploadFile):
+    # header probe + windowed decode straight from the spooled upload; None
+    # when libsndfile can't read the container (caller falls back to /tmp)
+    t = time.perf_counter()
+    total_duration = await run_in_threadpool(probe_stream, file.file)
+    if total_duration is None:
+        return None
+    timings = {"probe": time.perf_counter() - t}
+
+    offset, duration = choose_window(total_duration)
+    t = time.perf_counter()
+    try:
+        y, sr = await run_in_threadpool(decode_window_stream, file.file, offset, duration)
+    except Exception:
+        raise undecodable()
+    if len(y) == 0:
+        raise undecodable()
+    timings["decode"] = time.perf_counter() - t
+    return y, sr, offset, duration, timings
+
+async def decode_copied(file: UploadFile):
+    with timed(PREDICT_STAGE_SECONDS, stage="upload_copy"):
+        temp_path = await run_in_threadpool(save_upload, file)
+    t = time.perf_counter()
+    try:
+        # probe + decode in the process pool (any format librosa reads); the
+        # window comes back so language detection can share it
+        y, sr, offset, duration = await inference_executor.call(load_middle_window, temp_path)
+    except Overloaded:
+        raise
+    except Exception:
+        raise undecodable()
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    if len(y) == 0:
+        raise undecodable()
+    return y, sr, offset, duration, {"decode": time.perf_counter() - t}
+
+async def detect_language_timed(y, sr):
+    with timed(PREDICT_STAGE_SECONDS, stage="language"):
+        return await language_service.detect(y, sr)
+
+async def predict_decoded(y, sr, offset, duration, timings):
+    # language detection overlaps features + forests on the same waveform
+    language = asyncio.create_task(detect_language_timed(y, sr))
+    try:
+        result, _ = await inference_executor.predict_waveform(y, sr, timings)
+    except BaseException:
+        language.cancel()
+        raise
+    with timed(PREDICT_STAGE_SECONDS, stage="language_wait"):
+        lang, lang_conf = await language
+    result["used_duration_seconds"] = round(duration, 2)
+    result["offset_seconds"] = round(offset, 2)
+    result["language"] = lang
+    result["language_confidence"] = lang_conf
+    return result
 
 @router.post("/predict_audio")
 async def predict_audio(file: UploadFile = File(...)):
-    trimmed_path = None
+    # hashing the upload and the sqlite cache both block, so neither runs
+    # on the event loop
+    with timed(PREDICT_STAGE_SECONDS, stage="hash"):
+        key = result_key(await run_in_threadpool(upload_digest, file))
+    if key is not None:
+        with timed(PREDICT_STAGE_SECONDS, stage="cache_lookup"):
+            cached = await result_cache.aget(key)
+        if cached is not None:
+            return cached
 
-    # Save upload to /tmp
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3", dir="/tmp") as tmp:
-        shutil.copyfileobj(file.file, tmp)
-        temp_path = tmp.name
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"upload larger than {MAX_UPLOAD_BYTES} bytes")
 
     try:
-        # Fast duration check (no full decode)
-        total_duration = librosa.get_duration(path=temp_path)
-
-        # Choose middle window
-        if total_duration <= MAX_SECONDS:
-            offset = 0.0
-            duration = total_duration
-        else:
-            offset = max(0.0, (total_duration / 2) - (MAX_SECONDS / 2))
-            duration = MAX_SECONDS
-
-        # Load ONLY selected window
-        y, sr = librosa.load(
-            temp_path,
-            sr=22050,
-            mono=True,
-            offset=offset,
-            duration=duration
-        )
-
-        # Write trimmed audio
-        trimmed_path = temp_path + "_trimmed.wav"
-        sf.write(trimmed_path, y, sr)
-
-        # Language (stubbed)
-        lang, lang_conf = detect_language(trimmed_path)
-
-        # ML inference
-        result = run_inference(trimmed_path)
-
-        result["language"] = lang
-        result["language_confidence"] = lang_conf
-        result["used_duration_seconds"] = round(duration, 2)
-        result["offset_seconds"] = round(offset, 2)
+        decoded = await decode_streamed(file) if INGEST_MODE == "stream" else None
+        if decoded is None:
+            decoded = await decode_copied(file)
+        result = await predict_decoded(*decoded)
+    except Overloaded as e:
+        raise overloaded(e)
+
+    if key is not None and cacheable(result):
+        await result_cache.aset(key, result)
+    return result
 
+async def decode_track(file: UploadFile):
+    # whole track (up to TIMELINE_MAX_SECONDS) decoded once at TARGET_SR
+    total = await run_in_threadpool(probe_stream, file.file) if INGEST_MODE == "stream" else None
+    if total is not None:
+        try:
+            y, sr = await run_in_threadpool(decode_window_stream, file.file, 0.0, min(total, TIMELINE_MAX_SECONDS))
+        except Exception:
+            raise undecodable()
+    else:
+        temp_path = await run_in_threadpool(save_upload, file)
+        try:
+            y, sr = await inference_executor.call(load_window, temp_path, 0.0, TIMELINE_MAX_SECONDS)
+        except Overloaded:
+            raise
+        except Exception:
+            raise undecodable()
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    if len(y) == 0:
+        raise undecodable()
+    return y, sr
+
+def timeline_events(result, tasks=None, language=None):
+    # ("window", point)... then ("aggregate", summary); from worker tasks as
+    # they finish in track order, or replayed from a cached result
+    async def gen():
+        if tasks is None:
+            for p in result["timeline"]:
+                yield "window", p
+            yield "aggregate", dict(result["aggregate"], duration_seconds=result["duration_seconds"])
+            return
+        try:
+            for task in tasks:
+                points, _ = await task
+                for p in points:
+                    result["timeline"].append(p)
+                    yield "window", p
+            lang, lang_conf = await language
+        except BaseException:
+            # failed or client went away: drop whatever is still queued
+            for task in tasks + [language]:
+                task.cancel()
+            raise
+        result["aggregate"] = dict(aggregate(result["timeline"]), language=lang, language_confidence=lang_conf)
+        yield "aggregate", dict(result["aggregate"], duration_seconds=result["duration_seconds"])
+    return gen()
+
+@router.post("/predict_audio_timeline")
+async def predict_audio_timeline(
+    file: UploadFile = File(...),
+    window: float = Query(MAX_SECONDS, ge=2, le=60),
+    hop: float = Query(None, ge=0.5, le=60),
+    stream: str = Query("none", pattern="^(none|ndjson|sse)$"),
+):
+    # Sliding-window valence/arousal over the whole track plus an aggregate.
+    # stream=ndjson|sse sends each window as soon as its chunk is done.
+    hop = hop or window / 2
+    digest = await run_in_threadpool(upload_digest, file)
+    version = inference_executor.model_version
+    key = f"timeline:{digest}:{window}:{hop}:{TARGET_SR}:{version}" if version else None
+    cached = await result_cache.aget(key) if key else None
+    tasks = language = None
+    if cached is not None:
+        result = cached
+    else:
+        if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"upload larger than {MAX_UPLOAD_BYTES} bytes")
+        try:
+            y, sr = await decode_track(file)
+            duration = len(y) / sr
+            starts, win = plan_windows(duration, window, hop)
+            tasks = inference_executor.submit_many(predict_timeline_chunk, chunk_jobs(y, sr, starts, win))
+            # language once per track, from the middle window, alongside the chunks
+            lang_offset, lang_duration = choose_window(duration)
+            language = asyncio.create_task(detect_language_timed(
+                y[int(lang_offset * sr):int((lang_offset + lang_duration) * sr)], sr))
+        except Overloaded as e:
+            raise overloaded(e)
+        result = {"duration_seconds": round(duration, 2), "window_seconds": round(win, 2),
+                  "hop_seconds": hop, "timeline": []}
+
+    events = timeline_events(result, tasks, language)
+
+    if stream == "none":
+        try:
+            async for _ in events:
+                pass
+        except Overloaded as e:
+            raise overloaded(e)
+        if key and tasks is not None and cacheable(result["aggregate"]):
+            await result_cache.aset(key, result)
         return result
 
+    async def body():
+        async for kind, data in events:
+            if stream == "sse":
+                yield f"event: {kind}\ndata: {json.dumps(data)}\n\n"
+            else:
+                yield json.dumps(dict(data, type=kind)) + "\n"
+        if key and tasks is not None and cacheable(result["aggregate"]):
+            await result_cache.aset(key, result)
+
+    media = "text/event-stream" if stream == "sse" else "application/x-ndjson"
+    return StreamingResponse(body(), media_type=media)
+
+@router.post("/predict_audio_batch")
+async def predict_audio_batch(files: List[UploadFile] = File(...)):
+    temp_paths = []
+
+    try:
+        for f in files:
+            temp_paths.append(await run_in_threadpool(save_upload, f))
+
+        # features extracted in parallel by the pool, then one scaler/predict
+        # pass per model
+        try:
+            extracted = await inference_executor.map(window_features, temp_paths)
+            results = await inference_executor.call(predict_window_batch, extracted)
+        except Overloaded as e:
+            raise overloaded(e)
+
+        for f, result in zip(files, results):
+            result["filename"] = f.filename
+
+        return {"count": len(results), "results": results}
+
     finally:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-        if trimmed_path and os.path.exists(trimmed_path):
-            os.remove(trimmed_path)
+        for p in temp_paths:
+            if os.path.exists(p):
+                os.remove(p)
+
+@router.get("/predict_audio/cache_stats")
+def predict_cache_stats():
+    return result_cache.stats()
+
+@router.get("/inference/stats")
+def inference_stats():
+    return inference_executor.stats()
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Request
 from fastapi.responses import RedirectResponse, JSONResponse
-from backend.utils.spotify_client import build_auth_url, save_user_token
-import requests
+from backend.utils.spotify_client import build_auth_url, save_user_token, exchange_code_for_token, Throttled
+import httpx
 import os
 from dotenv import load_dotenv
 
@@ -13,7 +13,7 @@ def login():
     return {"auth_url": build_auth_url()}
 
 @router.get("/callback")
-def callback(request: Request):
+async def callback(request: Request):
     # Spotify sends ?code=...&state=...
     code = request.query_params.get("code")
     error = request.query_params.get("error")
@@ -23,17 +23,13 @@ def callback(request: Request):
         return JSONResponse({"error": "no_code"}, status_code=400)
 
     # Exchange code for tokens
-    from backend.utils.spotify_client import CLIENT_ID, CLIENT_SECRET, REDIRECT_URI
-    resp = requests.post(
-        "https://accounts.spotify.com/api/token",
-        data={
-            "grant_type": "authorization_code",
-            "code": code,
-            "redirect_uri": REDIRECT_URI,
-            "client_id": CLIENT_ID,
-            "client_secret": CLIENT_SECRET
-        }
-    )
+    try:
+        resp = await exchange_code_for_token(code)
+    except httpx.HTTPError as e:
+        return JSONResponse({"error": "token_exchange_failed", "detail": str(e)}, status_code=500)
+    except Throttled as e:
+        return JSONResponse({"error": "rate_limited", "detail": str(e)}, status_code=503,
+                            headers={"Retry-After": str(max(1, int(e.retry_after + 0.5)))})
     if resp.status_code != 200:
         return JSONResponse({"error": "token_exchange_failed", "detail": resp.text}, status_code=500)
 
@@ -1,12 +1,26 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional
-import requests
+import numpy as np
 import shutil
+import re
 import os
+from starlette.concurrency import run_in_threadpool
 
-from backend.utils.spotify_client import get_client_credentials_token
+from backend.utils.spotify_client import get_client_credentials_token, search_many
 from backend.utils.inference import run_inference
+from backend.utils.mood_ranker import score_basic_batch, score_smart_batch
+from backend.utils.ranking import CandidateTable, contains, rank
+from backend.utils.spotify_audio_features import get_audio_features_bulk
+from backend.utils.track_index import track_index
+from backend.utils.singleflight import SingleFlight
+from backend.utils.query_planner import query_planner
+from backend.utils.metrics import timed, RECOMMEND_STAGE_SECONDS
+
+# pure mood requests are answered from the local index when it has at least
+# this many nearby candidates; otherwise live search tops it up
+TRACK_INDEX_CANDIDATES = int(os.getenv("TRACK_INDEX_CANDIDATES", "100"))
+TRACK_INDEX_MIN_CANDIDATES = int(os.getenv("TRACK_INDEX_MIN_CANDIDATES", "60"))
 
 # ---------------------------------------------------------
 # Router with prefix
@@ -42,6 +56,10 @@ class SearchReq(BaseModel):
     artist_names: List[str] = []
     track_names: List[str] = []
     keywords: List[str] = []
+    # text (default) | basic | smart (audio features, needs a user login)
+    scoring: Optional[str] = "text"
+    # ISO country code; restricts index candidates to tracks playable there
+    market: Optional[str] = None
 
 # ---------------------------------------------------------
 # Suggested keywords
@@ -54,114 +72,107 @@ SUGGESTED_KEYWORDS = [
 # ---------------------------------------------------------
 # Query builder
 # ---------------------------------------------------------
-def build_queries(mood, language, genres, artists, tracks, keywords):
+@timed(RECOMMEND_STAGE_SECONDS, stage="build_queries")
+def build_tagged_queries(mood, language, genres, artists, tracks, keywords):
+    # [(template, query)]; the template tag is what the query planner keeps
+    # yield stats on
     qlist = []
     mood = mood.lower().strip() if mood else ""
     lang_word = LANGSEARCH.get(language.lower(), "") if language else ""
 
-    def add(q):
+    def add(template, q):
         q = q.strip()
         if q and q.lower() != "string":
-            qlist.append(q)
+            qlist.append((template, q))
 
     # artists
     for a in artists[:3]:
-        add(f"{a} {mood}")
-        add(f"{a} {lang_word} {mood}")
+        add("artist_mood", f"{a} {mood}")
+        add("artist_lang_mood", f"{a} {lang_word} {mood}")
 
     # tracks
     for t in tracks[:3]:
-        add(f"{t} {mood}")
-        add(f"{t} {lang_word} {mood}")
+        add("track_mood", f"{t} {mood}")
+        add("track_lang_mood", f"{t} {lang_word} {mood}")
 
     # genres
     for g in genres[:3]:
-        add(f"{mood} {g} {lang_word}")
-        add(f"{g} {lang_word}")
+        add("genre_mood_lang", f"{mood} {g} {lang_word}")
+        add("genre_lang", f"{g} {lang_word}")
 
     # keywords
     for kw in keywords[:5]:
-        add(f"{kw} {mood} {lang_word}")
-        add(f"{kw} {lang_word}")
+        add("keyword_mood_lang", f"{kw} {mood} {lang_word}")
+        add("keyword_lang", f"{kw} {lang_word}")
 
     # mood + language combos
     if mood:
-        add(f"{mood} {lang_word} songs")
-        add(f"{mood} songs")
-        add(f"{mood} mix")
+        add("mood_lang_songs", f"{mood} {lang_word} songs")
+        add("mood_songs", f"{mood} songs")
+        add("mood_mix", f"{mood} mix")
 
     if lang_word:
-        add(f"{lang_word} {mood}".strip())
-        add(f"{lang_word} top hits")
+        add("lang_mood", f"{lang_word} {mood}".strip())
+        add("lang_top_hits", f"{lang_word} top hits")
 
     if not qlist:
-        add(f"{mood} songs" if mood else "top hits")
+        add("fallback", f"{mood} songs" if mood else "top hits")
 
-    add("top hits")
+    add("top_hits", "top hits")
 
     # dedupe + limit
     seen = set()
     out = []
-    for q in qlist:
+    for tag, q in qlist:
         if q.lower() not in seen:
             seen.add(q.lower())
-            out.append(q)
+            out.append((tag, q))
         if len(out) >= 10:
             break
 
     return out
 
-# ---------------------------------------------------------
-# Spotify search
-# ---------------------------------------------------------
-def search_tracks(token: str, query: str, limit: int = 25):
-    url = "https://api.spotify.com/v1/search"
-    headers = {"Authorization": f"Bearer {token}"}
-    params = {"q": query, "type": "track", "limit": limit}
-
-    r = requests.get(url, headers=headers, params=params, timeout=10)
-    if r.status_code != 200:
-        return []
-    return r.json().get("tracks", {}).get("items", [])
+def build_queries(mood, language, genres, artists, tracks, keywords):
+    return [q for _, q in build_tagged_queries(mood, language, genres, artists, tracks, keywords)]
 
 # ---------------------------------------------------------
 # Scoring
 # ---------------------------------------------------------
-def score_track(track, mood, language, genres, keywords):
-    name = (track.get("name") or "").lower()
-    artists = " ".join([a.get("name", "").lower() for a in track.get("artists", [])])
-    popularity = track.get("popularity", 0)
-    pop_score = popularity / 100.0
+def text_scorer(mood, language, genres, keywords):
+    # matchers compiled once per request, then applied to every candidate
+    # as NumPy string ops
+    mood = mood.lower()
+    lang_word = LANGSEARCH.get(language.lower(), "")
+    genres = [g.lower() for g in genres]
+    keywords = [kw.lower() for kw in keywords]
 
-    text_score = 0.0
+    def score(table):
+        text_score = np.zeros(len(table))
 
-    if mood.lower() in name or mood.lower() in artists:
-        text_score += 0.35
+        text_score += 0.35 * (contains(table.names, mood) | contains(table.artists, mood))
 
-    lang_word = LANGSEARCH.get(language.lower(), "")
-    if lang_word and lang_word in name:
-        text_score += 0.20
+        if lang_word:
+            text_score += 0.20 * contains(table.names, lang_word)
 
-    for g in genres:
-        if g.lower() in name:
-            text_score += 0.15
+        for g in genres:
+            text_score += 0.15 * contains(table.names, g)
 
-    for kw in keywords:
-        if kw.lower() in name or kw.lower() in artists:
-            text_score += 0.25
+        for kw in keywords:
+            text_score += 0.25 * (contains(table.names, kw) | contains(table.artists, kw))
 
-    if text_score > 1:
-        text_score = 1
+        text_score = np.minimum(text_score, 1)
 
-    return 0.6 * text_score + 0.4 * pop_score
+        return 0.6 * text_score + 0.4 * (table.popularity / 100.0)
 
-def score_and_sort(all_tracks, mood, language, genres, keywords):
-    scored = []
-    for tid, t in all_tracks.items():
-        s = score_track(t, mood, language, genres, keywords)
-        scored.append((s, t))
+    return score
 
-    scored.sort(key=lambda x: x[0], reverse=True)
+@timed(RECOMMEND_STAGE_SECONDS, stage="scoring")
+def score_and_sort(all_tracks, mood, language, genres, keywords, limit=None, scorer=None, features=None):
+    # scorer defaults to the text/popularity blend; any callable(table) ->
+    # scores plugs in (e.g. mood_ranker.score_smart_batch)
+    table = CandidateTable(all_tracks.values(), features)
+    if scorer is None:
+        scorer = text_scorer(mood, language, genres, keywords)
 
     return [{
         "id": t["id"],
@@ -171,7 +182,54 @@ def score_and_sort(all_tracks, mood, language, genres, keywords):
         "preview_url": t.get("preview_url"),
         "score": round(s, 4),
         "popularity": t.get("popularity")
-    } for s, t in scored]
+    } for s, t in rank(table, scorer, limit)]
+
+def mood_targets(req: SearchReq):
+    # valence/arousal come in on the 1-9 model scale, Spotify features are 0-1
+    valence = 5.0 if req.valence is None else req.valence
+    arousal = 5.0 if req.arousal is None else req.arousal
+    return min(max((valence - 1) / 8, 0), 1), min(max((arousal - 1) / 8, 0), 1)
+
+# valence/energy (0-1) for mood words, so a typed mood lands somewhere in the
+# index; multi-word moods ("sad calm", map_mood labels) average their words
+MOOD_WORD_TARGETS = {
+    "happy": (0.85, 0.7), "joyful": (0.9, 0.7), "cheerful": (0.85, 0.65), "upbeat": (0.8, 0.75),
+    "positive": (0.8, 0.5), "energetic": (0.65, 0.9), "party": (0.8, 0.85), "workout": (0.6, 0.9),
+    "dance": (0.75, 0.8), "angry": (0.2, 0.9), "tense": (0.25, 0.8), "aggressive": (0.2, 0.95),
+    "romantic": (0.65, 0.4), "love": (0.7, 0.45), "chill": (0.6, 0.3), "relaxed": (0.65, 0.25),
+    "relaxing": (0.6, 0.2), "calm": (0.5, 0.2), "lofi": (0.5, 0.25), "study": (0.5, 0.25),
+    "acoustic": (0.55, 0.3), "sad": (0.15, 0.3), "melancholic": (0.2, 0.3), "lonely": (0.15, 0.25),
+    "heartbreak": (0.15, 0.35),
+}
+
+def index_target(req: SearchReq):
+    # where a pure mood request sits in the index: a model prediction if one
+    # came in (anything but the neutral 5.0 default), else its mood words;
+    # None when neither places it, and the request goes to live search
+    if (req.valence not in (None, 5.0)) or (req.arousal not in (None, 5.0)):
+        return mood_targets(req)
+    points = [MOOD_WORD_TARGETS[w] for w in re.findall(r"[a-z]+", (req.mood or "").lower())
+              if w in MOOD_WORD_TARGETS]
+    if not points:
+        return None
+    return tuple(float(x) for x in np.mean(points, axis=0))
+
+def stats_bucket(mood, language):
+    # query planner stats are kept per bucket, not per free-text string: the
+    # mood's known words (at most two, sorted), "none" for no mood and "other"
+    # for anything else; languages outside LANGSEARCH share "other"
+    words = sorted({w for w in re.findall(r"[a-z]+", (mood or "").lower()) if w in MOOD_WORD_TARGETS})
+    bucket = " ".join(words[:2]) or ("other" if (mood or "").strip() else "none")
+    language = (language or "none").lower()
+    return bucket, language if language in LANGSEARCH or language == "none" else "other"
+
+def pick_scorer(req: SearchReq):
+    target_valence, target_energy = mood_targets(req)
+    if req.scoring == "smart":
+        return lambda table: score_smart_batch(table, target_valence, target_energy)
+    if req.scoring == "basic":
+        return lambda table: score_basic_batch(table, target_valence, target_energy, req.language)
+    return None
 
 # ---------------------------------------------------------
 # OPTIONS handler for CORS preflight
@@ -183,33 +241,112 @@ async def options_search_by_mood():
 # ---------------------------------------------------------
 # POST: /recommend_v3/search_by_mood
 # ---------------------------------------------------------
+recommend_flight = SingleFlight("recommend_v3")
+
+# fields only ever used lowercased, so case can't change the response; the
+# rest are echoed back (mood_used, queries_used) or matched as given (market
+# against the index, scoring)
+CASE_INSENSITIVE_FIELDS = {"language"}
+
+def request_key(req: SearchReq):
+    # requests that must produce the same response; list order is kept since
+    # build_queries only looks at the first few entries
+    def norm(k, v):
+        if isinstance(v, str) and k in CASE_INSENSITIVE_FIELDS:
+            return v.lower()
+        if isinstance(v, list):
+            return tuple(v)
+        return v
+    return tuple(sorted((k, norm(k, v)) for k, v in req.model_dump().items()))
+
 @router.post("/search_by_mood")
-def search_by_mood(req: SearchReq):
+async def search_by_mood(req: SearchReq):
+    # concurrent identical requests wait on one computation
+    return await recommend_flight.do(request_key(req), recommend, req)
+
+async def recommend(req: SearchReq):
 
     mood = req.mood or ""
     language = req.language or "none"
 
-    queries = build_queries(
+    tagged = build_tagged_queries(
         mood, language,
         req.genres, req.artist_names,
         req.track_names, req.keywords
     )
+    bucket = stats_bucket(mood, language)
+    planned = query_planner.plan(tagged, *bucket)
 
-    token = get_client_credentials_token()
-    if not token:
-        raise HTTPException(status_code=500, detail="Spotify token error")
-
+    # index candidates nearest the requested mood; artist/track/genre/keyword
+    # requests need text matches the index can't judge, so they always search
     all_tracks = {}
-    for q in queries:
-        items = search_tracks(token, q)
-        for t in items:
+    target = index_target(req)
+    if target and not (req.genres or req.artist_names or req.track_names or req.keywords):
+        with timed(RECOMMEND_STAGE_SECONDS, stage="index_lookup"):
+            nearby = await run_in_threadpool(track_index.nearest, *target, k=TRACK_INDEX_CANDIDATES,
+                                             language=language, market=req.market)
+        for t in nearby:
             all_tracks[t["id"]] = t
-
-    results = score_and_sort(all_tracks, mood, language, req.genres, req.keywords)
+    from_index = len(all_tracks)
+
+    found = {}
+    if from_index < TRACK_INDEX_MIN_CANDIDATES:
+        token = await get_client_credentials_token()
+        if not token:
+            raise HTTPException(status_code=500, detail="Spotify token error")
+
+        # highest-yield queries first, all at once (anything past the
+        # deadline is dropped); the rest only if the pool is still thin
+        issue = [q for _, q in planned[:query_planner.budget]]
+        with timed(RECOMMEND_STAGE_SECONDS, stage="live_search"):
+            found = await search_many(token, issue, limit=25)
+            pool = len(all_tracks) + len({t["id"] for items in found.values() for t in items})
+            if pool < query_planner.min_pool and len(planned) > len(issue):
+                extra = [q for _, q in planned[len(issue):]]
+                found.update(await search_many(token, extra, limit=25))
+                issue += extra
+
+        # merged in builder order so ties rank the same however queries were planned
+        live = {}
+        for _, q in tagged:
+            for t in found.get(q, []):
+                live[t["id"]] = t
+        await run_in_threadpool(track_index.add_tracks, list(live.values()), language)
+        all_tracks.update(live)
+        queries = [q for _, q in tagged if q in issue]
+    else:
+        queries = []
+
+    features = None
+    if req.scoring == "smart":
+        with timed(RECOMMEND_STAGE_SECONDS, stage="audio_features"):
+            features, _ = await get_audio_features_bulk(list(all_tracks))
+        await run_in_threadpool(track_index.set_features, features)
+
+    results = score_and_sort(all_tracks, mood, language, req.genres, req.keywords,
+                             limit=30, scorer=pick_scorer(req), features=features)
+
+    if found:
+        await run_in_threadpool(query_planner.record, *bucket,
+                                [(tag, found[q]) for tag, q in tagged if q in found],
+                                [r["id"] for r in results])
 
     return {
         "mood_used": mood,
         "queries_used": queries,
+        "queries_incomplete": [q for q in queries if q not in found],
+        "queries_skipped": [q for _, q in tagged if q not in queries],
+        "index_candidates": from_index,
         "suggested_keywords": SUGGESTED_KEYWORDS,
-        "results": results[:30]
+        "results": results
     }
+
+# ---------------------------------------------------------
+# GET: /recommend_v3/query_stats (planner yield per template)
+# ---------------------------------------------------------
+@router.get("/query_stats")
+def query_stats(mood: Optional[str] = None, language: Optional[str] = None):
+    return query_planner.inspect(
+        stats_bucket(mood, "none")[0] if mood is not None else None,
+        stats_bucket("", language)[1] if language is not None else None,
+    )
@@ -1,21 +1,29 @@
 from fastapi import APIRouter, HTTPException
-import requests
-from backend.utils.spotify_client import get_client_credentials_token
+import httpx
+from backend.utils.spotify_client import get_client_credentials_token, search, api_get, search_cache, Throttled
+from backend.utils.singleflight import singleflight_stats
+from backend.utils.rate_limiter import api_scheduler, accounts_scheduler, retry_after_seconds
 
 router = APIRouter(prefix="/search")
 
+def throttled(e: Throttled):
+    # pass Spotify's back-off on instead of answering with empty results
+    return HTTPException(
+        status_code=503,
+        detail="Spotify rate limit reached, try again shortly",
+        headers={"Retry-After": str(max(1, int(e.retry_after + 0.5)))},
+    )
+
 @router.get("/tracks")
-def search_tracks(query: str):
-    token = get_client_credentials_token()
+async def search_tracks(query: str):
+    token = await get_client_credentials_token()
     if not token:
         raise HTTPException(status_code=500, detail="Failed to get Spotify token")
 
-    url = "https://api.spotify.com/v1/search"
-    headers = {"Authorization": f"Bearer {token}"}
-    params = {"q": query, "type": "track", "limit": 10}
-
-    res = requests.get(url, headers=headers, params=params).json()
-    items = res.get("tracks", {}).get("items", [])
+    try:
+        items = await search(token, query, type="track", limit=10)
+    except Throttled as e:
+        raise throttled(e)
     out = []
     for t in items:
         out.append({
@@ -27,17 +35,15 @@ def search_tracks(query: str):
     return out
 
 @router.get("/artists")
-def search_artists(query: str):
-    token = get_client_credentials_token()
+async def search_artists(query: str):
+    token = await get_client_credentials_token()
     if not token:
         raise HTTPException(status_code=500, detail="Failed to get Spotify token")
 
-    url = "https://api.spotify.com/v1/search"
-    headers = {"Authorization": f"Bearer {token}"}
-    params = {"q": query, "type": "artist", "limit": 10}
-
-    res = requests.get(url, headers=headers, params=params).json()
-    items = res.get("artists", {}).get("items", [])
+    try:
+        items = await search(token, query, type="artist", limit=10)
+    except Throttled as e:
+        raise throttled(e)
     out = []
     for a in items:
         out.append({
@@ -48,16 +54,32 @@ def search_artists(query: str):
     return out
 
 @router.get("/genres")
-def get_genres():
-    token = get_client_credentials_token()
+async def get_genres():
+    token = await get_client_credentials_token()
     if not token:
         raise HTTPException(status_code=500, detail="Failed to get Spotify token")
 
-    url = "https://api.spotify.com/v1/recommendations/available-genre-seeds"
-    headers = {"Authorization": f"Bearer {token}"}
-
-    res = requests.get(url, headers=headers)
+    try:
+        res = await api_get("/recommendations/available-genre-seeds", token)
+    except httpx.HTTPError:
+        return {"error": "Could not fetch genres"}
+    except Throttled as e:
+        raise throttled(e)
+    if res.status_code == 429:
+        raise throttled(Throttled(retry_after_seconds(res)))
     if res.status_code != 200:
         return {"error": "Could not fetch genres"}
 
     return {"genres": res.json().get("genres", [])}
+
+@router.get("/cache_stats")
+def cache_stats():
+    return search_cache.stats()
+
+@router.get("/singleflight_stats")
+def flight_stats():
+    return singleflight_stats()
+
+@router.get("/rate_limit_stats")
+def rate_limit_stats():
+    return {"api": api_scheduler.stats(), "accounts": accounts_scheduler.stats()}
@@ -0,0 +1,101 @@
+import os
+import json
+import tempfile
+import numpy as np
+import soundfile as sf
+from fastapi import HTTPException, UploadFile
+from typing import Optional
+
+from backend.utils.audio_window import TARGET_SR
+from training.extract_features import resample
+
+MAX_UPLOAD_BYTES = int(os.getenv("MOODCAST_MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+MAX_BATCH_UPLOAD_BYTES = int(os.getenv("MOODCAST_MAX_BATCH_UPLOAD_BYTES", str(10 * MAX_UPLOAD_BYTES)))
+# stream: probe headers and decode only the window straight from the upload
+# when libsndfile can read it; copy: always go through a /tmp file
+INGEST_MODE = os.getenv("MOODCAST_INGEST_MODE", "stream")
+
+# ------------------------
+# Request size cap (before the multipart body is parsed/spooled)
+# ------------------------
+class UploadSizeLimitMiddleware:
+    def __init__(self, app, limits: dict):
+        self.app = app
+        self.limits = limits  # path -> max body bytes
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope.get("path")) if scope["type"] == "http" else None
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        for name, value in scope.get("headers", []):
+            if name == b"content-length":
+                if not value.strip().isdigit():
+                    return await _reject(send, 400, "invalid Content-Length header")
+                if int(value) > limit:
+                    return await _reject(send, 413, f"upload larger than {limit} bytes")
+
+        received = 0
+
+        async def limited_receive():
+            # chunked uploads without Content-Length: stop reading at the cap
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(status_code=413, detail=f"upload larger than {limit} bytes")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+async def _reject(send, status: int, detail: str):
+    body = json.dumps({"detail": detail}).encode()
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json"),
+                            (b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+# ------------------------
+# Header probe + windowed decode from a seekable stream
+# ------------------------
+def probe_stream(fileobj) -> Optional[float]:
+    # duration from container headers, or None if libsndfile can't read it
+    try:
+        fileobj.seek(0)
+        return sf.info(fileobj).duration
+    except Exception:
+        return None
+    finally:
+        fileobj.seek(0)
+
+def decode_window_stream(fileobj, offset: float, duration: float, target_sr: int = TARGET_SR):
+    # same samples librosa.load(offset=, duration=, sr=, mono=True) would give,
+    # reading only the frames inside the window
+    fileobj.seek(0)
+    with sf.SoundFile(fileobj) as f:
+        f.seek(int(offset * f.samplerate))
+        data = f.read(frames=int(duration * f.samplerate), dtype="float32", always_2d=True)
+        native_sr = f.samplerate
+    fileobj.seek(0)
+
+    y = np.ascontiguousarray(data.mean(axis=1)) if data.shape[1] > 1 else data[:, 0]
+    return resample(y, native_sr, target_sr), target_sr
+
+# ------------------------
+# Fallback: bounded copy to /tmp (formats only ffmpeg/audioread can read)
+# ------------------------
+def save_upload(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> str:
+    suffix = os.path.splitext(file.filename or "")[1] or ".mp3"
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir="/tmp") as tmp:
+        copied = 0
+        for chunk in iter(lambda: file.file.read(1024 * 1024), b""):
+            copied += len(chunk)
+            if copied > max_bytes:
+                break
+            tmp.write(chunk)
+        path = tmp.name
+    if copied > max_bytes:
+        os.remove(path)
+        raise HTTPException(status_code=413, detail=f"upload larger than {max_bytes} bytes")
+    return path
@@ -0,0 +1,36 @@
+import librosa
+
+from training.extract_features import extract_librosa_features_from_array, load_audio
+
+MAX_SECONDS = 10
+TARGET_SR = 22050
+
+def choose_window(total_duration: float, max_seconds: float = MAX_SECONDS):
+    # middle window of at most max_seconds
+    if total_duration <= max_seconds:
+        return 0.0, total_duration
+    offset = max(0.0, (total_duration / 2) - (max_seconds / 2))
+    return offset, max_seconds
+
+def probe_duration(path: str) -> float:
+    # Fast duration check (no full decode)
+    return librosa.get_duration(path=path)
+
+def load_window(path: str, offset: float, duration: float):
+    # Load ONLY selected window
+    return load_audio(
+        path,
+        sr=TARGET_SR,
+        offset=offset,
+        duration=duration
+    )
+
+def load_middle_window(path: str, max_seconds: float = MAX_SECONDS):
+    offset, duration = choose_window(probe_duration(path), max_seconds)
+    y, sr = load_window(path, offset, duration)
+    return y, sr, offset, duration
+
+def window_features(path: str):
+    # process-pool entry point: decode the middle window and return its features
+    y, sr, offset, duration = load_middle_window(path)
+    return extract_librosa_features_from_array(y, sr), offset, duration
@@ -0,0 +1,327 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Optional
+from starlette.concurrency import run_in_threadpool
+
+from backend.utils.metrics import register_collector
+
+# ------------------------
+# Backends
+# ------------------------
+class MemoryBackend:
+    # in-process LRU with per-entry expiry, capped by entry count and bytes
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._data = OrderedDict()  # key -> (expires_at, nbytes, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, nbytes, value = entry
+            if expires_at < time.time():
+                self._pop(key)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ttl: float, nbytes: int):
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            if nbytes > self.max_bytes:
+                return
+            self._data[key] = (time.time() + ttl, nbytes, value)
+            self._bytes += nbytes
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                self._pop(next(iter(self._data)))
+                self.evictions += 1
+
+    def get_many(self, keys):
+        out = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                out[key] = value
+        return out
+
+    def set_many(self, items, ttl: float):
+        for key, value, nbytes in items:
+            self.set(key, value, ttl, nbytes)
+
+    def _pop(self, key: str):
+        _, nbytes, _ = self._data.pop(key)
+        self._bytes -= nbytes
+
+    def size(self):
+        return {"entries": len(self._data), "bytes": self._bytes, "evictions": self.evictions}
+
+class RedisBackend:
+    # shared store for multi-worker deployments; LRU is left to the server's
+    # maxmemory-policy (e.g. allkeys-lru), expiry to SETEX
+    def __init__(self, url: str, prefix: str = "moodcast:"):
+        import redis  # optional dependency
+        self.prefix = prefix
+        self._r = redis.Redis.from_url(url)
+
+    def get(self, key: str):
+        try:
+            raw = self._r.get(self.prefix + key)
+        except Exception:
+            return None
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value, ttl: float, nbytes: int):
+        try:
+            self._r.setex(self.prefix + key, max(1, int(ttl)), json.dumps(value))
+        except Exception:
+            pass
+
+    def get_many(self, keys):
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        try:
+            raws = self._r.mget([self.prefix + k for k in keys])
+        except Exception:
+            return {}
+        return {k: json.loads(raw) for k, raw in zip(keys, raws) if raw is not None}
+
+    def set_many(self, items, ttl: float):
+        try:
+            pipe = self._r.pipeline(transaction=False)
+            for key, value, _ in items:
+                pipe.setex(self.prefix + key, max(1, int(ttl)), json.dumps(value))
+            pipe.execute()
+        except Exception:
+            pass
+
+    def size(self):
+        return {}
+
+class SqliteBackend:
+    # local on-disk store that survives restarts; same entry/byte caps and
+    # expiry as MemoryBackend, least-recently-used rows are evicted first.
+    # Size is tracked in running counters; eviction only runs once a cap is
+    # crossed and then frees down to EVICT_TO of it in one batch.
+    EVICT_TO = 0.9
+
+    def __init__(self, path: str, max_entries: int = 1024, max_bytes: int = 16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL: commits don't fsync, a crash can only lose the last
+        # few writes, which for a cache is just a miss
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT, nbytes INTEGER, expires_at REAL, last_used REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS cache_last_used ON cache(last_used)")
+        self._recount()
+
+    def _recount(self):
+        self._count, self._bytes = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM cache"
+        ).fetchone()
+
+    def get(self, key: str):
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        # {key: value} for the live keys; expired rows are dropped and hits
+        # touched in one transaction
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        now = time.time()
+        out, expired = {}, []
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                for i in range(0, len(keys), 500):
+                    chunk = keys[i:i + 500]
+                    for key, value, nbytes, expires_at in self._db.execute(
+                        f"SELECT key, value, nbytes, expires_at FROM cache "
+                        f"WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                    ):
+                        if expires_at < now:
+                            expired.append((key, nbytes))
+                        else:
+                            out[key] = json.loads(value)
+                self._db.executemany("DELETE FROM cache WHERE key = ?", [(k,) for k, _ in expired])
+                self._db.executemany("UPDATE cache SET last_used = ? WHERE key = ?", [(now, k) for k in out])
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            self._count -= len(expired)
+            self._bytes -= sum(n for _, n in expired)
+        return out
+
+    def set(self, key: str, value, ttl: float, nbytes: int):
+        self.set_many([(key, value, nbytes)], ttl)
+
+    def set_many(self, items, ttl: float):
+        # items: [(key, value, nbytes)], written in one transaction
+        now = time.time()
+        rows = {key: (key, json.dumps(value), nbytes, now + ttl, now)
+                for key, value, nbytes in items if nbytes <= self.max_bytes}
+        if not rows:
+            return
+        keys = list(rows)
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                replaced = []
+                for i in range(0, len(keys), 500):
+                    chunk = keys[i:i + 500]
+                    replaced += self._db.execute(
+                        f"SELECT nbytes FROM cache WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                    ).fetchall()
+                self._db.executemany("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)", rows.values())
+                self._count += len(rows) - len(replaced)
+                self._bytes += sum(r[2] for r in rows.values()) - sum(r[0] for r in replaced)
+                if self._count > self.max_entries or self._bytes > self.max_bytes:
+                    self._evict(now)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                self._recount()
+                raise
+            self._db.execute("COMMIT")
+
+    def _evict(self, now: float):
+        # other processes may share the file, so start from the real totals
+        self._db.execute("DELETE FROM cache WHERE expires_at < ?", (now,))
+        self._recount()
+        excess_entries = self._count - int(self.max_entries * self.EVICT_TO)
+        excess_bytes = self._bytes - int(self.max_bytes * self.EVICT_TO)
+        if excess_entries <= 0 and excess_bytes <= 0:
+            return
+        victims, freed = [], 0
+        for key, nbytes in self._db.execute("SELECT key, nbytes FROM cache ORDER BY last_used"):
+            if len(victims) >= excess_entries and freed >= excess_bytes:
+                break
+            victims.append((key,))
+            freed += nbytes
+        self._db.executemany("DELETE FROM cache WHERE key = ?", victims)
+        self._count -= len(victims)
+        self._bytes -= freed
+        self.evictions += len(victims)
+
+    def size(self):
+        with self._lock:
+            return {"entries": self._count, "bytes": self._bytes, "evictions": self.evictions}
+
+# ------------------------
+# Cache facade
+# ------------------------
+class Cache:
+    def __init__(self, backend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value, ttl: Optional[float] = None):
+        nbytes = len(json.dumps(value))
+        self.backend.set(key, value, self.ttl if ttl is None else ttl, nbytes)
+
+    # batched variants: one round trip / one transaction for many keys
+    def get_many(self, keys) -> dict:
+        keys = list(dict.fromkeys(keys))
+        found = self.backend.get_many(keys)
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def set_many(self, items: dict, ttl: Optional[float] = None):
+        self.backend.set_many([(k, v, len(json.dumps(v))) for k, v in items.items()],
+                              self.ttl if ttl is None else ttl)
+
+    # async variants for callers on the event loop: sqlite and redis block on
+    # disk / the network, so they run in a thread; the memory LRU is cheaper
+    # than the thread hop and runs inline
+    @property
+    def blocking(self) -> bool:
+        return not isinstance(self.backend, MemoryBackend)
+
+    async def aget(self, key: str):
+        return await run_in_threadpool(self.get, key) if self.blocking else self.get(key)
+
+    async def aset(self, key: str, value, ttl: Optional[float] = None):
+        if self.blocking:
+            await run_in_threadpool(self.set, key, value, ttl)
+        else:
+            self.set(key, value, ttl)
+
+    async def aget_many(self, keys) -> dict:
+        return await run_in_threadpool(self.get_many, keys) if self.blocking else self.get_many(keys)
+
+    async def aset_many(self, items: dict, ttl: Optional[float] = None):
+        if self.blocking:
+            await run_in_threadpool(self.set_many, items, ttl)
+        else:
+            self.set_many(items, ttl)
+
+    def stats(self):
+        total = self.hits + self.misses
+        out = {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+        out.update(self.backend.size())
+        return out
+
+def make_cache(prefix: str, default_ttl: float, default_entries: int, default_bytes: int,
+               default_backend: str = "memory", default_path: Optional[str] = None) -> Cache:
+    # <PREFIX>_BACKEND=memory|sqlite|redis, <PREFIX>_PATH (sqlite file),
+    # <PREFIX>_REDIS_URL, <PREFIX>_TTL, <PREFIX>_MAX_ENTRIES, <PREFIX>_MAX_BYTES
+    ttl = float(os.getenv(f"{prefix}_TTL", str(default_ttl)))
+    kind = os.getenv(f"{prefix}_BACKEND", default_backend).lower()
+    max_entries = int(os.getenv(f"{prefix}_MAX_ENTRIES", str(default_entries)))
+    max_bytes = int(os.getenv(f"{prefix}_MAX_BYTES", str(default_bytes)))
+    if kind == "redis":
+        url = os.getenv(f"{prefix}_REDIS_URL", "redis://127.0.0.1:6379/0")
+        cache = Cache(RedisBackend(url, prefix=f"moodcast:{prefix.lower()}:"), ttl)
+    elif kind == "sqlite":
+        path = os.getenv(f"{prefix}_PATH", default_path or f"/tmp/moodcast_{prefix.lower()}.sqlite")
+        cache = Cache(SqliteBackend(path, max_entries=max_entries, max_bytes=max_bytes), ttl)
+    else:
+        cache = Cache(MemoryBackend(max_entries=max_entries, max_bytes=max_bytes), ttl)
+    caches[prefix.lower()] = cache
+    return cache
+
+caches = {}
+
+@register_collector
+def cache_metrics():
+    yield ("moodcast_cache_hits_total", "counter", "Cache hits",
+           [({"cache": n}, c.hits) for n, c in caches.items()])
+    yield ("moodcast_cache_misses_total", "counter", "Cache misses",
+           [({"cache": n}, c.misses) for n, c in caches.items()])
+
+def normalize_query(query: str) -> str:
+    return " ".join((query or "").lower().split())
@@ -0,0 +1,136 @@
+import os
+import glob
+import json
+import shutil
+import tempfile
+import numpy as np
+
+# Every tree of every forest packed into one set of contiguous node arrays,
+# so valence and arousal are evaluated together in a single vectorized walk.
+# Leaves point at themselves (threshold +inf), so the walk just runs
+# max_depth steps without per-node branching.
+ARRAYS = ["left", "right", "feature", "threshold", "value", "roots"]
+
+class FlatForest:
+    def __init__(self, left, right, feature, threshold, value, roots, forest_sizes, max_depth):
+        self.left = left
+        self.right = right
+        self.feature = feature
+        self.threshold = threshold
+        self.value = value              # (n_nodes, n_outputs of the owning forest, padded)
+        self.roots = roots              # root node index of each tree
+        self.forest_sizes = list(forest_sizes)
+        self.max_depth = int(max_depth)
+        self._starts = np.concatenate([[0], np.cumsum(self.forest_sizes)[:-1]]).astype(np.intp)
+
+    @classmethod
+    def from_forests(cls, forests):
+        # forests: fitted sklearn forest regressors sharing one input space;
+        # outputs are concatenated in order (single-output forests -> 1 column)
+        n_out = sum(f.n_outputs_ for f in forests)
+        left, right, feature, threshold, value, roots = [], [], [], [], [], []
+        offset, col, max_depth = 0, 0, 0
+        for f in forests:
+            for est in f.estimators_:
+                t = est.tree_
+                leaf = t.children_left == -1
+                idx = np.arange(t.node_count)
+                left.append(np.where(leaf, idx, t.children_left) + offset)
+                right.append(np.where(leaf, idx, t.children_right) + offset)
+                feature.append(np.where(leaf, 0, t.feature))
+                threshold.append(np.where(leaf, np.inf, t.threshold))
+                v = np.zeros((t.node_count, n_out))
+                v[:, col:col + f.n_outputs_] = t.value[:, :, 0]
+                value.append(v)
+                roots.append(offset)
+                offset += t.node_count
+                max_depth = max(max_depth, t.max_depth)
+            col += f.n_outputs_
+        return cls(
+            np.concatenate(left).astype(np.int32),
+            np.concatenate(right).astype(np.int32),
+            np.concatenate(feature).astype(np.int32),
+            np.concatenate(threshold).astype(np.float64),
+            np.concatenate(value),
+            np.asarray(roots, dtype=np.int32),
+            [len(f.estimators_) for f in forests],
+            max_depth,
+        )
+
+    def predict(self, X):
+        # X: (n_rows, n_features) -> (n_rows, n_outputs), each forest's
+        # columns averaged over its own trees
+        # sklearn compares float32 inputs against float64 thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.broadcast_to(self.roots, (X.shape[0], len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+
+        leaf_values = self.value[node]                            # (rows, trees, outputs)
+        sums = np.add.reduceat(leaf_values, self._starts, axis=1)  # (rows, forests, outputs)
+        sums /= np.asarray(self.forest_sizes, dtype=np.float64)[None, :, None]
+        return sums.sum(axis=1)
+
+    def save(self, directory: str, version: str):
+        # arrays + meta are written into a fresh sibling directory and
+        # <directory>, a symlink, is switched over with one rename. Processes
+        # with the old arrays mapped keep reading them (files are unlinked,
+        # never truncated); loaders see the old set or the new, never a mix.
+        directory = os.path.abspath(directory)
+        parent, base = os.path.split(directory)
+        os.makedirs(parent, exist_ok=True)
+        target = tempfile.mkdtemp(dir=parent, prefix=f"{base}-")
+        link = target + ".link"
+        try:
+            for name in ARRAYS:
+                np.save(os.path.join(target, f"{name}.npy"), getattr(self, name))
+            # meta last: a directory with meta.json is complete
+            with open(os.path.join(target, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump({"version": version, "forest_sizes": self.forest_sizes,
+                           "max_depth": self.max_depth}, f)
+            os.symlink(os.path.basename(target), link)
+            if os.path.isdir(directory) and not os.path.islink(directory):
+                # plain directory left by an older release
+                shutil.rmtree(directory)
+            os.replace(link, directory)
+        except BaseException:
+            if os.path.lexists(link):
+                os.remove(link)
+            shutil.rmtree(target, ignore_errors=True)
+            raise
+        remove_saved(directory, keep=target)
+
+    @classmethod
+    def load(cls, directory: str, version: str, mmap_mode="r"):
+        # None if missing or built from other model files; mmap'd arrays are
+        # shared through the page cache by every process that maps them.
+        # The link is resolved once so meta and arrays come from one save.
+        try:
+            directory = os.path.realpath(directory)
+            with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") != version:
+                return None
+            arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+                      for name in ARRAYS}
+        except (OSError, ValueError):
+            return None
+        return cls(forest_sizes=meta["forest_sizes"], max_depth=meta["max_depth"], **arrays)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in ARRAYS)
+
+def remove_saved(directory: str, keep: str = None):
+    # complete saves other than `keep`; with no `keep`, the link too
+    directory = os.path.abspath(directory)
+    for path in glob.glob(glob.escape(directory) + "-*"):
+        if path != keep and os.path.exists(os.path.join(path, "meta.json")):
+            shutil.rmtree(path, ignore_errors=True)
+    if keep is None and os.path.lexists(directory):
+        if os.path.islink(directory):
+            os.remove(directory)
+        else:
+            shutil.rmtree(directory, ignore_errors=True)
@@ -1,12 +1,9 @@
-from training.extract_features import extract_librosa_features  
+from training.extract_features import extract_librosa_features_from_array, load_audio
+from backend.utils.audio_window import window_features
 from backend.utils.language_detection import detect_language
-import joblib
+from backend.utils.model_registry import registry
 import numpy as np
 
-model_val = joblib.load("models/valence_model.pkl")
-model_ar = joblib.load("models/arousal_model.pkl")
-scaler = joblib.load("models/scaler.pkl")
-
 def map_mood(v, a):
     if v > 5.4 and a > 5.35:
         return "happy energetic"
@@ -29,23 +26,69 @@ def map_mood(v, a):
     return "neutral"
 
 
-def run_inference(audio_path: str):
-    # features
-    feats = extract_librosa_features(audio_path)
-    feats = feats.reshape(1, -1)
-    feats = scaler.transform(feats)
+def predict_from_feature_matrix(X, timings=None):
+    # X: (n_clips, 68) -> one scaler pass and one predict call per model
+    vals, aros = registry.predict(X, timings)
+
+    return [{
+        "valence": float(v),
+        "arousal": float(a),
+        "mood": map_mood(v, a)
+    } for v, a in zip(vals, aros)]
+
+
+def predict_from_features(feats, timings=None):
+    return predict_from_feature_matrix(feats.reshape(1, -1), timings)[0]
 
-    val = float(model_val.predict(feats)[0])
-    aro = float(model_ar.predict(feats)[0])
-    mood = map_mood(val, aro)
+
+def run_inference_waveform(y, sr: int):
+    # in-memory path: caller already decoded the window, nothing touches disk
+    feats = extract_librosa_features_from_array(y, sr)
+    return predict_from_features(feats)
+
+
+def run_inference(audio_path: str):
+    # one decode shared by features and language detection
+    y, sr = load_audio(audio_path, sr=22050)
+    result = predict_from_features(extract_librosa_features_from_array(y, sr))
 
     # detect language
-    lang, lang_conf = detect_language(audio_path)
-
-    return {
-        "valence": val,
-        "arousal": aro,
-        "mood": mood,
-        "language": lang,                     # important
-        "language_confidence": lang_conf      # important
-    }
+    lang, lang_conf = detect_language(y, sr)
+
+    result["language"] = lang                     # important
+    result["language_confidence"] = lang_conf     # important
+    return result
+
+
+def predict_window_batch(extracted):
+    # extracted: per clip either (features, offset, duration) or an Exception
+    ok = [i for i, e in enumerate(extracted) if not isinstance(e, BaseException)]
+    preds = predict_from_feature_matrix(np.vstack([extracted[i][0] for i in ok])) if ok else []
+
+    results = [None] * len(extracted)
+    for i, pred in zip(ok, preds):
+        _, offset, duration = extracted[i]
+        pred["used_duration_seconds"] = round(duration, 2)
+        pred["offset_seconds"] = round(offset, 2)
+        results[i] = pred
+    for i, e in enumerate(extracted):
+        if isinstance(e, BaseException):
+            results[i] = {"error": str(e) or type(e).__name__}
+
+    return results
+
+
+def run_inference_batch(audio_paths):
+    # middle-window features clip by clip, then a single vectorized predict
+    # over the stacked matrix. Sequential on purpose: from the server it runs
+    # as one job on the shared pool (inference_executor.call), which keeps it
+    # under admission control; /predict_audio_batch fans out per clip with
+    # inference_executor.map instead.
+    extracted = []
+    for p in audio_paths:
+        try:
+            extracted.append(window_features(p))
+        except Exception as e:
+            extracted.append(e)
+
+    return predict_window_batch(extracted)
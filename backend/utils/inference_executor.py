@@ -0,0 +1,272 @@
+import os
+import time
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from backend.utils.audio_window import choose_window, probe_duration, load_window
+from training.extract_features import extract_librosa_features_from_array, windowed_features
+from backend.utils.metrics import register_collector, PREDICT_STAGE_SECONDS
+
+INFERENCE_WORKERS = int(os.getenv("MOODCAST_INFERENCE_WORKERS", str(os.cpu_count() or 1)))
+# jobs allowed in flight (running + waiting) before new uploads are rejected
+INFERENCE_MAX_PENDING = int(os.getenv("MOODCAST_INFERENCE_MAX_PENDING", str(INFERENCE_WORKERS * 4)))
+# forkserver: models are loaded once in the server (model_preload) and shared
+# copy-on-write by every worker; spawn gives each worker a private copy
+INFERENCE_START_METHOD = os.getenv("MOODCAST_INFERENCE_START_METHOD", "forkserver")
+
+STAGES = ["probe", "decode", "features", "predict"]
+# breakdown of "predict" reported by the registry (scaler, then both forests,
+# the flattened pair or a joint multi-output model)
+PREDICT_STEPS = ["predict_scale", "predict_valence", "predict_arousal", "predict_forest", "predict_joint"]
+
+class Overloaded(Exception):
+    pass
+
+class WorkerCrashed(Overloaded):
+    # a worker died under this job (it or a job next to it); the pool is
+    # replaced but the job isn't replayed, a crashing upload would only take
+    # the new pool down too. Callers answer it like Overloaded (503, retry)
+    pass
+
+# ------------------------
+# Worker side (runs in the pool processes)
+# ------------------------
+def _worker_init():
+    # models are normally inherited from the forkserver; this loads them if
+    # not and runs the warmup prediction before the worker takes real jobs
+    from backend.utils.model_registry import registry
+    try:
+        registry.warmup()
+    except Exception as e:
+        print("inference worker warmup failed:", e)
+
+def warmup_worker():
+    from backend.utils.model_registry import registry
+    return registry.warmup()
+
+def predict_file(path: str):
+    from backend.utils.inference import predict_from_features
+
+    timings = {}
+    t = time.perf_counter()
+
+    offset, duration = choose_window(probe_duration(path))
+    timings["probe"], t = time.perf_counter() - t, time.perf_counter()
+
+    y, sr = load_window(path, offset, duration)
+    timings["decode"], t = time.perf_counter() - t, time.perf_counter()
+
+    feats = extract_librosa_features_from_array(y, sr)
+    timings["features"], t = time.perf_counter() - t, time.perf_counter()
+
+    steps = {}
+    result = predict_from_features(feats, steps)
+    timings["predict"] = time.perf_counter() - t
+    timings.update(steps)
+
+    result["used_duration_seconds"] = round(duration, 2)
+    result["offset_seconds"] = round(offset, 2)
+    return result, timings
+
+def predict_waveform(y, sr: int):
+    # window already decoded by the caller (streaming ingest)
+    from backend.utils.inference import predict_from_features
+
+    timings = {}
+    t = time.perf_counter()
+
+    feats = extract_librosa_features_from_array(y, sr)
+    timings["features"], t = time.perf_counter() - t, time.perf_counter()
+
+    steps = {}
+    result = predict_from_features(feats, steps)
+    timings["predict"] = time.perf_counter() - t
+    timings.update(steps)
+    return result, timings
+
+def predict_timeline_chunk(job):
+    # job: (segment, sr, segment_start, window_starts, window_seconds) with
+    # window starts in track time; frames are shared by the chunk's windows
+    from backend.utils.inference import predict_from_feature_matrix
+
+    y, sr, seg_start, starts, window = job
+    X = windowed_features(y, sr, [s - seg_start for s in starts], window)
+    points = predict_from_feature_matrix(X)
+    for p, s in zip(points, starts):
+        p["start_seconds"] = round(s, 2)
+        p["end_seconds"] = round(s + window, 2)
+    return points
+
+# ------------------------
+# Event-loop side
+# ------------------------
+class InferenceExecutor:
+    def __init__(self, workers: int = INFERENCE_WORKERS, max_pending: int = INFERENCE_MAX_PENDING):
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.restarts = 0
+        self.timed = 0
+        self.ready = False
+        self.model_info = None
+        self.warmup_error = None
+        self.stage_totals = {s: 0.0 for s in STAGES + ["queue_wait"] + PREDICT_STEPS}
+        self.stage_max = {s: 0.0 for s in STAGES + ["queue_wait"] + PREDICT_STEPS}
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def start(self):
+        if self._pool is None:
+            ctx = multiprocessing.get_context(INFERENCE_START_METHOD)
+            if INFERENCE_START_METHOD == "forkserver":
+                ctx.set_forkserver_preload(["backend.utils.model_preload"])
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=ctx,
+                initializer=_worker_init,
+            )
+
+    def _replace(self, broken: ProcessPoolExecutor):
+        # a worker died (OOM kill, decoder segfault) and took the pool down
+        # with it; every job that saw the same pool break lands here, only
+        # the first one swaps in a fresh pool
+        if self._pool is broken:
+            print("inference pool broken, restarting")
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            self.restarts += 1
+            self.start()
+            if self.ready:
+                # spawned replacements load whatever is on disk now; result
+                # keys wait until the new workers report their version
+                self.model_info = None
+                asyncio.ensure_future(self.warmup())
+
+    async def _submit(self, fn, *args):
+        pool = self._pool
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+        except BrokenProcessPool:
+            self._replace(pool)
+            raise
+
+    async def warmup(self):
+        # readiness: a worker has the models loaded and has predicted once.
+        # Not subject to admission control, a restart may re-warm under load
+        self.pending += 1
+        try:
+            self.model_info, _ = await self._run(warmup_worker)
+            self.ready = True
+        except Exception as e:
+            self.warmup_error = str(e) or type(e).__name__
+            print("inference warmup failed:", self.warmup_error)
+
+    @property
+    def model_version(self) -> Optional[str]:
+        # version of the models the workers actually serve (None until warm)
+        return self.model_info["version"] if self.model_info else None
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _reserve(self, n: int):
+        # backpressure: refuse work instead of queueing it unboundedly. An idle
+        # executor always accepts, so oversized batches still go through.
+        if self.pending and self.pending + n > self.max_pending:
+            self.rejected += n
+            raise Overloaded(f"inference queue full ({self.pending} pending)")
+        self.pending += n
+
+    def _record(self, timings: dict):
+        self.timed += 1
+        for stage, secs in timings.items():
+            self.stage_totals[stage] += secs
+            self.stage_max[stage] = max(self.stage_max[stage], secs)
+            PREDICT_STAGE_SECONDS.observe(secs, stage=stage)
+
+    async def _run(self, fn, *args):
+        self.start()
+        submitted = time.perf_counter()
+
+        try:
+            out = await self._submit(fn, *args)
+        except BrokenProcessPool:
+            self.failed += 1
+            raise WorkerCrashed("inference worker died, pool restarted")
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.pending -= 1
+        self.completed += 1
+        return out, time.perf_counter() - submitted
+
+    async def predict(self, path: str):
+        # full single-clip pipeline in a worker; returns (result, timings)
+        self._reserve(1)
+        (result, timings), elapsed = await self._run(predict_file, path)
+        timings["queue_wait"] = max(0.0, elapsed - sum(v for k, v in timings.items() if k in STAGES))
+        self._record(timings)
+        return result, timings
+
+    async def predict_waveform(self, y, sr: int, timings: Optional[dict] = None):
+        # features + forests for an already decoded window; `timings` carries
+        # the stages the caller ran itself (probe, decode)
+        self._reserve(1)
+        (result, worker_timings), elapsed = await self._run(predict_waveform, y, sr)
+        timings = dict(timings or {}, **worker_timings)
+        timings["queue_wait"] = max(0.0, elapsed - sum(v for k, v in worker_timings.items() if k in STAGES))
+        self._record(timings)
+        return result, timings
+
+    async def call(self, fn, *args):
+        # any other CPU-bound job (picklable top-level fn)
+        self._reserve(1)
+        out, _ = await self._run(fn, *args)
+        return out
+
+    async def map(self, fn, items):
+        # many jobs admitted together; per-item exceptions are returned in place
+        self._reserve(len(items))
+        outs = await asyncio.gather(*[self._run(fn, x) for x in items], return_exceptions=True)
+        return [o if isinstance(o, BaseException) else o[0] for o in outs]
+
+    def submit_many(self, fn, items):
+        # like map, but hands back one task per item (each -> (out, elapsed))
+        # so the caller can consume results in order as they finish
+        self._reserve(len(items))
+        return [asyncio.ensure_future(self._run(fn, x)) for x in items]
+
+    def stats(self):
+        n = self.timed or 1
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "queue_depth": max(0, self.pending - self.workers),
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "restarts": self.restarts,
+            "stage_avg_ms": {s: round(v / n * 1000, 2) for s, v in self.stage_totals.items()},
+            "stage_max_ms": {s: round(v * 1000, 2) for s, v in self.stage_max.items()},
+        }
+
+inference_executor = InferenceExecutor()
+
+@register_collector
+def inference_metrics():
+    e = inference_executor
+    yield ("moodcast_inference_pending", "gauge", "Inference jobs running or queued", [({}, e.pending)])
+    yield ("moodcast_inference_jobs_total", "counter", "Finished inference jobs by outcome",
+           [({"outcome": "completed"}, e.completed), ({"outcome": "failed"}, e.failed),
+            ({"outcome": "rejected"}, e.rejected)])
+    yield ("moodcast_inference_pool_restarts_total", "counter", "Process pools replaced after a worker died",
+           [({}, e.restarts)])
@@ -1,4 +1,118 @@
-def detect_language(audio_path):
-    # Language detection disabled for free-tier deployment
-    # Defaulting to English
-    return "en", 1.0
+import os
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# stub (no model, always English) | whisper (faster-whisper, local model dir)
+LANGUAGE_DETECTOR = os.getenv("MOODCAST_LANGUAGE_DETECTOR", "stub")
+LANGUAGE_MODEL_PATH = os.getenv("MOODCAST_LANGUAGE_MODEL_PATH", "models/whisper-tiny")
+LANGUAGE_DEVICE = os.getenv("MOODCAST_LANGUAGE_DEVICE", "cpu")
+LANGUAGE_COMPUTE_TYPE = os.getenv("MOODCAST_LANGUAGE_COMPUTE_TYPE", "int8")
+# hard per-request budget; past it the answer is "unknown"
+LANGUAGE_BUDGET_SECONDS = float(os.getenv("MOODCAST_LANGUAGE_BUDGET_SECONDS", "2"))
+# detections allowed to run at once; requests beyond that don't queue
+LANGUAGE_WORKERS = int(os.getenv("MOODCAST_LANGUAGE_WORKERS", "1"))
+
+UNKNOWN = ("unknown", 0.0)
+WHISPER_SR = 16000
+
+# ------------------------
+# Backends: detect(y, sr) -> (language code, confidence) on a mono waveform
+# ------------------------
+class StubDetector:
+    # Language detection disabled for free-tier deployment: defaulting to
+    # English, nothing loaded, nothing run off-thread
+    inline = True
+
+    def detect(self, y, sr: int):
+        return "en", 1.0
+
+class WhisperDetector:
+    inline = False
+
+    def __init__(self, model_path: str = LANGUAGE_MODEL_PATH, device: str = LANGUAGE_DEVICE,
+                 compute_type: str = LANGUAGE_COMPUTE_TYPE):
+        self.model_path = model_path
+        self.device = device
+        self.compute_type = compute_type
+        self._model = None
+        self._lock = threading.Lock()
+
+    def model(self):
+        # loaded on first use, from a local directory only (never downloads)
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from faster_whisper import WhisperModel  # optional dependency
+                    self._model = WhisperModel(self.model_path, device=self.device,
+                                               compute_type=self.compute_type, local_files_only=True)
+        return self._model
+
+    def detect(self, y, sr: int):
+        import librosa
+        audio = y if sr == WHISPER_SR else librosa.resample(y, orig_sr=sr, target_sr=WHISPER_SR)
+        # language is decided from the first 30s before any decoding; the
+        # segment generator is never consumed, so nothing is transcribed
+        _, info = self.model().transcribe(np.ascontiguousarray(audio, dtype=np.float32), beam_size=1)
+        return info.language, float(info.language_probability)
+
+def make_detector(kind: str = LANGUAGE_DETECTOR):
+    if kind == "whisper":
+        return WhisperDetector()
+    return StubDetector()
+
+# ------------------------
+# Concurrent, budgeted detection
+# ------------------------
+class LanguageService:
+    def __init__(self, detector, budget: float = LANGUAGE_BUDGET_SECONDS, workers: int = LANGUAGE_WORKERS):
+        self.detector = detector
+        self.budget = budget
+        self.workers = max(1, workers)
+        self.running = 0
+        self.stats = {"detected": 0, "timeouts": 0, "skipped_busy": 0, "errors": 0}
+        self._pool = None
+
+    def _finished(self, fut):
+        # the slot frees when the thread does, not when we stop waiting; a
+        # late failure is consumed here so it isn't reported as unretrieved
+        self.running -= 1
+        if not fut.cancelled():
+            fut.exception()
+
+    def detect_now(self, y, sr: int):
+        # synchronous, no budget (offline callers)
+        return self.detector.detect(y, sr)
+
+    async def detect(self, y, sr: int):
+        # -> (language, confidence); ("unknown", 0.0) when over budget, busy
+        # or failing. Start it as a task next to inference so the two overlap.
+        if self.detector.inline:
+            return self.detector.detect(y, sr)
+        if self.running >= self.workers:
+            self.stats["skipped_busy"] += 1
+            return UNKNOWN
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="langdetect")
+
+        self.running += 1
+        fut = asyncio.get_running_loop().run_in_executor(self._pool, self.detector.detect, y, sr)
+        fut.add_done_callback(self._finished)
+        try:
+            out = await asyncio.wait_for(asyncio.shield(fut), timeout=self.budget)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            return UNKNOWN
+        except Exception as e:
+            self.stats["errors"] += 1
+            print("language detection failed:", e)
+            return UNKNOWN
+        self.stats["detected"] += 1
+        return out
+
+language_service = LanguageService(make_detector())
+
+def detect_language(y, sr: int):
+    return language_service.detect_now(y, sr)
@@ -0,0 +1,142 @@
+import time
+import asyncio
+import functools
+import threading
+
+# Latency buckets in seconds, from cache hits up to slow upstream calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_metrics = []
+_collectors = []
+
+# ------------------------
+# Metric types (in-process, Prometheus text exposition)
+# ------------------------
+class Counter:
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[l]) for l in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, v in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_num(v)}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}           # key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[l]) for l in self.labelnames)
+        with self._lock:
+            v = self._values.get(key)
+            if v is None:
+                v = self._values[key] = [0] * (len(self.buckets) + 2)
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    v[i] += 1
+            v[-2] += value
+            v[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, v in sorted(self._values.items()):
+            for b, c in zip(self.buckets, v):
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames + ('le',), key + (_num(b),))} {c}")
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames + ('le',), key + ('+Inf',))} {v[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_num(v[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {v[-1]}")
+        return lines
+
+class timed:
+    # context manager or decorator (sync or async) observing elapsed seconds:
+    #   with timed(STAGE_SECONDS, stage="decode"): ...
+    #   @timed(STAGE_SECONDS, stage="scoring")
+    def __init__(self, histogram: Histogram, **labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self._start
+        self.histogram.observe(self.elapsed, **self.labels)
+        return False
+
+    def __call__(self, fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                with timed(self.histogram, **self.labels):
+                    return await fn(*args, **kwargs)
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with timed(self.histogram, **self.labels):
+                    return fn(*args, **kwargs)
+        return wrapper
+
+# ------------------------
+# Collectors: values read from existing stats() at scrape time
+# ------------------------
+def register_collector(fn):
+    # fn() -> iterable of (name, type, help, [(labels dict, value), ...])
+    _collectors.append(fn)
+    return fn
+
+def render() -> str:
+    lines = []
+    for m in _metrics:
+        lines += m.render()
+    for fn in _collectors:
+        try:
+            families = list(fn())
+        except Exception as e:
+            print("metrics collector failed", e)
+            continue
+        for name, kind, help, samples in families:
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {_num(value)}")
+    return "\n".join(lines) + "\n"
+
+def _labels(names, values):
+    if not names:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+    return "{" + ",".join(f'{n}="{esc(v)}"' for n, v in zip(names, values)) + "}"
+
+def _num(v):
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+# ------------------------
+# Shared metrics
+# ------------------------
+HTTP_REQUEST_SECONDS = Histogram("moodcast_http_request_seconds", "Request latency by route and status",
+                                 ["route", "method", "status"])
+PREDICT_STAGE_SECONDS = Histogram("moodcast_predict_stage_seconds", "/predict_audio time per pipeline stage",
+                                  ["stage"])
+RECOMMEND_STAGE_SECONDS = Histogram("moodcast_recommend_stage_seconds", "search_by_mood time per stage",
+                                    ["stage"])
+SPOTIFY_REQUEST_SECONDS = Histogram("moodcast_spotify_request_seconds", "Upstream Spotify call latency",
+                                    ["endpoint"])
+SPOTIFY_RESPONSES = Counter("moodcast_spotify_responses_total", "Upstream Spotify responses by status code",
+                            ["endpoint", "status"])
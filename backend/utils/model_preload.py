@@ -0,0 +1,16 @@
+# Imported by the inference forkserver before it forks any worker: the
+# models are loaded and librosa's lazy submodules / numba kernels are
+# initialised once there, and every worker shares those pages copy-on-write
+# instead of building its own copy.
+import numpy as np
+
+from backend.utils.model_registry import registry
+from training.extract_features import extract_librosa_features_from_array
+
+try:
+    # a tone rather than silence: chroma's tuning estimate warns on silence
+    t = np.arange(22050, dtype=np.float32) / 22050
+    extract_librosa_features_from_array(0.1 * np.sin(2 * np.pi * 440 * t), 22050)
+    registry.load()
+except Exception as e:
+    print("model preload failed, workers will load lazily:", e)
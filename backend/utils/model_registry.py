@@ -0,0 +1,189 @@
+import os
+import time
+import hashlib
+import threading
+import joblib
+import numpy as np
+from typing import Optional
+
+from backend.utils.forest_predictor import FlatForest
+from training.extract_features import FEATURE_VERSION
+
+MODEL_DIR = os.getenv("MOODCAST_MODEL_DIR", "models")
+# joblib memory-maps the raw numpy buffers instead of reading them into a
+# private copy. sklearn copies tree nodes out of the mapping when it
+# unpickles, so forests are shared between pool workers by loading them once
+# in the forkserver (see model_preload) and forking copy-on-write.
+MODEL_MMAP_MODE = os.getenv("MOODCAST_MODEL_MMAP_MODE", "r") or None
+# sklearn: the pickled forests' own predict. flat: both forests packed into
+# contiguous node arrays (forest_predictor) and walked together; the arrays
+# are cached under <model_dir>/forest_flat and mmap'd on later starts, so the
+# pickled forests never have to be unpickled again.
+MODEL_PREDICTOR = os.getenv("MOODCAST_PREDICTOR", "sklearn")
+
+ARTIFACTS = {
+    "valence": "valence_model.pkl",
+    "arousal": "arousal_model.pkl",
+    "scaler": "scaler.pkl",
+    # optional single multi-output model predicting [valence, arousal]
+    # (training/model_search.py); used instead of the pair when present
+    "joint": "mood_model.pkl",
+}
+
+class ModelRegistry:
+    def __init__(self, model_dir: str = MODEL_DIR, mmap_mode: Optional[str] = MODEL_MMAP_MODE,
+                 predictor: str = MODEL_PREDICTOR):
+        self.model_dir = model_dir
+        self.mmap_mode = mmap_mode
+        self.predictor = predictor
+        self.models = {}
+        self.flat = None
+        self.load_seconds = None
+        self.warm = False
+        self._joint = None
+        self._loaded_version = None
+        self._lock = threading.RLock()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.model_dir, ARTIFACTS[name])
+
+    @property
+    def joint(self) -> bool:
+        # resolved once (and again on load), not stat'ed on every predict
+        if self._joint is None:
+            self._joint = os.path.exists(self.path("joint"))
+        return self._joint
+
+    def model_names(self):
+        # artifacts the current model dir is served from
+        return ["scaler", "joint"] if self.joint else ["scaler", "valence", "arousal"]
+
+    @property
+    def version(self) -> str:
+        # the models this process serves: pinned when the first one is
+        # loaded, so replacing a file on disk doesn't relabel them
+        return self._loaded_version or self.disk_version()
+
+    def _pin_version(self):
+        if self._loaded_version is None:
+            self._loaded_version = self.disk_version()
+
+    def disk_version(self) -> str:
+        # changes whenever a model file is replaced or the feature layout
+        # changes; cheap (stat only), so usable before anything is loaded
+        pinned = os.getenv("MOODCAST_MODEL_VERSION")
+        if pinned:
+            return pinned
+        h = hashlib.sha1(FEATURE_VERSION.encode())
+        for name in sorted(self.model_names()):
+            st = os.stat(self.path(name))
+            h.update(f"{ARTIFACTS[name]}:{st.st_size}:{st.st_mtime_ns}".encode())
+        return h.hexdigest()[:12]
+
+    def get(self, name: str):
+        model = self.models.get(name)
+        if model is None:
+            with self._lock:
+                model = self.models.get(name)
+                if model is None:
+                    self._pin_version()
+                    model = joblib.load(self.path(name), mmap_mode=self.mmap_mode)
+                    self.models[name] = model
+        return model
+
+    def get_flat(self) -> FlatForest:
+        if self.flat is None:
+            with self._lock:
+                if self.flat is None:
+                    cache_dir = os.path.join(self.model_dir, "forest_flat")
+                    self._pin_version()
+                    version = self.version
+                    flat = FlatForest.load(cache_dir, version, mmap_mode=self.mmap_mode)
+                    if flat is None:
+                        models = [self.get("joint")] if self.joint else [self.get("valence"), self.get("arousal")]
+                        if not all(hasattr(m, "estimators_") and hasattr(m.estimators_[0], "tree_") for m in models):
+                            # e.g. gradient boosting: nothing to flatten
+                            print("flat predictor needs tree forests, using sklearn predict")
+                            self.predictor = "sklearn"
+                            return None
+                        flat = FlatForest.from_forests(models)
+                        try:
+                            flat.save(cache_dir, version)
+                        except OSError as e:
+                            print("could not cache flattened forests:", e)
+                    self.flat = flat
+        return self.flat
+
+    def load(self):
+        # everything the configured predictor needs
+        t = time.perf_counter()
+        if not self.models:
+            self._joint = None
+            self._loaded_version = None
+        self.get("scaler")
+        if self.predictor != "flat" or self.get_flat() is None:
+            for name in self.model_names():
+                self.get(name)
+        if self.load_seconds is None:
+            self.load_seconds = time.perf_counter() - t
+        return self
+
+    def predict(self, X, timings: Optional[dict] = None):
+        # X: unscaled (n_rows, n_features) -> (valence array, arousal array);
+        # per-step seconds are added to `timings` when given
+        t = time.perf_counter()
+        X = self.get("scaler").transform(X)
+        t1 = time.perf_counter()
+        if self.predictor == "flat" and self.get_flat() is not None:
+            out = self.get_flat().predict(X)
+            vals, aros = out[:, 0], out[:, 1]
+            steps = {"predict_scale": t1 - t, "predict_forest": time.perf_counter() - t1}
+        elif self.joint:
+            out = self.get("joint").predict(X)
+            vals, aros = out[:, 0], out[:, 1]
+            steps = {"predict_scale": t1 - t, "predict_joint": time.perf_counter() - t1}
+        else:
+            vals = self.get("valence").predict(X)
+            t2 = time.perf_counter()
+            aros = self.get("arousal").predict(X)
+            steps = {"predict_scale": t1 - t, "predict_valence": t2 - t1,
+                     "predict_arousal": time.perf_counter() - t2}
+        if timings is not None:
+            timings.update(steps)
+        return vals, aros
+
+    def warmup(self):
+        # one dummy prediction so first real request doesn't pay lazy init
+        self.load()
+        self.predict(np.zeros((1, self.get("scaler").n_features_in_)))
+        self.warm = True
+        return self.metadata()
+
+    def metadata(self):
+        out = {
+            "version": self.version,
+            "feature_version": FEATURE_VERSION,
+            "model_dir": self.model_dir,
+            "mmap_mode": self.mmap_mode,
+            "predictor": self.predictor,
+            "loaded": bool(self.models),
+            "warm": self.warm,
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            "artifacts": {},
+        }
+        for name in self.model_names():
+            fname = ARTIFACTS[name]
+            st = os.stat(self.path(name))
+            info = {"file": fname, "bytes": st.st_size, "mtime": int(st.st_mtime)}
+            model = self.models.get(name)
+            if model is not None:
+                info["type"] = type(model).__name__
+                if hasattr(model, "n_estimators"):
+                    info["n_estimators"] = model.n_estimators
+            out["artifacts"][name] = info
+        if self.flat is not None:
+            out["flat_forest"] = {"trees": self.flat.forest_sizes, "max_depth": self.flat.max_depth,
+                                  "bytes": self.flat.nbytes}
+        return out
+
+registry = ModelRegistry()
@@ -1,3 +1,5 @@
+import numpy as np
+
 def score_basic(track, target_valence=None, target_energy=None, language=None):
     # simple hybrid scoring: popularity + language heuristics
     pop = track.get("popularity", 0) / 100.0
@@ -26,3 +28,20 @@ def score_smart(features, target_valence, target_energy, popularity=0):
     # small popularity boost
     score += (popularity / 100.0) * 0.1
     return score
+
+# ------------------------
+# Vectorized versions over a ranking.CandidateTable (same formulas)
+# ------------------------
+def score_basic_batch(table, target_valence=None, target_energy=None, language=None):
+    score = table.popularity / 100.0 * 0.6
+    if language and language.lower() in ["ta", "tamil"]:
+        score = score + 0.2 * np.array(["IN" in m for m in table.markets], dtype=bool)
+    return score
+
+def score_smart_batch(table, target_valence, target_energy):
+    pop = table.popularity / 100.0
+    smart = ((1 - np.abs(table.energy - target_energy))
+             + (1 - np.abs(table.valence - target_valence))
+             + table.danceability * 0.1
+             + pop * 0.1)
+    return np.where(table.has_features, smart, pop * 0.2)
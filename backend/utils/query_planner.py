@@ -0,0 +1,111 @@
+import os
+import math
+import time
+import sqlite3
+import threading
+
+QUERY_STATS_PATH = os.getenv("QUERY_STATS_PATH", "/tmp/moodcast_query_stats.sqlite")
+# searches per request before looking at the pool size
+QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", "6"))
+# below this many candidates, the next-best remaining queries are issued
+QUERY_MIN_POOL = int(os.getenv("QUERY_MIN_POOL", "60"))
+# exploration bonus so pruned templates still get retried now and then
+QUERY_EXPLORE = float(os.getenv("QUERY_EXPLORE", "3.0"))
+# rows not updated for this long are dropped at startup
+QUERY_STATS_MAX_AGE = float(os.getenv("QUERY_STATS_MAX_AGE", str(90 * 24 * 3600)))
+
+# prior yield (final top-30 tracks per issued query) for templates with
+# little history: explicit user input (artists, tracks, genres, keywords)
+# starts out ahead of the generic mood/language fillers
+INTENT_TEMPLATES = {"artist_mood", "artist_lang_mood", "track_mood", "track_lang_mood",
+                    "genre_mood_lang", "genre_lang", "keyword_mood_lang", "keyword_lang"}
+PRIOR_YIELD = {"intent": 10.0, "generic": 5.0}
+PRIOR_WEIGHT = 2.0
+
+# ------------------------
+# Per (template, mood, language) yield stats, persisted in sqlite and
+# mirrored in memory. Callers pass bucketed moods/languages (see the
+# recommend route's stats_bucket), not raw user text, so the table stays
+# bounded.
+# ------------------------
+class QueryPlanner:
+    def __init__(self, path: str = QUERY_STATS_PATH, budget: int = QUERY_BUDGET,
+                 min_pool: int = QUERY_MIN_POOL, explore: float = QUERY_EXPLORE):
+        self.budget = budget
+        self.min_pool = min_pool
+        self.explore = explore
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS query_stats ("
+            "template TEXT, mood TEXT, language TEXT, issued INTEGER, tracks INTEGER, hits INTEGER, "
+            "updated_at REAL, PRIMARY KEY (template, mood, language))"
+        )
+        self._db.execute("DELETE FROM query_stats WHERE updated_at < ?", (time.time() - QUERY_STATS_MAX_AGE,))
+        self._stats = {
+            (t, m, l): [i, n, h]
+            for t, m, l, i, n, h in self._db.execute(
+                "SELECT template, mood, language, issued, tracks, hits FROM query_stats")
+        }
+
+    @staticmethod
+    def _key(template, mood, language):
+        return template, " ".join((mood or "").lower().split()), (language or "none").lower()
+
+    def score(self, template, mood, language, total_issued):
+        issued, _, hits = self._stats.get(self._key(template, mood, language), (0, 0, 0))
+        prior = PRIOR_YIELD["intent" if template in INTENT_TEMPLATES else "generic"]
+        mean = (hits + prior * PRIOR_WEIGHT) / (issued + PRIOR_WEIGHT)
+        return mean + self.explore * math.sqrt(math.log(total_issued + 1) / (issued + 1))
+
+    def plan(self, tagged, mood, language):
+        # tagged: [(template, query)] in builder order -> same pairs ordered
+        # by expected yield (stable, so ties keep builder order)
+        with self._lock:
+            total = sum(self._stats.get(self._key(t, mood, language), (0, 0, 0))[0] for t, _ in tagged)
+            scores = [self.score(t, mood, language, total) for t, _ in tagged]
+        order = sorted(range(len(tagged)), key=lambda i: -scores[i])
+        return [tagged[i] for i in order]
+
+    def record(self, mood, language, issued, top_ids):
+        # issued: [(template, items)] for queries that returned; a template's
+        # hits are its tracks that made the final results. One transaction
+        # per request; blocks on disk, so call it from a thread.
+        top = set(top_ids)
+        now = time.time()
+        with self._lock:
+            rows = {}
+            for template, items in issued:
+                key = self._key(template, mood, language)
+                s = self._stats.setdefault(key, [0, 0, 0])
+                s[0] += 1
+                s[1] += len(items)
+                s[2] += sum(1 for t in items if t.get("id") in top)
+                rows[key] = (*key, s[0], s[1], s[2], now)
+            if not rows:
+                return
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany("INSERT OR REPLACE INTO query_stats VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                     rows.values())
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def inspect(self, mood=None, language=None):
+        with self._lock:
+            rows = []
+            for (t, m, l), (issued, tracks, hits) in self._stats.items():
+                if mood is not None and m != " ".join(mood.lower().split()):
+                    continue
+                if language is not None and l != language.lower():
+                    continue
+                rows.append({"template": t, "mood": m, "language": l, "issued": issued,
+                             "tracks": tracks, "hits": hits,
+                             "yield": round(hits / issued, 3) if issued else None})
+        rows.sort(key=lambda r: (r["mood"], r["language"], -(r["yield"] or 0)))
+        return {"budget": self.budget, "min_pool": self.min_pool, "stats": rows}
+
+query_planner = QueryPlanner()
@@ -0,0 +1,63 @@
+import numpy as np
+
+# ------------------------
+# Candidate table: the per-track fields scorers need, extracted and
+# lowercased once per request into NumPy columns
+# ------------------------
+class CandidateTable:
+    def __init__(self, tracks, features=None):
+        # tracks: list of Spotify track objects; features: optional
+        # {track_id: audio-features dict or None}
+        self.tracks = list(tracks)
+        n = len(self.tracks)
+        self.ids = [t.get("id") for t in self.tracks]
+        self.names = np.array([(t.get("name") or "").lower() for t in self.tracks], dtype=str)
+        self.artists = np.array(
+            [" ".join([a.get("name", "").lower() for a in t.get("artists", [])]) for t in self.tracks],
+            dtype=str,
+        )
+        self.popularity = np.array([t.get("popularity") or 0 for t in self.tracks], dtype=np.float64)
+        self.markets = [t.get("available_markets") or [] for t in self.tracks]
+
+        features = features or {}
+        self.has_features = np.zeros(n, dtype=bool)
+        self.valence = np.zeros(n)
+        self.energy = np.zeros(n)
+        self.danceability = np.zeros(n)
+        for i, tid in enumerate(self.ids):
+            f = features.get(tid)
+            if f:
+                self.has_features[i] = True
+                self.valence[i] = f.get("valence", 0)
+                self.energy[i] = f.get("energy", 0)
+                self.danceability[i] = f.get("danceability", 0)
+
+    def __len__(self):
+        return len(self.tracks)
+
+def contains(column, needle):
+    # vectorized `needle in s` for every string in column
+    return np.char.find(column, needle) >= 0
+
+# ------------------------
+# Selection
+# ------------------------
+def top_k(scores, k=None):
+    # indices of the k best scores, best first; ties keep input order like a
+    # stable sort would. argpartition avoids sorting the whole pool.
+    n = len(scores)
+    if k is None or k >= n:
+        idx = np.arange(n)
+    else:
+        idx = np.argpartition(-scores, k - 1)[:k]
+        # pull in everything tied with the k-th score so ties resolve by index
+        idx = np.flatnonzero(scores >= scores[idx].min())
+    order = np.lexsort((idx, -scores[idx]))
+    return idx[order][:k]
+
+def rank(table: CandidateTable, scorer, k=None):
+    # scorer: callable(table) -> float array of len(table)
+    if not len(table):
+        return []
+    scores = np.asarray(scorer(table), dtype=np.float64)
+    return [(float(scores[i]), table.tracks[i]) for i in top_k(scores, k)]
@@ -0,0 +1,182 @@
+import os
+import time
+import heapq
+import random
+import asyncio
+import itertools
+import httpx
+from typing import Optional
+
+from backend.utils.metrics import register_collector
+
+# request priorities: lower goes first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+RATE_LIMIT = float(os.getenv("SPOTIFY_RATE_LIMIT", "10"))          # requests/second
+RATE_BURST = float(os.getenv("SPOTIFY_RATE_BURST", "20"))
+MAX_RETRIES = int(os.getenv("SPOTIFY_MAX_RETRIES", "3"))
+RETRY_BACKOFF = float(os.getenv("SPOTIFY_RETRY_BACKOFF", "0.25"))  # seconds, doubled per attempt
+MAX_RETRY_AFTER = float(os.getenv("SPOTIFY_MAX_RETRY_AFTER", "10"))
+
+RETRY_STATUSES = {500, 502, 503, 504}
+
+class Throttled(Exception):
+    # upstream is rate limiting for longer than the caller is willing to wait
+    def __init__(self, retry_after: float):
+        super().__init__(f"rate limited, retry after {retry_after:g}s")
+        self.retry_after = retry_after
+
+# ------------------------
+# Outbound scheduler: one token bucket shared by every caller, a priority
+# queue in front of it, a global pause when upstream answers 429, and
+# jittered retries for transient failures
+# ------------------------
+class RateScheduler:
+    def __init__(self, name: str, rate: float = RATE_LIMIT, burst: float = RATE_BURST,
+                 max_retries: int = MAX_RETRIES):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self._tokens = burst
+        self._stamp = time.monotonic()
+        self._blocked_until = 0.0
+        self._waiting = []              # heap of (priority, seq)
+        self._seq = itertools.count()
+        self._cond = None
+        self.metrics = {
+            "requests": 0,
+            "throttled": 0,             # 429 responses
+            "retries": 0,
+            "transport_errors": 0,
+            "gave_up": 0,
+            "rejected": 0,              # failed fast instead of waiting out a pause
+            "queued": {PRIORITY_INTERACTIVE: 0, PRIORITY_BACKGROUND: 0},
+            "wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+        }
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def pause(self, seconds: float):
+        # upstream said stop: nobody goes until the window has passed
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    async def acquire(self, priority: int = PRIORITY_INTERACTIVE, max_wait: Optional[float] = None):
+        # Throttled as soon as an upstream pause would hold this call past
+        # max_wait (None: wait it out)
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        entry = (priority, next(self._seq))
+        heapq.heappush(self._waiting, entry)
+        start = time.monotonic()
+        try:
+            async with self._cond:
+                while True:
+                    now = time.monotonic()
+                    if max_wait is not None and self._blocked_until - now > max_wait - (now - start):
+                        self.metrics["rejected"] += 1
+                        raise Throttled(self._blocked_until - now)
+                    self._refill(now)
+                    if self._waiting[0] == entry:
+                        if now >= self._blocked_until and self._tokens >= 1:
+                            heapq.heappop(self._waiting)
+                            self._tokens -= 1
+                            self._cond.notify_all()
+                            break
+                        delay = max(self._blocked_until - now, (1 - self._tokens) / self.rate)
+                    else:
+                        delay = 1.0     # woken by the head when it leaves
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), timeout=max(delay, 0.001))
+                    except asyncio.TimeoutError:
+                        pass
+        except BaseException:
+            if entry in self._waiting:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+            raise
+        waited = time.monotonic() - start
+        self.metrics["queued"][priority] = self.metrics["queued"].get(priority, 0) + 1
+        self.metrics["wait_seconds"] += waited
+        self.metrics["max_wait_seconds"] = max(self.metrics["max_wait_seconds"], waited)
+
+    async def request(self, send, priority: int = PRIORITY_INTERACTIVE,
+                      max_wait: Optional[float] = None) -> httpx.Response:
+        # send: zero-arg coroutine factory; the last response is returned
+        # (a 429 included) once retries are used up, transport errors raise.
+        # Interactive calls wait at most MAX_RETRY_AFTER on a pause unless
+        # max_wait says otherwise; background calls wait it out.
+        if max_wait is None and priority == PRIORITY_INTERACTIVE:
+            max_wait = MAX_RETRY_AFTER
+        attempt = 0
+        while True:
+            await self.acquire(priority, max_wait)
+            self.metrics["requests"] += 1
+            try:
+                resp = await send()
+            except httpx.TransportError:
+                self.metrics["transport_errors"] += 1
+                if attempt >= self.max_retries:
+                    self.metrics["gave_up"] += 1
+                    raise
+                resp = None
+
+            if resp is not None and resp.status_code == 429:
+                self.metrics["throttled"] += 1
+                retry_after = retry_after_seconds(resp)
+                self.pause(retry_after)
+                if attempt >= self.max_retries or retry_after > MAX_RETRY_AFTER:
+                    self.metrics["gave_up"] += 1
+                    return resp
+            elif resp is not None and resp.status_code in RETRY_STATUSES:
+                if attempt >= self.max_retries:
+                    self.metrics["gave_up"] += 1
+                    return resp
+                await asyncio.sleep(backoff(attempt))
+            elif resp is not None:
+                return resp
+            else:
+                await asyncio.sleep(backoff(attempt))
+
+            attempt += 1
+            self.metrics["retries"] += 1
+
+    def stats(self):
+        now = time.monotonic()
+        self._refill(now)
+        return {
+            **self.metrics,
+            "tokens": round(self._tokens, 2),
+            "waiting": len(self._waiting),
+            "paused_for": round(max(0.0, self._blocked_until - now), 2),
+        }
+
+def backoff(attempt: int) -> float:
+    # full jitter so retries from concurrent callers don't line up
+    return random.uniform(0, RETRY_BACKOFF * (2 ** attempt))
+
+def retry_after_seconds(resp: httpx.Response) -> float:
+    try:
+        return max(0.0, float(resp.headers.get("Retry-After", "1")))
+    except ValueError:
+        return 1.0
+
+# Web API and accounts service are limited separately
+api_scheduler = RateScheduler("api")
+accounts_scheduler = RateScheduler("accounts")
+
+@register_collector
+def rate_limit_metrics():
+    schedulers = [api_scheduler, accounts_scheduler]
+    yield ("moodcast_spotify_throttled_total", "counter", "429 responses from Spotify",
+           [({"service": s.name}, s.metrics["throttled"]) for s in schedulers])
+    yield ("moodcast_spotify_retries_total", "counter", "Retried Spotify calls",
+           [({"service": s.name}, s.metrics["retries"]) for s in schedulers])
+    yield ("moodcast_spotify_queue_wait_seconds_total", "counter", "Time spent waiting for the rate limiter",
+           [({"service": s.name}, s.metrics["wait_seconds"]) for s in schedulers])
+    yield ("moodcast_spotify_waiting", "gauge", "Calls queued behind the rate limiter",
+           [({"service": s.name}, len(s._waiting)) for s in schedulers])
@@ -0,0 +1,49 @@
+import asyncio
+
+from backend.utils.metrics import register_collector
+
+# ------------------------
+# Coalesce identical in-flight calls: the first caller for a key runs the
+# computation, concurrent callers with the same key await its result.
+# Nothing is kept once the call finishes, so results are never stale.
+# ------------------------
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight = {}
+        self.calls = 0
+        self.coalesced = 0
+        groups[name] = self
+
+    async def do(self, key, fn, *args, **kwargs):
+        # fn is an async callable; exceptions reach every waiter
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shielded so one caller disconnecting doesn't cancel the shared call
+        return await asyncio.shield(task)
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "upstream": self.calls - self.coalesced,
+            "in_flight": len(self._inflight),
+        }
+
+groups = {}
+
+def singleflight_stats():
+    return {name: g.stats() for name, g in groups.items()}
+
+@register_collector
+def singleflight_metrics():
+    yield ("moodcast_singleflight_calls_total", "counter", "Calls through a single-flight group",
+           [({"group": n}, g.calls) for n, g in groups.items()])
+    yield ("moodcast_singleflight_coalesced_total", "counter", "Calls that joined an in-flight computation",
+           [({"group": n}, g.coalesced) for n, g in groups.items()])
@@ -1,14 +1,74 @@
-import requests
-from backend.utils.spotify_client import refresh_user_token_if_needed
+import asyncio
+import httpx
+from backend.utils.cache import make_cache
+from backend.utils.spotify_client import refresh_user_token_if_needed, api_get
+from backend.utils.rate_limiter import PRIORITY_INTERACTIVE, Throttled
 
-def get_audio_features_user(track_id: str):
-    token = refresh_user_token_if_needed()
+# /v1/audio-features accepts up to 100 comma-separated ids per call
+AUDIO_FEATURES_BATCH = 100
+
+# Audio features never change for a track, so entries effectively don't
+# expire; persisted to sqlite by default. Tracks Spotify has no features
+# for are stored as {} so they aren't asked for again either.
+audio_features_cache = make_cache("AUDIO_FEATURES_CACHE", default_ttl=10 * 365 * 24 * 3600,
+                                  default_entries=1_000_000, default_bytes=1024 * 1024 * 1024,
+                                  default_backend="sqlite")
+
+async def get_audio_features_bulk(track_ids, priority: int = PRIORITY_INTERACTIVE):
+    # -> ({track_id: features or None}, error or None); cached ids cost
+    # nothing, the rest go out in chunks of 100
+    # cache reads and writes are one sqlite transaction each, off the loop
+    ids = list(dict.fromkeys(track_ids))
+    cached = await audio_features_cache.aget_many([f"af:{tid}" for tid in ids])
+    out = {}
+    missing = []
+    for tid in ids:
+        f = cached.get(f"af:{tid}")
+        if f is None:
+            missing.append(tid)
+        else:
+            out[tid] = f or None
+    if not missing:
+        return out, None
+
+    token = await refresh_user_token_if_needed()
     if not token:
         # not logged in
-        return None, {"error": "no_user_token"}
-    url = f"https://api.spotify.com/v1/audio-features/{track_id}"
-    headers = {"Authorization": f"Bearer {token}"}
-    res = requests.get(url, headers=headers)
-    if res.status_code != 200:
-        return None, {"status": res.status_code, "text": res.text}
-    return res.json(), None
+        return out, {"error": "no_user_token"}
+
+    async def fetch(chunk):
+        res = await api_get("/audio-features", token, {"ids": ",".join(chunk)}, priority)
+        if res.status_code != 200:
+            return chunk, None, {"status": res.status_code, "text": res.text}
+        return chunk, res.json().get("audio_features") or [], None
+
+    chunks = [missing[i:i + AUDIO_FEATURES_BATCH] for i in range(0, len(missing), AUDIO_FEATURES_BATCH)]
+    err = None
+    fetched = {}
+    for r in await asyncio.gather(*[fetch(c) for c in chunks], return_exceptions=True):
+        if isinstance(r, httpx.HTTPError):
+            err = {"error": str(r)}
+            continue
+        if isinstance(r, Throttled):
+            err = {"error": "rate_limited", "retry_after": r.retry_after}
+            continue
+        if isinstance(r, BaseException):
+            raise r
+        chunk, feats, chunk_err = r
+        if chunk_err:
+            err = chunk_err
+            continue
+        by_id = {f["id"]: f for f in feats if f}
+        for tid in chunk:
+            f = by_id.get(tid)
+            out[tid] = f
+            fetched[f"af:{tid}"] = f or {}
+    if fetched:
+        await audio_features_cache.aset_many(fetched)
+    return out, err
+
+async def get_audio_features_user(track_id: str):
+    feats, err = await get_audio_features_bulk([track_id])
+    if feats.get(track_id) is None:
+        return None, err or {"error": "no_audio_features"}
+    return feats[track_id], None
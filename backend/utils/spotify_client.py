@@ -2,10 +2,20 @@ import os
 import time
 import base64
 import json
-import requests
+import asyncio
+import tempfile
+import httpx
 from typing import Optional
+from urllib.parse import quote
 from dotenv import load_dotenv
 
+from backend.utils.cache import make_cache, normalize_query
+from backend.utils.singleflight import SingleFlight
+from backend.utils.metrics import timed, SPOTIFY_REQUEST_SECONDS, SPOTIFY_RESPONSES
+from backend.utils.rate_limiter import (
+    api_scheduler, accounts_scheduler, retry_after_seconds, PRIORITY_INTERACTIVE, Throttled,
+)
+
 load_dotenv()
 
 CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
@@ -13,30 +23,325 @@ CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
 REDIRECT_URI = os.getenv("SPOTIFY_REDIRECT_URI")
 USER_TOKEN_PATH = os.getenv("SPOTIFY_USER_TOKEN_PATH", "backend/utils/user_token.json")
 
+SPOTIFY_API_BASE = os.getenv("SPOTIFY_API_BASE", "https://api.spotify.com/v1")
+SPOTIFY_ACCOUNTS_BASE = os.getenv("SPOTIFY_ACCOUNTS_BASE", "https://accounts.spotify.com")
+
 SCOPES = "playlist-read-private playlist-modify-private playlist-modify-public user-read-playback-state user-read-email user-read-private"
 
+# ------------------------
+# Shared async HTTP client (connection pool + keep-alive)
+# ------------------------
+HTTP_TIMEOUT = float(os.getenv("SPOTIFY_HTTP_TIMEOUT", "10"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("SPOTIFY_HTTP_MAX_CONNECTIONS", "20"))
+SEARCH_CONCURRENCY = int(os.getenv("SPOTIFY_SEARCH_CONCURRENCY", "5"))
+SEARCH_DEADLINE = float(os.getenv("SPOTIFY_SEARCH_DEADLINE", "4"))
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+            ),
+        )
+    return _http_client
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+async def _send_measured(endpoint: str, send) -> httpx.Response:
+    # one upstream attempt: latency histogram + status code counter
+    try:
+        with timed(SPOTIFY_REQUEST_SECONDS, endpoint=endpoint):
+            r = await send()
+    except httpx.TransportError:
+        SPOTIFY_RESPONSES.inc(endpoint=endpoint, status="error")
+        raise
+    SPOTIFY_RESPONSES.inc(endpoint=endpoint, status=r.status_code)
+    return r
+
+# every outbound call goes through the shared rate-limit scheduler
+async def api_get(path: str, token: str, params: Optional[dict] = None,
+                  priority: int = PRIORITY_INTERACTIVE) -> httpx.Response:
+    # label by first path segment so per-id paths don't explode cardinality
+    endpoint = path.strip("/").split("/")[0]
+    return await api_scheduler.request(lambda: _send_measured(endpoint, lambda: get_http_client().get(
+        f"{SPOTIFY_API_BASE}{path}",
+        headers={"Authorization": f"Bearer {token}"},
+        params=params,
+    )), priority)
+
+async def token_post(data: dict, headers: Optional[dict] = None) -> httpx.Response:
+    return await accounts_scheduler.request(lambda: _send_measured("token", lambda: get_http_client().post(
+        f"{SPOTIFY_ACCOUNTS_BASE}/api/token",
+        headers=headers,
+        data=data,
+    )))
+
+# ------------------------
+# Search (results cached per normalized query/type/limit, shared by all routers)
+# ------------------------
+search_cache = make_cache("SEARCH_CACHE", default_ttl=6 * 3600, default_entries=2048,
+                          default_bytes=64 * 1024 * 1024)
+
+search_flight = SingleFlight("search")
+
+class SearchFailed(Exception):
+    # transport error or non-200 (other than 429) from /search
+    pass
+
+async def search(token: str, query: str, type: str = "track", limit: int = 25,
+                 priority: int = PRIORITY_INTERACTIVE) -> list:
+    # items for one query; [] on any upstream error, Throttled on 429
+    # (errors are not cached)
+    try:
+        return await search_or_raise(token, query, type, limit, priority)
+    except SearchFailed:
+        return []
+
+async def search_or_raise(token: str, query: str, type: str = "track", limit: int = 25,
+                          priority: int = PRIORITY_INTERACTIVE) -> list:
+    # like search, but an upstream error raises SearchFailed instead of
+    # looking like a query that matched nothing
+    key = f"search:{type}:{limit}:{normalize_query(query)}"
+    items = await search_cache.aget(key)
+    if items is not None:
+        return items
+    # concurrent misses for the same query share one upstream call
+    return await search_flight.do(key, _search_upstream, token, key, query, type, limit, priority)
+
+async def _search_upstream(token: str, key: str, query: str, type: str, limit: int, priority: int) -> list:
+    try:
+        r = await api_get("/search", token, {"q": query, "type": type, "limit": limit}, priority)
+    except httpx.HTTPError as e:
+        raise SearchFailed(str(e) or e.__class__.__name__)
+    if r.status_code == 429:
+        raise Throttled(retry_after_seconds(r))
+    if r.status_code != 200:
+        raise SearchFailed(f"search returned {r.status_code}")
+    items = r.json().get(f"{type}s", {}).get("items", [])
+    await search_cache.aset(key, items)
+    return items
+
+async def search_many(token: str, queries: list, type: str = "track", limit: int = 25,
+                      concurrency: int = SEARCH_CONCURRENCY, deadline: float = SEARCH_DEADLINE) -> dict:
+    # fan out all queries at once (bounded), give up on whatever is still
+    # running at the deadline and return the partial {query: items}; queries
+    # that failed upstream are left out like the ones that timed out
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def one(q):
+        async with sem:
+            return q, await search_or_raise(token, q, type, limit)
+
+    tasks = [asyncio.create_task(one(q)) for q in queries]
+    if not tasks:
+        return {}
+    done, pending = await asyncio.wait(tasks, timeout=deadline)
+    for t in pending:
+        t.cancel()
+
+    out = {}
+    for t in done:
+        if t.exception() is None:
+            q, items = t.result()
+            out[q] = items
+    return out
+
+# ------------------------
+# Token manager: both tokens live in memory, refreshes are single-flight and
+# a background task renews them before they expire, so request handlers
+# almost never wait on (or race each other for) the accounts API.
+# ------------------------
+TOKEN_EXPIRY_SLACK = 60          # treat tokens this close to expiry as expired
+TOKEN_REFRESH_AHEAD = float(os.getenv("SPOTIFY_TOKEN_REFRESH_AHEAD", "300"))
+# after a failed refresh, wait 2s, 4s, 8s... (capped) before asking again
+TOKEN_RETRY_BASE = float(os.getenv("SPOTIFY_TOKEN_RETRY_BASE", "2"))
+TOKEN_RETRY_MAX = float(os.getenv("SPOTIFY_TOKEN_RETRY_MAX", "300"))
+
+class TokenManager:
+    def __init__(self):
+        self.client = {"token": None, "expires_at": 0}
+        self.user = None                # token dict as stored in USER_TOKEN_PATH
+        self._user_mtime = 0            # st_mtime_ns of the file self.user came from
+        self.refreshes = {"client": 0, "user": 0}
+        self.failures = {"client": 0, "user": 0}
+        self._retry_at = {"client": 0.0, "user": 0.0}
+        self._client_lock = None
+        self._user_lock = None
+        self._task = None
+
+    def _locks(self):
+        if self._client_lock is None:
+            self._client_lock = asyncio.Lock()
+            self._user_lock = asyncio.Lock()
+
+    @staticmethod
+    def _user_expires_at(tok: dict) -> float:
+        return tok.get("obtained_at", 0) + tok.get("expires_in", 3600)
+
+    def _failed(self, kind: str):
+        self.failures[kind] += 1
+        delay = min(TOKEN_RETRY_MAX, TOKEN_RETRY_BASE * 2 ** (self.failures[kind] - 1))
+        self._retry_at[kind] = time.time() + delay
+
+    def _succeeded(self, kind: str):
+        self.refreshes[kind] += 1
+        self.failures[kind] = 0
+        self._retry_at[kind] = 0.0
+
+    # -------- client credentials (search/basic operations)
+    async def client_token(self, ahead: float = TOKEN_EXPIRY_SLACK) -> Optional[str]:
+        if self.client["token"] and self.client["expires_at"] > time.time() + ahead:
+            return self.client["token"]
+        self._locks()
+        async with self._client_lock:
+            # someone else may have refreshed while we waited
+            if self.client["token"] and self.client["expires_at"] > time.time() + ahead:
+                return self.client["token"]
+            # while backing off, or if this refresh fails, the old token
+            # serves as long as it hasn't actually expired
+            if time.time() >= self._retry_at["client"]:
+                token = await self._fetch_client_token()
+                if token:
+                    return token
+            return self.client["token"] if self.client["expires_at"] > time.time() else None
+
+    async def _fetch_client_token(self) -> Optional[str]:
+        auth = base64.b64encode(f"{CLIENT_ID}:{CLIENT_SECRET}".encode()).decode()
+        try:
+            resp = await token_post(
+                {"grant_type": "client_credentials"},
+                headers={"Authorization": f"Basic {auth}"},
+            )
+        except (httpx.HTTPError, Throttled) as e:
+            print("client_credentials token error", e)
+            self._failed("client")
+            return None
+        if resp.status_code != 200:
+            print("client_credentials token error", resp.status_code, resp.text)
+            self._failed("client")
+            return None
+        data = resp.json()
+        self._succeeded("client")
+        self.client = {
+            "token": data["access_token"],
+            "expires_at": time.time() + data.get("expires_in", 3600),
+        }
+        return self.client["token"]
+
+    # -------- user token (authorization code flow)
+    def set_user_token(self, tok: Optional[dict]):
+        self.user = tok
+        self._user_mtime = user_token_mtime()
+        self.failures["user"] = 0
+        self._retry_at["user"] = 0.0
+
+    def _sync_user(self):
+        # the token file is the source of truth across workers: a login or
+        # refresh written by another process is picked up on the next stat
+        mtime = user_token_mtime()
+        if mtime != self._user_mtime:
+            self.set_user_token(load_user_token())
+
+    async def user_token(self, ahead: float = TOKEN_EXPIRY_SLACK) -> Optional[str]:
+        self._sync_user()
+        tok = self.user
+        if not tok:
+            return None
+        if time.time() < self._user_expires_at(tok) - ahead:
+            return tok.get("access_token")
+        self._locks()
+        async with self._user_lock:
+            self._sync_user()
+            tok = self.user
+            if not tok:
+                return None
+            if time.time() < self._user_expires_at(tok) - ahead:
+                return tok.get("access_token")
+            if time.time() >= self._retry_at["user"]:
+                token = await self._refresh_user_token(tok)
+                if token or self.user is None:
+                    return token
+            return tok.get("access_token") if time.time() < self._user_expires_at(tok) else None
+
+    async def _refresh_user_token(self, tok: dict) -> Optional[str]:
+        try:
+            resp = await token_post({
+                "grant_type": "refresh_token",
+                "refresh_token": tok.get("refresh_token"),
+                "client_id": CLIENT_ID,
+                "client_secret": CLIENT_SECRET
+            })
+        except (httpx.HTTPError, Throttled) as e:
+            print("refresh failed", e)
+            self._failed("user")
+            return None
+        if resp.status_code == 400:
+            # refresh token revoked or invalid: retrying won't help, drop it
+            # until someone logs in again (a new token file)
+            print("refresh failed, user token dropped", resp.status_code, resp.text)
+            self.user = None
+            return None
+        if resp.status_code != 200:
+            print("refresh failed", resp.status_code, resp.text)
+            self._failed("user")
+            return None
+        new = resp.json()
+        # maintain refresh_token if not returned
+        if "refresh_token" not in new:
+            new["refresh_token"] = tok.get("refresh_token")
+        save_user_token(new)
+        self._succeeded("user")
+        return new.get("access_token")
+
+    # -------- proactive refresh
+    def _next_due(self) -> float:
+        # a failed refresh pushes its token's due time out by the backoff
+        due = []
+        if self.client["token"]:
+            due.append(max(self.client["expires_at"] - TOKEN_REFRESH_AHEAD, self._retry_at["client"]))
+        if self.user:
+            due.append(max(self._user_expires_at(self.user) - TOKEN_REFRESH_AHEAD, self._retry_at["user"]))
+        return min(due) if due else time.time() + 60
+
+    async def _refresh_loop(self):
+        while True:
+            # wake at the earliest refresh point, but re-check at least once a
+            # minute in case a token appeared (first request, user login)
+            await asyncio.sleep(min(60, max(1, self._next_due() - time.time())))
+            try:
+                self._sync_user()
+                if self.client["token"]:
+                    await self.client_token(ahead=TOKEN_REFRESH_AHEAD)
+                if self.user:
+                    await self.user_token(ahead=TOKEN_REFRESH_AHEAD)
+            except Exception as e:
+                print("token refresh loop error", e)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+token_manager = TokenManager()
+
 # ------------------------
 # Client Credentials Token (for search/basic operations)
 # ------------------------
-_client_token_cache = {"token": None, "expires_at": 0}
-
-def get_client_credentials_token() -> Optional[str]:
-    if _client_token_cache["token"] and _client_token_cache["expires_at"] > time.time() + 60:
-        return _client_token_cache["token"]
-
-    auth = base64.b64encode(f"{CLIENT_ID}:{CLIENT_SECRET}".encode()).decode()
-    resp = requests.post(
-        "https://accounts.spotify.com/api/token",
-        headers={"Authorization": f"Basic {auth}"},
-        data={"grant_type": "client_credentials"},
-    )
-    if resp.status_code != 200:
-        print("client_credentials token error", resp.status_code, resp.text)
-        return None
-    data = resp.json()
-    _client_token_cache["token"] = data["access_token"]
-    _client_token_cache["expires_at"] = time.time() + data.get("expires_in", 3600)
-    return _client_token_cache["token"]
+async def get_client_credentials_token() -> Optional[str]:
+    return await token_manager.client_token()
 
 # ------------------------
 # Authorization Code Flow user token persistence
@@ -50,14 +355,39 @@ def build_auth_url(state: str = "moodcast_state"):
         "state": state,
         "show_dialog": "true"
     }
-    qs = "&".join([f"{k}={requests.utils.quote(v)}" for k, v in params.items()])
-    return f"https://accounts.spotify.com/authorize?{qs}"
+    qs = "&".join([f"{k}={quote(v or '')}" for k, v in params.items()])
+    return f"{SPOTIFY_ACCOUNTS_BASE}/authorize?{qs}"
+
+async def exchange_code_for_token(code: str) -> httpx.Response:
+    return await token_post({
+        "grant_type": "authorization_code",
+        "code": code,
+        "redirect_uri": REDIRECT_URI,
+        "client_id": CLIENT_ID,
+        "client_secret": CLIENT_SECRET
+    })
 
 def save_user_token(data: dict):
     # expected fields: access_token, refresh_token, expires_in, obtained_at
     data["obtained_at"] = time.time()
-    with open(USER_TOKEN_PATH, "w", encoding="utf-8") as f:
-        json.dump(data, f)
+    # write-then-rename so readers never see a half-written file
+    directory = os.path.dirname(os.path.abspath(USER_TOKEN_PATH))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".user_token.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, USER_TOKEN_PATH)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    token_manager.set_user_token(data)
+
+def user_token_mtime() -> int:
+    try:
+        return os.stat(USER_TOKEN_PATH).st_mtime_ns
+    except OSError:
+        return 0
 
 def load_user_token() -> Optional[dict]:
     if not os.path.exists(USER_TOKEN_PATH):
@@ -68,31 +398,5 @@ def load_user_token() -> Optional[dict]:
     except Exception:
         return None
 
-def refresh_user_token_if_needed() -> Optional[str]:
-    tok = load_user_token()
-    if not tok:
-        return None
-    expires_in = tok.get("expires_in", 3600)
-    obtained = tok.get("obtained_at", 0)
-    if time.time() < obtained + expires_in - 60:
-        return tok.get("access_token")
-
-    # refresh
-    resp = requests.post(
-        "https://accounts.spotify.com/api/token",
-        data={
-            "grant_type": "refresh_token",
-            "refresh_token": tok.get("refresh_token"),
-            "client_id": CLIENT_ID,
-            "client_secret": CLIENT_SECRET
-        }
-    )
-    if resp.status_code != 200:
-        print("refresh failed", resp.status_code, resp.text)
-        return None
-    new = resp.json()
-    # maintain refresh_token if not returned
-    if "refresh_token" not in new:
-        new["refresh_token"] = tok.get("refresh_token")
-    save_user_token(new)
-    return new.get("access_token")
+async def refresh_user_token_if_needed() -> Optional[str]:
+    return await token_manager.user_token()
@@ -0,0 +1,44 @@
+import os
+import numpy as np
+
+from backend.utils.inference import map_mood
+
+# longest stretch of a track analyzed in timeline mode
+TIMELINE_MAX_SECONDS = float(os.getenv("MOODCAST_TIMELINE_MAX_SECONDS", "900"))
+# windows per worker job: frames are shared inside a job, and jobs are what
+# streams back, so this trades a little recomputation at chunk borders for
+# earlier first results and parallelism across workers
+TIMELINE_CHUNK_WINDOWS = int(os.getenv("MOODCAST_TIMELINE_CHUNK_WINDOWS", "8"))
+
+def plan_windows(duration: float, window: float, hop: float):
+    # -> (window start times, effective window length); short tracks get one
+    # window over everything
+    if duration <= window:
+        return [0.0], duration
+    starts = np.arange(0.0, duration - window + 1e-9, hop)
+    return [float(s) for s in starts], window
+
+def chunk_jobs(y, sr: int, starts, window: float, per_chunk: int = TIMELINE_CHUNK_WINDOWS):
+    # jobs for inference_executor.predict_timeline_chunk: each carries only
+    # the samples its windows cover
+    jobs = []
+    for i in range(0, len(starts), max(1, per_chunk)):
+        group = starts[i:i + per_chunk]
+        seg_start, seg_end = group[0], group[-1] + window
+        jobs.append((y[int(seg_start * sr):int(round(seg_end * sr))], sr, seg_start, group, window))
+    return jobs
+
+def aggregate(points):
+    vals = np.array([p["valence"] for p in points])
+    aros = np.array([p["arousal"] for p in points])
+    moods = [p["mood"] for p in points]
+    v, a = float(vals.mean()), float(aros.mean())
+    return {
+        "valence": v,
+        "arousal": a,
+        "mood": map_mood(v, a),
+        "valence_std": float(vals.std()),
+        "arousal_std": float(aros.std()),
+        "mood_share": {m: round(moods.count(m) / len(moods), 4) for m in dict.fromkeys(moods)},
+        "windows": len(points),
+    }
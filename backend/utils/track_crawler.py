@@ -0,0 +1,89 @@
+import os
+import asyncio
+import tempfile
+from starlette.concurrency import run_in_threadpool
+from backend.utils.spotify_client import get_client_credentials_token, search, get_http_client
+from backend.utils.spotify_audio_features import get_audio_features_bulk
+from backend.utils.track_index import track_index
+from backend.utils.rate_limiter import PRIORITY_BACKGROUND
+from backend.utils.inference_executor import inference_executor, Overloaded
+
+TRACK_CRAWL = os.getenv("TRACK_CRAWL", "0") == "1"
+TRACK_CRAWL_INTERVAL = float(os.getenv("TRACK_CRAWL_INTERVAL", "30"))
+# previews scored by our own model per tick for tracks Spotify has no
+# features for (0 disables)
+TRACK_CRAWL_PREVIEWS = int(os.getenv("TRACK_CRAWL_PREVIEWS", "5"))
+
+CRAWL_MOODS = ["happy", "energetic", "chill", "relaxing", "sad", "calm", "angry", "romantic", "party"]
+
+# ------------------------
+# Low-priority background fill of the track index: one seed query per tick,
+# then positions for whatever is still missing features: Spotify audio features
+# if a user login allows it, else our model's prediction on the preview clip
+# ------------------------
+class TrackCrawler:
+    def __init__(self, languages: dict):
+        # languages: {code: search word}, e.g. the recommend route's LANGSEARCH
+        self.seeds = [(f"{m} songs", None) for m in CRAWL_MOODS]
+        self.seeds += [(f"{w} {m} songs", code) for code, w in languages.items() for m in CRAWL_MOODS]
+        self._next = 0
+        self._task = None
+        self._previews_tried = set()
+
+    async def crawl_once(self):
+        query, language = self.seeds[self._next % len(self.seeds)]
+        self._next += 1
+        token = await get_client_credentials_token()
+        if not token:
+            return
+        tracks = await search(token, query, limit=50, priority=PRIORITY_BACKGROUND)
+        if tracks:
+            await run_in_threadpool(track_index.add_tracks, tracks, language)
+        missing = await run_in_threadpool(track_index.missing_features, 100)
+        if missing:
+            # needs a user login; without one everything falls to previews
+            features, _ = await get_audio_features_bulk(missing, PRIORITY_BACKGROUND)
+            await run_in_threadpool(track_index.set_features, features)
+            await self.predict_previews([tid for tid in missing if not features.get(tid)])
+
+    async def predict_previews(self, ids):
+        ids = [tid for tid in ids if tid not in self._previews_tried]
+        if not TRACK_CRAWL_PREVIEWS or not ids:
+            return
+        urls = await run_in_threadpool(track_index.preview_urls, ids)
+        for tid, url in list(urls.items())[:TRACK_CRAWL_PREVIEWS]:
+            # only on an idle executor: uploads always come first
+            if inference_executor.pending:
+                return
+            self._previews_tried.add(tid)
+            try:
+                r = await get_http_client().get(url)
+                if r.status_code != 200:
+                    continue
+                with tempfile.NamedTemporaryFile(suffix=".mp3") as f:
+                    f.write(r.content)
+                    f.flush()
+                    result, _ = await inference_executor.predict(f.name)
+            except Overloaded:
+                return
+            except Exception as e:
+                print("track crawler preview error", tid, e)
+                continue
+            await run_in_threadpool(track_index.set_prediction, tid, result["valence"], result["arousal"])
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.crawl_once()
+            except Exception as e:
+                print("track crawler error", e)
+            await asyncio.sleep(TRACK_CRAWL_INTERVAL)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+import numpy as np
+from typing import Optional
+
+TRACK_INDEX_PATH = os.getenv("TRACK_INDEX_PATH", "/tmp/moodcast_track_index.sqlite")
+
+# ------------------------
+# Local catalog of tracks seen in search responses. Each track gets a point in
+# valence/arousal space (0-1) from Spotify audio features (valence, energy)
+# or, failing that, from our own model's prediction for its audio.
+# ------------------------
+class TrackIndex:
+    def __init__(self, path: str = TRACK_INDEX_PATH):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS tracks ("
+            "id TEXT PRIMARY KEY, track TEXT, languages TEXT, markets TEXT, "
+            "valence REAL, energy REAL, danceability REAL, "
+            "pred_valence REAL, pred_arousal REAL, updated_at REAL)"
+        )
+        self._dirty = True
+        self._ids = []
+        self._pos = {}
+        self._coords = np.zeros((0, 2))
+        self._languages = []
+        self._markets = []
+
+    # -------- writes
+    @contextmanager
+    def _transaction(self, repositions: bool = False):
+        # one commit (one fsync) per batch instead of one per row; only
+        # writes that can move or add a point invalidate the mirror
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                yield
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            if repositions:
+                self._dirty = True
+
+    def add_tracks(self, tracks, language: Optional[str] = None):
+        # metadata upsert; a language tag (the request language the track was
+        # found under) accumulates, features/predictions are left untouched
+        now = time.time()
+        lang = language.lower() if language and language.lower() != "none" else None
+        tracks = {t["id"]: t for t in tracks if t.get("id")}
+        if not tracks:
+            return
+        ids = list(tracks)
+        with self._transaction():
+            known = {}
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                known.update(self._db.execute(
+                    f"SELECT id, languages FROM tracks WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall())
+            rows = []
+            for tid, t in tracks.items():
+                langs = set(filter(None, (known.get(tid) or "").split(",")))
+                if lang:
+                    langs.add(lang)
+                rows.append((tid, json.dumps(t), ",".join(sorted(langs)),
+                             ",".join(t.get("available_markets") or []), now))
+            self._db.executemany(
+                "INSERT INTO tracks (id, track, languages, markets, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET track = excluded.track, languages = excluded.languages, "
+                "markets = excluded.markets, updated_at = excluded.updated_at",
+                rows,
+            )
+            # positions are untouched, so patch tags on mirrored rows in place
+            # rather than reloading the whole table on the next lookup
+            if not self._dirty:
+                for tid, _, langs, markets, _ in rows:
+                    i = self._pos.get(tid)
+                    if i is not None:
+                        self._languages[i] = set(filter(None, langs.split(",")))
+                        self._markets[i] = set(filter(None, markets.split(",")))
+
+    def set_features(self, features: dict):
+        # {track_id: Spotify audio-features dict or None}
+        rows = [(f.get("valence"), f.get("energy"), f.get("danceability"), tid)
+                for tid, f in features.items() if f]
+        if not rows:
+            return
+        with self._transaction(repositions=True):
+            self._db.executemany(
+                "UPDATE tracks SET valence = ?, energy = ?, danceability = ? WHERE id = ?", rows
+            )
+
+    def set_prediction(self, track_id: str, valence: float, arousal: float):
+        # model output on its 1-9 scale, stored normalized to 0-1
+        with self._transaction(repositions=True):
+            self._db.execute(
+                "UPDATE tracks SET pred_valence = ?, pred_arousal = ? WHERE id = ?",
+                ((valence - 1) / 8, (arousal - 1) / 8, track_id),
+            )
+
+    # -------- reads
+    def missing_features(self, limit: int = 500):
+        with self._lock:
+            rows = self._db.execute(
+                # random sample so tracks that can't be positioned don't
+                # starve the rest
+                "SELECT id FROM tracks WHERE valence IS NULL AND pred_valence IS NULL "
+                "ORDER BY RANDOM() LIMIT ?", (limit,)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def preview_urls(self, ids):
+        # {track_id: preview_url} for the given tracks that have one
+        if not ids:
+            return {}
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT id, track FROM tracks WHERE id IN ({','.join('?' * len(ids))})", list(ids)
+            ).fetchall()
+        urls = {tid: json.loads(track).get("preview_url") for tid, track in rows}
+        return {tid: url for tid, url in urls.items() if url}
+
+    def _refresh(self):
+        # in-memory mirror of the positioned tracks for vectorized lookups
+        rows = self._db.execute(
+            "SELECT id, COALESCE(valence, pred_valence), COALESCE(energy, pred_arousal), languages, markets "
+            "FROM tracks WHERE COALESCE(valence, pred_valence) IS NOT NULL"
+        ).fetchall()
+        self._ids = [r[0] for r in rows]
+        self._pos = {tid: i for i, tid in enumerate(self._ids)}
+        self._coords = np.array([[r[1], r[2]] for r in rows], dtype=np.float64).reshape(-1, 2)
+        self._languages = [set(filter(None, (r[3] or "").split(","))) for r in rows]
+        self._markets = [set(filter(None, (r[4] or "").split(","))) for r in rows]
+        self._dirty = False
+
+    def nearest(self, valence: float, arousal: float, k: int = 50,
+                language: Optional[str] = None, market: Optional[str] = None):
+        # k nearest tracks to (valence, arousal) on the 0-1 scale, optionally
+        # restricted to a language tag and a market; -> list of track dicts
+        with self._lock:
+            if self._dirty:
+                self._refresh()
+            if not self._ids:
+                return []
+            mask = np.ones(len(self._ids), dtype=bool)
+            if language and language.lower() != "none":
+                mask &= np.array([language.lower() in ls for ls in self._languages])
+            if market:
+                mask &= np.array([market in ms for ms in self._markets])
+            idx = np.flatnonzero(mask)
+            if not len(idx):
+                return []
+            d = ((self._coords[idx] - np.array([valence, arousal])) ** 2).sum(axis=1)
+            if k < len(idx):
+                part = np.argpartition(d, k - 1)[:k]
+                idx, d = idx[part], d[part]
+            ids = [self._ids[i] for i in idx[np.argsort(d, kind="stable")]]
+            rows = dict(self._db.execute(
+                f"SELECT id, track FROM tracks WHERE id IN ({','.join('?' * len(ids))})", ids
+            ).fetchall())
+        return [json.loads(rows[i]) for i in ids]
+
+    def stats(self):
+        with self._lock:
+            total, positioned = self._db.execute(
+                "SELECT COUNT(*), COUNT(COALESCE(valence, pred_valence)) FROM tracks"
+            ).fetchone()
+        return {"tracks": total, "positioned": positioned}
+
+track_index = TrackIndex()
@@ -0,0 +1,99 @@
+# Audio front end: resampler choices and cached DSP kernels, each timed and
+# checked for feature/prediction drift against the reference pipeline
+# (soxr_hq resampling, filterbanks rebuilt by librosa on every call).
+#
+#   python -m benchmarks.audio_frontend [--seconds 10] [--repeat 10] [--out report.json]
+import os
+import json
+import argparse
+import tempfile
+import numpy as np
+import librosa
+
+from benchmarks.common import bench, synth_audio, write_wav, ensure_models
+from training import extract_features as ef
+
+RESAMPLERS = ["soxr_hq", "soxr_mq", "soxr_lq", "polyphase"]
+FAMILIES = {"mfcc": slice(0, 40), "chroma": slice(40, 64), "centroid": slice(64, 66), "zcr": slice(66, 68)}
+
+def reference_features(y, sr):
+    # the pipeline before kernel caching: librosa builds every filterbank
+    mag = np.abs(librosa.stft(y, n_fft=ef.N_FFT, hop_length=ef.HOP_LENGTH))
+    power = mag ** 2
+    mel = librosa.feature.melspectrogram(S=power, sr=sr)
+    frames = [
+        librosa.feature.mfcc(S=librosa.power_to_db(mel), n_mfcc=ef.N_MFCC),
+        librosa.feature.chroma_stft(S=power, sr=sr),
+        librosa.feature.spectral_centroid(S=mag, sr=sr),
+        librosa.feature.zero_crossing_rate(y, frame_length=ef.N_FFT, hop_length=ef.HOP_LENGTH),
+    ]
+    return np.hstack([np.hstack([f.mean(axis=1), f.std(axis=1)]) for f in frames])
+
+def drift(X, ref, registry):
+    # per-family worst relative difference, plus what it does to predictions
+    rel = np.abs(X - ref) / (np.abs(ref) + 1e-6)
+    out = {f"max_rel_{name}": float(rel[:, s].max()) for name, s in FAMILIES.items()}
+    out["max_abs"] = float(np.abs(X - ref).max())
+    if registry is not None:
+        v0, a0 = registry.predict(ref)
+        v1, a1 = registry.predict(X)
+        out["max_valence_diff"] = float(np.abs(v1 - v0).max())
+        out["max_arousal_diff"] = float(np.abs(a1 - a0).max())
+        out["mood_changes"] = int(sum(
+            mood_of(a, b) != mood_of(c, d) for a, b, c, d in zip(v0, a0, v1, a1)))
+    return out
+
+def mood_of(v, a):
+    from backend.utils.inference import map_mood
+    return map_mood(v, a)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seconds", type=float, default=10, help="window length, as served")
+    ap.add_argument("--clips", type=int, default=8, help="synthetic clips for the drift check")
+    ap.add_argument("--repeat", type=int, default=10)
+    ap.add_argument("--model-dir", default="models")
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+
+    from backend.utils.model_registry import ModelRegistry
+    registry = ModelRegistry(model_dir=ensure_models(args.model_dir))
+
+    report = {"window_seconds": args.seconds, "resamplers": {}, "kernels": {}}
+    target = 22050
+    with tempfile.TemporaryDirectory() as tmp:
+        for sr in [44100, 48000]:
+            clips = [synth_audio(args.seconds, sr, seed) for seed in range(args.clips)]
+            path = write_wav(os.path.join(tmp, f"clip_{sr}.wav"), args.seconds * 3, sr, seed=0)
+            ref_X = np.array([reference_features(ef.resample(y, sr, target, "soxr_hq"), target) for y in clips])
+            for res in RESAMPLERS:
+                X = np.array([ef.extract_librosa_features_from_array(ef.resample(y, sr, target, res), target)
+                              for y in clips])
+                report["resamplers"][f"{res}/{sr}"] = {
+                    # streamed ingest: decoded window -> model rate
+                    "resample": bench(lambda: ef.resample(clips[0], sr, target, res), args.repeat),
+                    # copy fallback: librosa.load of the middle window
+                    "load_window": bench(lambda: ef.load_audio(path, target, args.seconds, args.seconds, res),
+                                         args.repeat),
+                    "drift": drift(X, ref_X, registry),
+                }
+
+        y = synth_audio(args.seconds, target, 0)
+        clips = [synth_audio(args.seconds, target, seed) for seed in range(args.clips)]
+        report["kernels"] = {
+            "reference": bench(lambda: reference_features(y, target), args.repeat),
+            "cached": bench(lambda: ef.extract_librosa_features_from_array(y, target), args.repeat),
+            "filterbanks_uncached": bench(lambda: (librosa.filters.mel(sr=target, n_fft=ef.N_FFT),
+                                                   librosa.filters.chroma(sr=target, n_fft=ef.N_FFT)),
+                                          args.repeat),
+            "drift": drift(np.array([ef.extract_librosa_features_from_array(c, target) for c in clips]),
+                           np.array([reference_features(c, target) for c in clips]), registry),
+        }
+
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# Shared helpers for the benchmark suites: timing stats, peak RSS, synthetic
+# audio and synthetic models (so everything runs offline on a fresh clone).
+import os
+import sys
+import time
+import resource
+import numpy as np
+
+def summarize(samples, wall=None):
+    # samples: per-call seconds; wall: elapsed seconds for the whole run
+    # (concurrent runs), defaults to the sum of samples
+    s = np.asarray(samples, dtype=np.float64) * 1000
+    wall = float(np.sum(samples)) if wall is None else wall
+    return {
+        "n": len(samples),
+        "p50_ms": round(float(np.percentile(s, 50)), 4),
+        "p95_ms": round(float(np.percentile(s, 95)), 4),
+        "p99_ms": round(float(np.percentile(s, 99)), 4),
+        "mean_ms": round(float(s.mean()), 4),
+        "throughput_per_s": round(len(samples) / wall, 2) if wall else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def bench(fn, repeat, warmup=1):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t)
+    return summarize(samples)
+
+def peak_rss_mb():
+    # this process plus finished children (pool workers); ru_maxrss is KB on
+    # Linux and bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    kids = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    return round(max(own, kids) / 2 ** 20, 1)
+
+# ------------------------
+# Synthetic audio
+# ------------------------
+def synth_audio(seconds: float, sr: int, seed: int = 0):
+    # a few drifting partials, a pulse and some noise: enough spectral and
+    # rhythmic content for every feature to do real work
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sr)) / sr
+    y = np.zeros_like(t)
+    for f in rng.uniform(110, 880, 4):
+        y += np.sin(2 * np.pi * f * t * (1 + 0.01 * np.sin(2 * np.pi * 0.2 * t)))
+    y *= 0.5 + 0.5 * (np.sin(2 * np.pi * rng.uniform(1, 3) * t) > 0.8)
+    y += 0.05 * rng.standard_normal(len(t))
+    return (0.2 * y / np.abs(y).max()).astype(np.float32)
+
+def write_wav(path: str, seconds: float, sr: int, seed: int = 0):
+    import soundfile as sf
+    sf.write(path, synth_audio(seconds, sr, seed), sr)
+    return path
+
+# ------------------------
+# Synthetic models
+# ------------------------
+SYNTH_MODEL_DIR = os.path.join(os.environ.get("TMPDIR", "/tmp"), "moodcast_bench_models")
+
+def ensure_models(model_dir: str, trees: int = 100):
+    # use real models when present; otherwise fit small random forests on
+    # random 68-dim features into a scratch dir and return that instead
+    names = ["valence_model.pkl", "arousal_model.pkl", "scaler.pkl"]
+    if all(os.path.exists(os.path.join(model_dir, n)) for n in names):
+        return model_dir
+    if all(os.path.exists(os.path.join(SYNTH_MODEL_DIR, n)) for n in names):
+        return SYNTH_MODEL_DIR
+
+    import joblib
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.preprocessing import StandardScaler
+
+    os.makedirs(SYNTH_MODEL_DIR, exist_ok=True)
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((1000, 68))
+    scaler = StandardScaler().fit(X)
+    for i, name in enumerate(["valence_model.pkl", "arousal_model.pkl"]):
+        y = 5 + 2 * np.tanh(X[:, i] + 0.5 * X[:, i + 2])
+        model = RandomForestRegressor(n_estimators=trees, random_state=i, n_jobs=-1).fit(scaler.transform(X), y)
+        joblib.dump(model, os.path.join(SYNTH_MODEL_DIR, name))
+    joblib.dump(scaler, os.path.join(SYNTH_MODEL_DIR, "scaler.pkl"))
+    print(f"synthetic models written to {SYNTH_MODEL_DIR}", file=sys.stderr)
+    return SYNTH_MODEL_DIR
@@ -0,0 +1,53 @@
+# Compare two benchmark runs and flag regressions.
+#
+#   python -m benchmarks.compare old.json new.json [--threshold 0.1] [--metric p50_ms] [--fail]
+import sys
+import json
+import argparse
+
+def flatten(report):
+    return {f"{suite}/{name}": stats
+            for suite, benches in report["results"].items()
+            for name, stats in benches.items() if isinstance(stats, dict)}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("old")
+    ap.add_argument("new")
+    ap.add_argument("--threshold", type=float, default=0.10, help="relative slowdown that counts as a regression")
+    ap.add_argument("--metric", default="p50_ms")
+    ap.add_argument("--min-ms", type=float, default=0.05, help="ignore absolute changes below this")
+    ap.add_argument("--fail", action="store_true", help="exit 1 when anything regressed")
+    args = ap.parse_args()
+
+    with open(args.old) as f:
+        old = flatten(json.load(f))
+    with open(args.new) as f:
+        new = flatten(json.load(f))
+
+    regressions = 0
+    width = max([len(k) for k in old.keys() | new.keys()] + [10])
+    print(f"{'benchmark':<{width}}  {'old':>10}  {'new':>10}  {'change':>8}  rss_mb")
+    for name in sorted(old.keys() | new.keys()):
+        if name not in old or name not in new:
+            print(f"{name:<{width}}  {'only in ' + ('new' if name in new else 'old'):>32}")
+            continue
+        a, b = old[name].get(args.metric), new[name].get(args.metric)
+        if a is None or b is None:
+            continue
+        change = (b - a) / a if a else 0.0
+        flag = ""
+        if change > args.threshold and b - a > args.min_ms:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif change < -args.threshold and a - b > args.min_ms:
+            flag = "  faster"
+        rss = f"{old[name].get('peak_rss_mb')} -> {new[name].get('peak_rss_mb')}"
+        print(f"{name:<{width}}  {a:>10.3f}  {b:>10.3f}  {change:>+7.1%}  {rss}{flag}")
+
+    print(f"\n{regressions} regression(s) over {args.threshold:.0%} on {args.metric}")
+    if args.fail and regressions:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# sklearn vs flattened forest predictor: single-row latency, batch latency and
+# max output difference on random scaled rows.
+#
+#   python -m benchmarks.forest_predictor [--rows 200] [--batch 64]
+import argparse
+import json
+import time
+import numpy as np
+
+from backend.utils.forest_predictor import FlatForest
+from backend.utils.model_registry import ModelRegistry
+
+def timeit(fn, repeat):
+    fn()
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t)
+    return {"p50_ms": round(float(np.percentile(samples, 50)) * 1000, 3),
+            "p95_ms": round(float(np.percentile(samples, 95)) * 1000, 3)}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model-dir", default="models")
+    ap.add_argument("--rows", type=int, default=200)
+    ap.add_argument("--batch", type=int, default=64)
+    args = ap.parse_args()
+
+    reg = ModelRegistry(model_dir=args.model_dir, predictor="sklearn")
+    val, ar = reg.get("valence"), reg.get("arousal")
+
+    t = time.perf_counter()
+    flat = FlatForest.from_forests([val, ar])
+    build_s = time.perf_counter() - t
+
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((args.rows, reg.get("scaler").n_features_in_))
+
+    ref = np.column_stack([val.predict(X), ar.predict(X)])
+    diff = float(np.abs(flat.predict(X) - ref).max())
+
+    row = X[:1]
+    batch = X[:args.batch]
+    report = {
+        "trees": flat.forest_sizes,
+        "max_depth": flat.max_depth,
+        "flat_bytes": flat.nbytes,
+        "flat_build_s": round(build_s, 3),
+        "max_abs_diff": diff,
+        "single_row": {
+            "sklearn": timeit(lambda: (val.predict(row), ar.predict(row)), args.rows),
+            "flat": timeit(lambda: flat.predict(row), args.rows),
+        },
+        f"batch_{args.batch}": {
+            "sklearn": timeit(lambda: (val.predict(batch), ar.predict(batch)), 20),
+            "flat": timeit(lambda: flat.predict(batch), 20),
+        },
+    }
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
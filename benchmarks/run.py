@@ -0,0 +1,246 @@
+# Benchmark suite for the inference and recommendation hot paths. Fully
+# offline: synthetic audio, synthetic (or recorded) Spotify payloads, a local
+# stub Spotify server, and synthetic models when models/ has none.
+#
+#   python -m benchmarks.run [--suite audio|recommend|routes] [--quick]
+#                            [--fixtures spotify.jsonl] [--out results.json]
+#   python -m benchmarks.compare old.json new.json
+#
+# Each suite runs in its own interpreter so peak RSS is per suite.
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+from benchmarks.common import bench, summarize, write_wav, ensure_models
+from benchmarks.spotify_fixtures import load_fixtures, synth_search_response, synth_audio_features
+
+SUITES = ["audio", "recommend", "routes"]
+
+# ------------------------
+# audio: features, full inference, mood mapping
+# ------------------------
+def suite_audio(args, tmp):
+    from training.extract_features import extract_librosa_features
+    from backend.utils.inference import run_inference, map_mood
+
+    lengths = [5, 30] if args.quick else [5, 30, 120]
+    rates = [22050, 44100]
+    out = {}
+    for seconds in lengths:
+        for sr in rates:
+            path = write_wav(os.path.join(tmp, f"clip_{seconds}s_{sr}.wav"), seconds, sr, seed=seconds)
+            out[f"extract_features/{seconds}s@{sr}"] = bench(lambda: extract_librosa_features(path), args.repeat)
+            out[f"run_inference/{seconds}s@{sr}"] = bench(lambda: run_inference(path), args.repeat)
+
+    rng = np.random.default_rng(0)
+    pairs = rng.uniform(1, 9, (10000, 2))
+    samples = []
+    for v, a in pairs:
+        t = time.perf_counter()
+        map_mood(v, a)
+        samples.append(time.perf_counter() - t)
+    out["map_mood"] = summarize(samples)
+    return out
+
+# ------------------------
+# recommend: query building and scoring on fixture payloads
+# ------------------------
+SCENARIOS = [
+    {"mood": "happy", "language": "en"},
+    {"mood": "sad", "language": "hi", "genres": ["acoustic", "indie"]},
+    {"mood": "energetic", "language": "ta", "artist_names": ["anirudh"], "keywords": ["workout", "party"]},
+]
+
+def suite_recommend(args, tmp):
+    from backend.routes.spotify_recommend_v3_routes import (
+        build_queries, score_and_sort, pick_scorer, SearchReq,
+    )
+    fixtures = load_fixtures(args.fixtures) if args.fixtures else {}
+
+    def payload(q):
+        resp = fixtures.get((" ".join(q.lower().split()), "track")) or synth_search_response(q, "track", 25)
+        return resp["tracks"]["items"]
+
+    out = {}
+    for sc in SCENARIOS:
+        req = SearchReq(**sc)
+        name = "/".join([req.mood, req.language] + req.genres[:1] + req.keywords[:1])
+        args_q = (req.mood, req.language, req.genres, req.artist_names, req.track_names, req.keywords)
+        out[f"build_queries/{name}"] = bench(lambda: build_queries(*args_q), args.repeat * 20)
+
+        all_tracks = {}
+        for q in build_queries(*args_q):
+            for t in payload(q):
+                all_tracks[t["id"]] = t
+        out[f"score_and_sort/text/{name}"] = bench(
+            lambda: score_and_sort(all_tracks, req.mood, req.language, req.genres, req.keywords, limit=30),
+            args.repeat * 20)
+
+    # scaling of the scorers with candidate pool size
+    for n in ([250, 2000] if args.quick else [250, 2000, 10000]):
+        pool = {}
+        for i in range(n // 25):
+            for t in payload(f"pool query {i}"):
+                pool[t["id"]] = t
+        features = {tid: synth_audio_features(tid) for tid in pool}
+        req = SearchReq(mood="chill", language="en", valence=6, arousal=3, scoring="smart")
+        out[f"score_and_sort/text/{n}"] = bench(
+            lambda: score_and_sort(pool, "chill", "en", [], [], limit=30), args.repeat * 4)
+        out[f"score_and_sort/smart/{n}"] = bench(
+            lambda: score_and_sort(pool, "chill", "en", [], [], limit=30, scorer=pick_scorer(req), features=features),
+            args.repeat * 4)
+    return out
+
+# ------------------------
+# routes: FastAPI end to end against the local stub Spotify server
+# ------------------------
+def suite_routes(args, tmp):
+    from fastapi.testclient import TestClient
+    from backend.app import app
+
+    clips = [write_wav(os.path.join(tmp, f"upload_{i}.wav"), 30, 44100, seed=100 + i)
+             for i in range(args.repeat)]
+
+    def timed_calls(calls):
+        samples = []
+        start = time.perf_counter()
+        for call in calls:
+            t = time.perf_counter()
+            r = call()
+            samples.append(time.perf_counter() - t)
+            if r.status_code != 200:
+                raise RuntimeError(f"{r.request.url} -> {r.status_code} {r.text[:200]}")
+        return summarize(samples, time.perf_counter() - start)
+
+    def upload(client, path):
+        with open(path, "rb") as f:
+            return client.post("/predict_audio", files={"file": (os.path.basename(path), f, "audio/wav")})
+
+    out = {}
+    with TestClient(app) as client:
+        deadline = time.time() + 120
+        while client.get("/ready").status_code != 200:
+            if time.time() > deadline:
+                raise RuntimeError("inference pool never became ready")
+            time.sleep(0.1)
+
+        # unique uploads (full pipeline), then the same upload again (result cache)
+        out["predict_audio/cold"] = timed_calls([lambda p=p: upload(client, p) for p in clips])
+        out["predict_audio/cached"] = timed_calls([lambda: upload(client, clips[0])] * args.repeat * 4)
+
+        # distinct keywords defeat the search cache, repeats hit it
+        n = args.repeat * 2
+        out["search_by_mood/cold"] = timed_calls([
+            lambda i=i: client.post("/recommend_v3/search_by_mood",
+                                    json={"mood": "happy", "language": "en", "keywords": [f"kw{i}"]})
+            for i in range(n)])
+        out["search_by_mood/cached"] = timed_calls([
+            lambda: client.post("/recommend_v3/search_by_mood",
+                                json={"mood": "happy", "language": "en", "keywords": ["kw0"]})] * n)
+        out["search_tracks/cold"] = timed_calls([
+            lambda i=i: client.get("/search/tracks", params={"query": f"song {i}"}) for i in range(n)])
+        out["search_tracks/cached"] = timed_calls([
+            lambda: client.get("/search/tracks", params={"query": "song 0"})] * n)
+    return out
+
+# ------------------------
+# Driver
+# ------------------------
+def configure_env(model_dir: str, tmp: str, stub_url: str = None):
+    # must run before any backend module is imported: they read env at import
+    os.environ["MOODCAST_MODEL_DIR"] = model_dir
+    os.environ["MOODCAST_INFERENCE_WORKERS"] = os.environ.get("MOODCAST_INFERENCE_WORKERS", "2")
+    os.environ["TRACK_INDEX_PATH"] = os.path.join(tmp, "track_index.sqlite")
+    for prefix in ["SEARCH_CACHE", "RESULT_CACHE", "AUDIO_FEATURES_CACHE"]:
+        os.environ[f"{prefix}_BACKEND"] = "memory"
+    if stub_url:
+        os.environ["SPOTIFY_API_BASE"] = f"{stub_url}/v1"
+        os.environ["SPOTIFY_ACCOUNTS_BASE"] = stub_url
+        os.environ["SPOTIFY_CLIENT_ID"] = "bench"
+        os.environ["SPOTIFY_CLIENT_SECRET"] = "bench"
+        os.environ["SPOTIFY_USER_TOKEN_PATH"] = os.path.join(tmp, "user_token.json")
+
+def run_suite(args):
+    with tempfile.TemporaryDirectory(prefix="moodcast_bench_") as tmp:
+        model_dir = ensure_models(args.model_dir)
+        stub = None
+        if args.suite == "routes":
+            from benchmarks.stub_spotify import start_stub
+            stub, url = start_stub(load_fixtures(args.fixtures) if args.fixtures else {}, args.stub_latency)
+            configure_env(model_dir, tmp, url)
+        else:
+            configure_env(model_dir, tmp)
+        try:
+            return {"audio": suite_audio, "recommend": suite_recommend, "routes": suite_routes}[args.suite](args, tmp)
+        finally:
+            if stub is not None:
+                stub.shutdown()
+
+def versions():
+    out = {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()}
+    for mod in ["numpy", "scipy", "librosa", "sklearn", "soundfile", "fastapi"]:
+        try:
+            out[mod] = __import__(mod).__version__
+        except Exception:
+            out[mod] = None
+    try:
+        out["git"] = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                    text=True, check=True).stdout.strip()
+    except Exception:
+        out["git"] = None
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--suite", choices=SUITES, action="append",
+                    help="run only these suites (repeatable); default all")
+    ap.add_argument("--quick", action="store_true", help="fewer lengths/pool sizes and repeats")
+    ap.add_argument("--repeat", type=int, default=None)
+    ap.add_argument("--model-dir", default="models")
+    ap.add_argument("--fixtures", default=None, help="recorded Spotify search payloads (JSONL)")
+    ap.add_argument("--stub-latency", type=float, default=0.02, help="seconds per stub Spotify call")
+    ap.add_argument("--out", default=None)
+    ap.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.repeat is None:
+        args.repeat = 3 if args.quick else 10
+
+    if args.worker:
+        # child: exactly one suite, JSON on stdout
+        args.suite = args.suite[0]
+        json.dump(run_suite(args), sys.stdout)
+        return
+
+    report = {"meta": dict(versions(), started=time.strftime("%Y-%m-%dT%H:%M:%S"),
+                           quick=args.quick, repeat=args.repeat, stub_latency=args.stub_latency),
+              "results": {}}
+    for suite in args.suite or SUITES:
+        cmd = [sys.executable, "-m", "benchmarks.run", "--worker", "--suite", suite,
+               "--repeat", str(args.repeat), "--model-dir", args.model_dir,
+               "--stub-latency", str(args.stub_latency)]
+        if args.quick:
+            cmd.append("--quick")
+        if args.fixtures:
+            cmd += ["--fixtures", args.fixtures]
+        print(f"running {suite} ...", file=sys.stderr)
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, text=True)
+        if proc.returncode != 0:
+            report["results"][suite] = {"error": f"exit code {proc.returncode}"}
+            continue
+        report["results"][suite] = json.loads(proc.stdout)
+
+    out = args.out or os.path.join("benchmarks", "results", f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report["results"], indent=2))
+    print(f"saved {out}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# Spotify search payloads for the recommend benchmarks. Fixture files are
+# JSONL, one recorded (or synthetic) response per line:
+#
+#   {"query": "happy songs", "type": "track", "limit": 25, "response": {...}}
+#
+#   python -m benchmarks.spotify_fixtures out.jsonl "happy songs" "sad mix" ...
+import sys
+import json
+import hashlib
+
+MARKETS = ["US", "GB", "IN", "DE", "BR", "JP", "KR", "ES"]
+
+def synth_track(query: str, i: int):
+    h = hashlib.sha1(f"{query}|{i}".encode()).hexdigest()
+    words = query.split() or ["track"]
+    return {
+        "id": h[:22],
+        "name": f"{words[i % len(words)]} {h[22:28]}",
+        "popularity": int(h[:2], 16) % 101,
+        "artists": [{"id": h[2:24], "name": f"artist {h[28:32]}"}],
+        "album": {"name": f"album {h[32:36]}", "images": [{"url": f"https://i.scdn.co/image/{h}"}]},
+        "preview_url": None,
+        "available_markets": [m for j, m in enumerate(MARKETS) if int(h[j], 16) % 2 == 0],
+    }
+
+def synth_search_response(query: str, type: str = "track", limit: int = 25):
+    if type == "artist":
+        items = [{"id": t["artists"][0]["id"], "name": t["artists"][0]["name"], "images": []}
+                 for t in (synth_track(query, i) for i in range(limit))]
+    else:
+        items = [synth_track(query, i) for i in range(limit)]
+    return {f"{type}s": {"items": items}}
+
+def synth_audio_features(track_id: str):
+    h = hashlib.sha1(track_id.encode()).digest()
+    return {"id": track_id, "valence": h[0] / 255, "energy": h[1] / 255, "danceability": h[2] / 255}
+
+def load_fixtures(path: str):
+    # -> {(normalized query, type): response}
+    out = {}
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                rec = json.loads(line)
+                key = (" ".join(rec["query"].lower().split()), rec.get("type", "track"))
+                out[key] = rec["response"]
+    return out
+
+def write_fixtures(path: str, queries, type: str = "track", limit: int = 25):
+    with open(path, "w") as f:
+        for q in queries:
+            f.write(json.dumps({"query": q, "type": type, "limit": limit,
+                                "response": synth_search_response(q, type, limit)}) + "\n")
+
+if __name__ == "__main__":
+    write_fixtures(sys.argv[1], sys.argv[2:])
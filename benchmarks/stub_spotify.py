@@ -0,0 +1,60 @@
+# Local stand-in for the Spotify Web API and accounts service, so route
+# benchmarks never leave the machine. Serves fixture responses when it has
+# them and synthetic ones otherwise, with a fixed per-request latency.
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from benchmarks.spotify_fixtures import synth_search_response, synth_audio_features
+
+def make_handler(fixtures: dict, latency: float, counts: dict):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, obj, code=200):
+            body = json.dumps(obj).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            counts["token"] = counts.get("token", 0) + 1
+            self._send({"access_token": "bench", "token_type": "Bearer", "expires_in": 3600})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            qs = parse_qs(url.query)
+            counts[url.path] = counts.get(url.path, 0) + 1
+            time.sleep(latency)
+            if url.path == "/v1/search":
+                q = qs.get("q", [""])[0]
+                type = qs.get("type", ["track"])[0]
+                limit = int(qs.get("limit", ["25"])[0])
+                resp = fixtures.get((" ".join(q.lower().split()), type))
+                return self._send(resp or synth_search_response(q, type, limit))
+            if url.path == "/v1/audio-features":
+                ids = qs.get("ids", [""])[0].split(",")
+                return self._send({"audio_features": [synth_audio_features(i) for i in ids]})
+            if url.path == "/v1/recommendations/available-genre-seeds":
+                return self._send({"genres": ["pop", "rock", "jazz", "classical"]})
+            self._send({"error": "not found"}, 404)
+
+    return Handler
+
+def start_stub(fixtures=None, latency: float = 0.02, port: int = 0):
+    # -> (server, base_url); the server runs on a daemon thread, call
+    # server.shutdown() when done. server.counts holds per-path request counts
+    counts = {}
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(fixtures or {}, latency, counts))
+    server.daemon_threads = True
+    server.counts = counts
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
@@ -0,0 +1,10 @@
+import os
+import tempfile
+
+# module-level stores (track index, query stats, sqlite caches, the user
+# token file) are opened at import time, so point them at a scratch dir first
+_tmp = tempfile.mkdtemp(prefix="moodcast_tests_")
+for name in ["TRACK_INDEX_PATH", "QUERY_STATS_PATH", "SEARCH_CACHE_PATH",
+             "AUDIO_FEATURES_CACHE_PATH", "RESULT_CACHE_PATH"]:
+    os.environ[name] = os.path.join(_tmp, name.lower() + ".sqlite")
+os.environ["SPOTIFY_USER_TOKEN_PATH"] = os.path.join(_tmp, "user_token.json")
@@ -0,0 +1,76 @@
+import asyncio
+import json
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from backend.utils.audio_ingest import UploadSizeLimitMiddleware
+
+
+def make_app(limit=100):
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        return {"bytes": len(await request.body())}
+
+    app.add_middleware(UploadSizeLimitMiddleware, limits={"/upload": limit})
+    return app
+
+
+def call(app, headers, body=b"", path="/upload"):
+    # raw ASGI call so the Content-Length header goes through exactly as given
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": path, "headers": headers,
+             "query_string": b"", "root_path": "", "scheme": "http", "http_version": "1.1",
+             "server": ("test", 80), "client": ("test", 1)}
+    asyncio.run(app(scope, receive, send))
+    start = next(m for m in sent if m["type"] == "http.response.start")
+    body = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    return start["status"], json.loads(body), dict(start["headers"])
+
+
+def test_malformed_content_length_is_a_400():
+    app = make_app()
+    for value in [b"abc", b"-5", b"", b"1e3"]:
+        status, body, _ = call(app, [(b"content-length", value)])
+        assert status == 400, value
+        assert "Content-Length" in body["detail"]
+
+
+def test_declared_size_over_the_cap_is_a_413():
+    assert call(make_app(), [(b"content-length", b"101")])[0] == 413
+
+
+def test_within_cap_passes_through():
+    status, body, _ = call(make_app(), [(b"content-length", b"5")], b"hello")
+    assert (status, body) == (200, {"bytes": 5})
+
+
+def test_chunked_upload_is_cut_off_at_the_cap():
+    client = TestClient(make_app(limit=10))
+
+    def chunks():
+        for _ in range(5):
+            yield b"x" * 4
+
+    assert client.post("/upload", content=chunks()).status_code == 413
+
+
+def test_rejections_carry_cors_headers():
+    # the frontend is cross-origin: without CORS headers a 413 is an opaque failure
+    from backend.app import app
+    from backend.utils.audio_ingest import MAX_UPLOAD_BYTES
+
+    origin = [(b"origin", b"http://localhost:3000")]
+    for length in [str(2 * MAX_UPLOAD_BYTES).encode(), b"abc"]:
+        status, _, headers = call(app, origin + [(b"content-length", length)], path="/predict_audio")
+        assert status in (413, 400)
+        assert headers[b"access-control-allow-origin"]
@@ -0,0 +1,64 @@
+import json
+import os
+import sys
+
+import pytest
+
+from training import bulk_score
+
+
+def fake_score_batch(paths):
+    # a file named crash* takes its worker down; fail* raises per file
+    rows = []
+    for p in paths:
+        name = os.path.basename(p)
+        if name.startswith("crash") and not os.environ.get("BULK_TEST_FIXED"):
+            os._exit(1)
+        if name.startswith("fail") and not os.environ.get("BULK_TEST_FIXED"):
+            rows.append({"path": p, "error": "unreadable"})
+        else:
+            rows.append({"path": p, "valence": 5.0, "arousal": 5.0, "mood": "neutral"})
+    return rows
+
+
+@pytest.fixture
+def run(monkeypatch, tmp_path):
+    # workers are forked from this process, so the patched module globals
+    # are what they run
+    monkeypatch.setattr(bulk_score, "score_batch", fake_score_batch)
+    monkeypatch.setattr(bulk_score, "_init_worker", lambda *a: None)
+    for name in ["a", "b", "crash", "c", "fail", "d"]:
+        (tmp_path / f"{name}.wav").write_bytes(b"")
+
+    def run(out, *extra):
+        monkeypatch.setattr(sys, "argv", ["bulk_score", str(tmp_path), "--out", str(out),
+                                          "--workers", "2", "--batch", "3", *extra])
+        bulk_score.main()
+        rows = bulk_score.read_rows(str(out), "csv" if str(out).endswith(".csv") else "jsonl")
+        return {r["path"]: r for r in rows}, rows
+
+    return run
+
+
+@pytest.mark.parametrize("ext", ["jsonl", "csv"])
+def test_crashing_worker_only_fails_its_file(run, tmp_path, ext, monkeypatch):
+    by_path, rows = run(tmp_path / f"out.{ext}")
+    assert len(rows) == len(by_path) == 6
+    errors = {os.path.basename(p): r["error"] for p, r in by_path.items() if r.get("error")}
+    assert set(errors) == {"crash.wav", "fail.wav"}
+    assert errors["crash.wav"].startswith("worker failed")
+
+    # --retry-errors rescoring replaces the error rows instead of adding to them
+    monkeypatch.setenv("BULK_TEST_FIXED", "1")
+    by_path, rows = run(tmp_path / f"out.{ext}", "--retry-errors")
+    assert len(rows) == len(by_path) == 6
+    assert not any(r.get("error") for r in rows)
+
+
+def test_resume_skips_scored_paths_and_repairs_a_torn_line(run, tmp_path):
+    out = tmp_path / "out.jsonl"
+    done = str(tmp_path / "a.wav")
+    out.write_text(json.dumps({"path": done, "valence": 1.0}) + "\n" + '{"path": "half')
+    by_path, rows = run(out)
+    assert by_path[done]["valence"] == 1.0
+    assert len(rows) == 6
@@ -0,0 +1,119 @@
+import pytest
+
+from backend.utils import cache as cache_mod
+from backend.utils.cache import Cache, MemoryBackend, SqliteBackend
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(cache_mod.time, "time", c.time)
+    return c
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_backend(request, tmp_path):
+    def make(**caps):
+        if request.param == "memory":
+            return MemoryBackend(**caps)
+        return SqliteBackend(str(tmp_path / "cache.sqlite"), **caps)
+    return make
+
+
+def test_ttl_expiry(make_backend, clock):
+    cache = Cache(make_backend(), ttl=10)
+    cache.set("a", {"v": 1})
+    cache.set("b", {"v": 2}, ttl=100)
+    clock.now += 11
+    assert cache.get("a") is None
+    assert cache.get("b") == {"v": 2}
+    assert cache.stats()["entries"] == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_lru_eviction_by_entries(make_backend, clock):
+    backend = make_backend(max_entries=10)
+    cache = Cache(backend, ttl=100)
+    for i in range(10):
+        clock.now += 1
+        cache.set(f"k{i}", i)
+    clock.now += 1
+    assert cache.get("k0") == 0          # k0 is now the most recently used
+    clock.now += 1
+    cache.set("k10", 10)
+    assert cache.get("k1") is None       # least recently used goes first
+    assert cache.get("k0") == 0 and cache.get("k10") == 10
+    assert cache.stats()["entries"] <= 10
+    assert backend.evictions >= 1
+
+
+def test_byte_cap(make_backend, clock):
+    cache = Cache(make_backend(max_bytes=100), ttl=100)
+    for i in range(10):
+        clock.now += 1
+        cache.set(f"k{i}", "x" * 28)     # 30 bytes as JSON
+    assert cache.stats()["bytes"] <= 100
+    assert cache.get("k9") is not None and cache.get("k0") is None
+    cache.set("huge", "x" * 200)         # larger than the whole cache: not stored
+    assert cache.get("huge") is None
+
+
+def test_batched_get_and_set(make_backend, clock):
+    cache = Cache(make_backend(), ttl=100)
+    cache.set_many({"a": 1, "b": {}, "c": [1, 2]})
+    assert cache.get_many(["a", "b", "c", "missing", "a"]) == {"a": 1, "b": {}, "c": [1, 2]}
+    assert (cache.hits, cache.misses) == (3, 1)
+    cache.set_many({"a": 2})
+    assert cache.get("a") == 2
+    assert cache.stats()["entries"] == 3
+
+
+def test_sqlite_counters_match_table(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite")
+    backend = SqliteBackend(path, max_entries=50)
+    cache = Cache(backend, ttl=10)
+    for i in range(120):
+        clock.now += 0.1
+        cache.set(f"k{i % 70}", "x" * (i % 7))
+    clock.now += 5
+    cache.get_many([f"k{i}" for i in range(70)])
+    size = cache.stats()
+    backend._recount()
+    assert (size["entries"], size["bytes"]) == (backend._count, backend._bytes)
+    assert size["entries"] <= 50
+
+    # a reopened store picks its totals up from the file
+    assert SqliteBackend(path, max_entries=50).size()["entries"] == size["entries"]
+
+
+def test_async_access_keeps_blocking_backends_off_the_loop(make_backend):
+    import asyncio
+    import threading
+
+    backend = make_backend()
+    cache = Cache(backend, ttl=60)
+    threads = []
+    real_get = backend.get
+
+    def get(key):
+        threads.append(threading.get_ident())
+        return real_get(key)
+
+    backend.get = get
+
+    async def run():
+        await cache.aset("k", [1, 2])
+        await cache.aset_many({"a": 1})
+        return await cache.aget("k"), await cache.aget_many(["a", "b"])
+
+    assert asyncio.run(run()) == ([1, 2], {"a": 1})
+    # the memory LRU runs inline, sqlite (like redis) in the threadpool
+    assert (threads[0] == threading.get_ident()) == isinstance(backend, MemoryBackend)
@@ -0,0 +1,72 @@
+import librosa
+import numpy as np
+import pytest
+
+from training import extract_features as ef
+from training.extract_features import extract_librosa_features_from_array, windowed_features
+
+SR = 22050
+
+
+def reference_features(y, sr):
+    # the original per-family librosa calls the shipped scaler and regressors
+    # were trained on (each one runs its own STFT and builds its own kernels)
+    mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=20)
+    chroma = librosa.feature.chroma_stft(y=y, sr=sr)
+    centroid = librosa.feature.spectral_centroid(y=y, sr=sr)
+    zcr = librosa.feature.zero_crossing_rate(y)
+
+    def stats(arr):
+        return np.hstack([arr.mean(axis=1), arr.std(axis=1)])
+
+    return np.hstack([stats(mfcc), stats(chroma), stats(centroid), stats(zcr)])
+
+
+def melody(seconds, seed, detune=0.0):
+    # decaying harmonic notes on a (possibly detuned) tempered scale, plus noise
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(0.5 * SR)) / SR
+    notes = 440 * 2 ** ((rng.integers(-12, 12, size=int(seconds * 2)) + detune) / 12)
+    y = np.concatenate([sum(np.sin(2 * np.pi * f * h * t) / h for h in (1, 2, 3)) * np.exp(-3 * t)
+                        for f in notes])
+    return (0.3 * y + 0.02 * rng.standard_normal(len(y))).astype(np.float32)
+
+
+@pytest.mark.parametrize("seed,detune,seconds", [(0, 0.0, 10), (1, 0.3, 10), (2, -0.2, 3.3)])
+def test_matches_reference_librosa_calls(seed, detune, seconds):
+    y = melody(seconds, seed, detune)
+    expected = reference_features(y, SR)
+    # twice: the second call runs on the cached window/mel/chroma kernels
+    for _ in range(2):
+        np.testing.assert_array_equal(extract_librosa_features_from_array(y, SR), expected)
+    assert ef.chroma_basis.cache_info().hits >= 1
+
+
+@pytest.mark.filterwarnings("ignore:Trying to estimate tuning")
+def test_silence_and_short_clips_match_too():
+    for y in [np.zeros(SR, dtype=np.float32), melody(0.5, 3)[:4000]]:
+        np.testing.assert_array_equal(extract_librosa_features_from_array(y, SR), reference_features(y, SR))
+
+
+@pytest.mark.parametrize("orig_sr", [44100, 48000, 16000])
+def test_default_resampler_is_librosas(orig_sr):
+    y = melody(2, 4)
+    np.testing.assert_array_equal(ef.resample(y, orig_sr, SR), librosa.resample(y, orig_sr=orig_sr, target_sr=SR))
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_windowed_features_close_to_per_window_extraction(seed):
+    # not bit-identical by design (window edges see neighbouring samples,
+    # chroma shares one tuning estimate): every feature stays within 10% of
+    # its largest magnitude over the windows, and the median relative
+    # difference under 1% (measured: about 5% and 0.4%)
+    y = melody(30, seed)
+    window = 10
+    starts = [0, 2.5, 5, 7.5, 10, 12.5, 15, 17.5, 20]
+    X = windowed_features(y, SR, starts, window)
+    R = np.array([extract_librosa_features_from_array(y[int(s * SR):int((s + window) * SR)], SR)
+                  for s in starts])
+    assert X.shape == R.shape == (len(starts), 68)
+    diff = np.abs(X - R)
+    assert (diff <= 0.10 * np.abs(R).max(axis=0)).all()
+    assert np.median(diff / (np.abs(R) + 1e-9)) < 0.01
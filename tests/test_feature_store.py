@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+import pytest
+
+TRAINING = os.path.join(os.path.dirname(__file__), "..", "training")
+
+
+@pytest.fixture
+def train(monkeypatch):
+    # the training scripts import their siblings as top-level modules
+    monkeypatch.syspath_prepend(TRAINING)
+    import train_librosa_model
+    return train_librosa_model
+
+
+def fake_extract(path):
+    return np.full(3, float(os.path.getsize(path)))
+
+
+def audio_files(tmp_path, n):
+    items = []
+    for i in range(n):
+        path = tmp_path / f"{i}.wav"
+        path.write_bytes(b"x" * (i + 1))
+        items.append((str(i), str(path)))
+    return items
+
+
+def test_interrupted_extraction_keeps_what_was_done(train, tmp_path, monkeypatch):
+    from feature_store import FeatureStore
+
+    items = audio_files(tmp_path, 5)
+    store_path = str(tmp_path / "store.npz")
+    monkeypatch.setattr(train, "extract_librosa_features", fake_extract)
+    monkeypatch.setattr(train, "STORE_SAVE_EVERY", 2)
+
+    def interrupted(futures, **kwargs):
+        # Ctrl-C after three files came back
+        for i, fut in enumerate(futures):
+            if i == 3:
+                raise KeyboardInterrupt
+            yield fut
+
+    monkeypatch.setattr(train, "tqdm", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        train.extract_all(items, FeatureStore(store_path), workers=2)
+    assert len(FeatureStore(store_path)) == 3
+
+
+def test_save_drops_stale_entries(tmp_path, train):
+    from feature_store import FeatureStore
+
+    items = audio_files(tmp_path, 3)
+    store_path = str(tmp_path / "store.npz")
+    store = FeatureStore(store_path)
+    for _, path in items:
+        store.put(path, fake_extract(path))
+    store.save()
+
+    # one file changes (new key), one disappears
+    (tmp_path / "0.wav").write_bytes(b"changed")
+    os.remove(tmp_path / "1.wav")
+    store = FeatureStore(store_path)
+    assert len(store) == 3
+    store.put(items[0][1], fake_extract(items[0][1]))
+    store.save()
+
+    store = FeatureStore(store_path)
+    assert len(store) == 2
+    assert store.get(items[0][1])[0] == len(b"changed")
+    assert store.get(items[2][1]) is not None
@@ -0,0 +1,76 @@
+import os
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor, ExtraTreesRegressor
+
+from backend.utils.forest_predictor import FlatForest
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(300, 12))
+    y = np.column_stack([X[:, 0] * 2 + X[:, 1], np.sin(X[:, 2]) + X[:, 3] ** 2])
+    return X, y
+
+
+def test_pair_matches_sklearn(data):
+    X, y = data
+    valence = RandomForestRegressor(n_estimators=15, max_depth=8, random_state=0).fit(X, y[:, 0])
+    arousal = RandomForestRegressor(n_estimators=9, random_state=1).fit(X, y[:, 1])
+    flat = FlatForest.from_forests([valence, arousal])
+
+    out = flat.predict(X[:50])
+    np.testing.assert_allclose(out[:, 0], valence.predict(X[:50]), rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(out[:, 1], arousal.predict(X[:50]), rtol=1e-12, atol=1e-12)
+
+
+def test_multi_output_matches_sklearn(data):
+    X, y = data
+    joint = ExtraTreesRegressor(n_estimators=10, random_state=0).fit(X, y)
+    out = FlatForest.from_forests([joint]).predict(X[:50])
+    np.testing.assert_allclose(out, joint.predict(X[:50]), rtol=1e-12, atol=1e-12)
+
+
+def test_save_load_roundtrip_and_version_check(data, tmp_path):
+    X, y = data
+    forest = RandomForestRegressor(n_estimators=5, random_state=0).fit(X, y[:, 0])
+    flat = FlatForest.from_forests([forest])
+    cache = str(tmp_path / "forest_flat")
+    flat.save(cache, "v1")
+
+    loaded = FlatForest.load(cache, "v1")
+    np.testing.assert_array_equal(loaded.predict(X), flat.predict(X))
+    assert FlatForest.load(cache, "v2") is None
+    assert FlatForest.load(str(tmp_path / "missing"), "v1") is None
+
+
+def test_resave_swaps_atomically(data, tmp_path):
+    X, y = data
+    cache = str(tmp_path / "forest_flat")
+    a = FlatForest.from_forests([RandomForestRegressor(n_estimators=5, random_state=0).fit(X, y[:, 0])])
+    b = FlatForest.from_forests([RandomForestRegressor(n_estimators=7, random_state=1).fit(X, y[:, 1])])
+
+    a.save(cache, "v1")
+    mapped = FlatForest.load(cache, "v1")        # another worker serving from the mmap
+    expected = mapped.predict(X)
+    b.save(cache, "v2")
+
+    # the old mapping still reads the old arrays; new loads get the new set
+    np.testing.assert_array_equal(mapped.predict(X), expected)
+    np.testing.assert_array_equal(FlatForest.load(cache, "v2").predict(X), b.predict(X))
+    assert FlatForest.load(cache, "v1") is None
+    # only the live save is kept next to the link
+    assert len([p for p in os.listdir(tmp_path) if p.startswith("forest_flat-")]) == 1
+
+
+def test_replaces_plain_directory_cache(data, tmp_path):
+    X, y = data
+    cache = tmp_path / "forest_flat"
+    cache.mkdir()
+    (cache / "meta.json").write_text('{"version": "old"}')
+    flat = FlatForest.from_forests([RandomForestRegressor(n_estimators=3, random_state=0).fit(X, y[:, 0])])
+    flat.save(str(cache), "v1")
+    assert os.path.islink(cache)
+    np.testing.assert_array_equal(FlatForest.load(str(cache), "v1").predict(X), flat.predict(X))
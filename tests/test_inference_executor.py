@@ -0,0 +1,100 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from backend.utils import inference_executor as ie
+from backend.utils.inference_executor import InferenceExecutor, Overloaded, WorkerCrashed
+
+
+def square(x):
+    return x * x
+
+
+def sleepy_square(x):
+    time.sleep(0.2)
+    return x * x
+
+
+def always_crash(_):
+    os._exit(1)
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    monkeypatch.setattr(ie, "INFERENCE_START_METHOD", "fork")
+    # no models here; skip the per-worker warmup
+    monkeypatch.setattr(ie, "_worker_init", None)
+    e = InferenceExecutor(workers=2, max_pending=4)
+    yield e
+    e.shutdown()
+
+
+def test_dead_worker_fails_its_job_and_the_pool_is_replaced(executor):
+    async def run():
+        assert await executor.call(square, 3) == 9
+        # not replayed: a job that kills its worker would take the new pool down too
+        with pytest.raises(WorkerCrashed):
+            await executor.call(always_crash, None)
+        # the replacement pool keeps serving
+        return await executor.map(square, [1, 2, 3])
+
+    assert asyncio.run(run()) == [1, 4, 9]
+    assert executor.stats()["restarts"] == 1
+    assert executor.failed == 1
+    assert executor.pending == 0
+
+
+def test_jobs_on_the_broken_pool_all_fail_once(executor):
+    async def run():
+        crash = asyncio.ensure_future(executor.call(always_crash, None))
+        others = await executor.map(sleepy_square, [2, 3])
+        with pytest.raises(WorkerCrashed):
+            await crash
+        return others, await executor.call(square, 4)
+
+    others, after = asyncio.run(run())
+    assert all(isinstance(o, (WorkerCrashed, int)) for o in others)
+    assert after == 16
+    assert executor.stats()["restarts"] == 1
+
+
+def test_admission_control(executor):
+    async def run():
+        executor.pending = 4
+        with pytest.raises(Overloaded):
+            await executor.call(square, 2)
+        executor.pending = 0
+        # an idle executor takes an oversized batch anyway
+        return await executor.map(square, list(range(6)))
+
+    assert asyncio.run(run()) == [x * x for x in range(6)]
+    assert executor.rejected == 1
+
+
+def fake_warmup():
+    return {"version": f"v{os.getpid()}"}
+
+
+def test_model_version_is_re_read_after_a_restart(executor, monkeypatch, tmp_path):
+    monkeypatch.setattr(ie, "warmup_worker", fake_warmup)
+
+    async def run():
+        assert executor.model_version is None
+        await executor.warmup()
+        first = executor.model_version
+        assert first and executor.ready
+        with pytest.raises(Exception):
+            await executor.call(always_crash, None)
+        # cleared with the old pool, then reported by the new workers
+        assert executor.model_version is None
+        for _ in range(100):
+            if executor.model_version:
+                break
+            await asyncio.sleep(0.05)
+        return first, executor.model_version
+
+    first, again = asyncio.run(run())
+    assert again and again != first
+    assert executor.pending == 0
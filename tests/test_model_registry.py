@@ -0,0 +1,58 @@
+import os
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import StandardScaler
+
+from backend.utils import model_registry
+from backend.utils.model_registry import ModelRegistry
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    rng = np.random.default_rng(0)
+    X, y = rng.normal(size=(80, 68)), rng.uniform(1, 9, size=(80, 2))
+    scaler = StandardScaler().fit(X)
+    Xs = scaler.transform(X)
+    joblib.dump(scaler, tmp_path / "scaler.pkl")
+    joblib.dump(RandomForestRegressor(n_estimators=4, random_state=0).fit(Xs, y[:, 0]), tmp_path / "valence_model.pkl")
+    joblib.dump(RandomForestRegressor(n_estimators=4, random_state=0).fit(Xs, y[:, 1]), tmp_path / "arousal_model.pkl")
+    return tmp_path, X, y
+
+
+def test_no_filesystem_probe_per_predict(model_dir, monkeypatch):
+    path, X, _ = model_dir
+    registry = ModelRegistry(str(path)).load()
+    calls = []
+    real_exists = os.path.exists
+    monkeypatch.setattr(model_registry.os.path, "exists", lambda p: calls.append(p) or real_exists(p))
+    for _ in range(5):
+        registry.predict(X[:2])
+    assert calls == []
+
+
+@pytest.mark.parametrize("predictor", ["sklearn", "flat"])
+def test_joint_model_is_preferred_when_present(model_dir, predictor):
+    path, X, y = model_dir
+    joint = RandomForestRegressor(n_estimators=4, random_state=1).fit(
+        joblib.load(path / "scaler.pkl").transform(X), y)
+    joblib.dump(joint, path / "mood_model.pkl")
+
+    registry = ModelRegistry(str(path), predictor=predictor)
+    assert registry.model_names() == ["scaler", "joint"]
+    vals, aros = registry.predict(X[:5])
+    expected = joint.predict(registry.get("scaler").transform(X[:5]))
+    np.testing.assert_allclose(np.column_stack([vals, aros]), expected, rtol=1e-12)
+
+
+def test_version_is_pinned_to_the_loaded_models(model_dir):
+    path, X, y = model_dir
+    registry = ModelRegistry(str(path)).load()
+    loaded = registry.version
+    # a deploy replaces a file under a running process
+    joblib.dump(RandomForestRegressor(n_estimators=2, random_state=3).fit(X, y[:, 0]), path / "valence_model.pkl")
+    assert registry.disk_version() != loaded
+    assert registry.version == loaded
+    assert ModelRegistry(str(path)).version == registry.disk_version()
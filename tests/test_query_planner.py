@@ -0,0 +1,87 @@
+import sqlite3
+
+from backend.utils import query_planner as qp
+from backend.utils.query_planner import QueryPlanner
+from backend.routes.spotify_recommend_v3_routes import stats_bucket, build_tagged_queries
+
+TAGGED = [("mood_songs", "sad songs"), ("mood_mix", "sad mix"), ("keyword_lang", "lofi tamil"),
+          ("top_hits", "top hits")]
+
+
+def items(prefix, n):
+    return [{"id": f"{prefix}{i}"} for i in range(n)]
+
+
+def test_cold_start_puts_user_intent_first_and_keeps_builder_order(tmp_path):
+    planner = QueryPlanner(str(tmp_path / "stats.sqlite"))
+    assert [t for t, _ in planner.plan(TAGGED, "sad", "ta")] == \
+        ["keyword_lang", "mood_songs", "mood_mix", "top_hits"]
+
+
+def test_record_reorders_by_yield(tmp_path):
+    planner = QueryPlanner(str(tmp_path / "stats.sqlite"), explore=0.1)
+    for _ in range(20):
+        top = [t["id"] for t in items("mix", 25)]
+        planner.record("sad", "ta", [("mood_songs", items("songs", 25)), ("mood_mix", items("mix", 25)),
+                                     ("keyword_lang", items("kw", 25)), ("top_hits", items("top", 25))], top)
+    order = [t for t, _ in planner.plan(TAGGED, "sad", "ta")]
+    assert order[0] == "mood_mix"
+    # other buckets are unaffected
+    assert [t for t, _ in planner.plan(TAGGED, "happy", "ta")][0] == "keyword_lang"
+
+    stats = {r["template"]: r for r in planner.inspect("sad", "ta")["stats"]}
+    assert stats["mood_mix"]["issued"] == 20 and stats["mood_mix"]["yield"] == 25.0
+    assert stats["top_hits"]["hits"] == 0
+
+
+def test_exploration_retries_pruned_templates(tmp_path):
+    planner = QueryPlanner(str(tmp_path / "stats.sqlite"), explore=50)
+    planner.record("sad", "ta", [("mood_mix", items("mix", 25))] * 30, [t["id"] for t in items("mix", 25)])
+    # a big bonus for never-issued templates outweighs the proven one
+    assert planner.plan(TAGGED, "sad", "ta")[-1][0] == "mood_mix"
+
+
+def test_stats_persist_and_old_rows_expire(tmp_path, monkeypatch):
+    path = str(tmp_path / "stats.sqlite")
+    QueryPlanner(path).record("sad", "ta", [("mood_mix", items("m", 3))], ["m0"])
+    assert QueryPlanner(path)._stats[("mood_mix", "sad", "ta")] == [1, 3, 1]
+
+    db = sqlite3.connect(path)
+    db.execute("UPDATE query_stats SET updated_at = 0")
+    db.commit()
+    assert QueryPlanner(path)._stats == {}
+
+
+def test_buckets_bound_the_key_space():
+    assert stats_bucket("  Sad songs!! ", "TA") == ("sad", "ta")
+    assert stats_bucket("calm and sad", "ta") == stats_bucket("sad calm", "ta") == ("calm sad", "ta")
+    assert stats_bucket("asdkjh qwe", "klingon") == ("other", "other")
+    assert stats_bucket("", None) == ("none", "none")
+
+
+def test_every_builder_template_has_a_prior():
+    tagged = build_tagged_queries("sad", "ta", ["pop"], ["a"], ["t"], ["lofi"])
+    for template, _ in tagged:
+        assert template in qp.INTENT_TEMPLATES or not template.startswith(("artist", "track", "genre", "keyword"))
+
+
+def test_upstream_errors_are_not_reported_as_empty_results(monkeypatch):
+    # the planner is fed search_many's output: a failed query must be absent,
+    # not an issued query that yielded nothing
+    import asyncio
+    import httpx
+    from backend.utils import spotify_client as sc
+
+    async def api_get(path, token, params=None, priority=None):
+        q = params["q"]
+        if q == "planner broken":
+            raise httpx.ConnectError("down")
+        if q == "planner error":
+            return httpx.Response(500, text="oops")
+        return httpx.Response(200, json={"tracks": {"items": []}})
+
+    monkeypatch.setattr(sc, "api_get", api_get)
+    found = asyncio.run(sc.search_many("t", ["planner broken", "planner error", "planner empty"]))
+    assert found == {"planner empty": []}
+    # the single-query helper keeps returning [] for its callers
+    assert asyncio.run(sc.search("t", "planner error")) == []
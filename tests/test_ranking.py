@@ -0,0 +1,97 @@
+import random
+
+import numpy as np
+import pytest
+
+from backend.routes.spotify_recommend_v3_routes import LANGSEARCH, text_scorer, score_and_sort
+from backend.utils.mood_ranker import score_basic, score_smart, score_basic_batch, score_smart_batch
+from backend.utils.ranking import CandidateTable, rank
+
+
+def score_track(track, mood, language, genres, keywords):
+    # the per-track scorer text_scorer replaced, kept verbatim as the reference
+    name = (track.get("name") or "").lower()
+    artists = " ".join([a.get("name", "").lower() for a in track.get("artists", [])])
+    popularity = track.get("popularity", 0)
+    pop_score = popularity / 100.0
+
+    text_score = 0.0
+
+    if mood.lower() in name or mood.lower() in artists:
+        text_score += 0.35
+
+    lang_word = LANGSEARCH.get(language.lower(), "")
+    if lang_word and lang_word in name:
+        text_score += 0.20
+
+    for g in genres:
+        if g.lower() in name:
+            text_score += 0.15
+
+    for kw in keywords:
+        if kw.lower() in name or kw.lower() in artists:
+            text_score += 0.25
+
+    if text_score > 1:
+        text_score = 1
+
+    return 0.6 * text_score + 0.4 * pop_score
+
+
+WORDS = ["Sad", "happy", "Tamil", "lofi", "rock", "love", "night", "beat", "chill", "remix"]
+
+
+def pool(n, seed):
+    # few distinct popularities and names, so ties are everywhere
+    rng = random.Random(seed)
+    tracks = {}
+    for i in range(n):
+        tid = f"id{i}"
+        tracks[tid] = {
+            "id": tid,
+            "name": " ".join(rng.sample(WORDS, rng.randint(1, 3))),
+            "artists": [{"name": rng.choice(WORDS + ["Anirudh", "Sid"])} for _ in range(rng.randint(1, 2))],
+            "popularity": rng.choice([0, 10, 50, 50, 70, 100]),
+            "available_markets": rng.choice([["IN"], ["US"], ["IN", "US"], []]),
+            "album": {"images": [{"url": "x"}]},
+        }
+    return tracks
+
+
+def reference_sort(tracks, score):
+    scored = [(score(t), t) for t in tracks.values()]
+    scored.sort(key=lambda x: x[0], reverse=True)
+    return [(s, t["id"]) for s, t in scored]
+
+
+@pytest.mark.parametrize("n,seed", [(0, 0), (1, 1), (200, 2), (5000, 3)])
+@pytest.mark.parametrize("request_args", [
+    ("sad", "ta", [], []),
+    ("happy", "none", ["rock", "lofi"], ["remix", "sid"]),
+    ("", "en", [], ["love"]),
+])
+def test_text_scorer_matches_score_track(n, seed, request_args):
+    tracks = pool(n, seed)
+    expected = reference_sort(tracks, lambda t: score_track(t, *request_args))
+    for k in [None, 30]:
+        got = [(s, t["id"]) for s, t in rank(CandidateTable(tracks.values()), text_scorer(*request_args), k)]
+        # same scores bit for bit, same order including ties
+        assert got == expected[:k]
+    results = score_and_sort(tracks, *request_args, limit=30)
+    assert [(r["score"], r["id"]) for r in results] == [(round(s, 4), i) for s, i in expected[:30]]
+
+
+def test_batch_scorers_match_scalar_versions():
+    tracks = pool(500, 4)
+    rng = np.random.default_rng(4)
+    features = {tid: (None if rng.random() < 0.3 else
+                      {"valence": rng.random(), "energy": rng.random(), "danceability": rng.random()})
+                for tid in tracks}
+    table = CandidateTable(tracks.values(), features)
+    ts = list(tracks.values())
+
+    np.testing.assert_array_equal(
+        score_basic_batch(table, language="ta"), [score_basic(t, language="ta") for t in ts])
+    np.testing.assert_array_equal(
+        score_smart_batch(table, 0.3, 0.8),
+        [score_smart(features[t["id"]], 0.3, 0.8, t["popularity"]) for t in ts])
@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+import pytest
+
+from backend.utils import rate_limiter
+from backend.utils.rate_limiter import (
+    RateScheduler, Throttled, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND,
+)
+
+
+class Resp:
+    def __init__(self, status_code, retry_after=None):
+        self.status_code = status_code
+        self.headers = {"Retry-After": str(retry_after)} if retry_after is not None else {}
+
+
+def test_interactive_calls_jump_the_background_queue():
+    sched = RateScheduler("t", rate=50, burst=1)
+    order = []
+
+    async def call(name, priority):
+        await sched.acquire(priority)
+        order.append(name)
+
+    async def run():
+        await sched.acquire()                       # drain the bucket
+        tasks = [asyncio.create_task(call(f"bg{i}", PRIORITY_BACKGROUND)) for i in range(3)]
+        await asyncio.sleep(0)
+        tasks += [asyncio.create_task(call(f"ui{i}", PRIORITY_INTERACTIVE)) for i in range(2)]
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert order == ["ui0", "ui1", "bg0", "bg1", "bg2"]
+
+
+def test_token_bucket_paces_calls():
+    sched = RateScheduler("t", rate=100, burst=5)
+
+    async def run():
+        t = time.monotonic()
+        for _ in range(15):
+            await sched.acquire()
+        return time.monotonic() - t
+
+    # 5 from the burst, the other 10 at 100/s
+    assert 0.08 < asyncio.run(run()) < 0.5
+
+
+def test_long_pause_fails_fast_instead_of_hanging(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "MAX_RETRY_AFTER", 1)
+    sched = RateScheduler("t", rate=100, burst=10)
+    sent = []
+
+    async def send():
+        sent.append(1)
+        return Resp(429, retry_after=60)
+
+    async def run():
+        # the 429 itself comes back to the caller, no retry
+        assert (await sched.request(send)).status_code == 429
+        t = time.monotonic()
+        with pytest.raises(Throttled) as e:
+            await sched.request(send)
+        return time.monotonic() - t, e.value.retry_after
+
+    elapsed, retry_after = asyncio.run(run())
+    assert elapsed < 0.1
+    assert 59 < retry_after <= 60
+    assert len(sent) == 1
+    assert sched.stats()["rejected"] == 1
+
+
+def test_short_pause_is_waited_out_and_retried(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "MAX_RETRY_AFTER", 1)
+    sched = RateScheduler("t", rate=100, burst=10)
+    replies = [Resp(429, retry_after=0.2), Resp(200)]
+
+    async def send():
+        return replies.pop(0)
+
+    async def run():
+        t = time.monotonic()
+        resp = await sched.request(send)
+        return resp.status_code, time.monotonic() - t
+
+    status, elapsed = asyncio.run(run())
+    assert status == 200 and elapsed >= 0.19
+    assert sched.metrics["throttled"] == 1 and sched.metrics["retries"] == 1
+
+
+def test_background_calls_wait_out_a_pause():
+    sched = RateScheduler("t", rate=100, burst=10)
+    sched.pause(0.2)
+
+    async def run():
+        t = time.monotonic()
+        await sched.acquire(PRIORITY_BACKGROUND)
+        return time.monotonic() - t
+
+    assert asyncio.run(run()) >= 0.19
+
+
+def test_retries_transient_errors_then_gives_up(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "RETRY_BACKOFF", 0.001)
+    sched = RateScheduler("t", rate=1000, burst=10, max_retries=2)
+    calls = []
+
+    async def send():
+        calls.append(1)
+        return Resp(503)
+
+    assert asyncio.run(sched.request(send)).status_code == 503
+    assert len(calls) == 3 and sched.metrics["gave_up"] == 1
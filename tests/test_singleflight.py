@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from backend.utils.singleflight import SingleFlight
+
+
+class Upstream:
+    def __init__(self, fail=False):
+        self.calls = 0
+        self.fail = fail
+        self.release = None
+
+    async def __call__(self, key):
+        self.calls += 1
+        await self.release.wait()
+        if self.fail:
+            raise ValueError(f"boom {key}")
+        return {"key": key, "call": self.calls}
+
+
+def gather_with(flight, upstream, keys):
+    async def run():
+        upstream.release = asyncio.Event()
+        tasks = [asyncio.create_task(flight.do(k, upstream, k)) for k in keys]
+        await asyncio.sleep(0)
+        upstream.release.set()
+        return await asyncio.gather(*tasks, return_exceptions=True)
+    return asyncio.run(run())
+
+
+def test_identical_calls_share_one_upstream_call():
+    flight, upstream = SingleFlight("test-coalesce"), Upstream()
+    results = gather_with(flight, upstream, ["a"] * 5 + ["b"] * 2)
+    assert upstream.calls == 2
+    assert results[:5] == [{"key": "a", "call": 1}] * 5
+    assert results[5] is results[6]
+    assert flight.stats() == {"calls": 7, "coalesced": 5, "upstream": 2, "in_flight": 0}
+
+
+def test_errors_reach_every_waiter_and_are_not_kept():
+    flight, upstream = SingleFlight("test-errors"), Upstream(fail=True)
+    results = gather_with(flight, upstream, ["a"] * 3)
+    assert upstream.calls == 1
+    assert all(isinstance(r, ValueError) and str(r) == "boom a" for r in results)
+
+    # the failure isn't cached: the next call goes upstream again
+    upstream.fail = False
+    assert gather_with(flight, upstream, ["a"]) == [{"key": "a", "call": 2}]
+
+
+def test_one_caller_cancelling_does_not_cancel_the_shared_call():
+    flight, upstream = SingleFlight("test-cancel"), Upstream()
+
+    async def run():
+        upstream.release = asyncio.Event()
+        first = asyncio.create_task(flight.do("a", upstream, "a"))
+        second = asyncio.create_task(flight.do("a", upstream, "a"))
+        await asyncio.sleep(0)
+        first.cancel()
+        upstream.release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == {"key": "a", "call": 1}
+    assert upstream.calls == 1
+
+
+def test_recommend_key_only_merges_requests_with_the_same_response():
+    from backend.routes.spotify_recommend_v3_routes import SearchReq, request_key
+
+    def key(**kw):
+        return request_key(SearchReq(**kw))
+
+    assert key(mood="sad", language="TA") == key(mood="sad", language="ta")
+    # market is matched case-sensitively against the index
+    assert key(mood="sad", market="IN") != key(mood="sad", market="in")
+    # mood and keywords come back in mood_used / queries_used as sent
+    assert key(mood="Sad") != key(mood="sad")
+    assert key(keywords=["Lofi"]) != key(keywords=["lofi"])
+    assert key(scoring="Smart") != key(scoring="smart")
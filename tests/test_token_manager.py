@@ -0,0 +1,106 @@
+import asyncio
+import json
+import os
+import time
+
+import pytest
+
+from backend.utils import spotify_client
+from backend.utils.spotify_client import TokenManager
+
+
+class Resp:
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self._data = data or {}
+        self.text = json.dumps(self._data)
+
+    def json(self):
+        return self._data
+
+
+@pytest.fixture
+def accounts(monkeypatch, tmp_path):
+    # token endpoint stub: answers with whatever is queued, counts calls
+    monkeypatch.setattr(spotify_client, "USER_TOKEN_PATH", str(tmp_path / "user_token.json"))
+    calls = []
+    replies = []
+
+    async def token_post(data, headers=None):
+        calls.append(data["grant_type"])
+        return replies.pop(0) if replies else Resp(500)
+
+    monkeypatch.setattr(spotify_client, "token_post", token_post)
+    return calls, replies
+
+
+def write_token(path, **tok):
+    with open(path, "w") as f:
+        json.dump(dict({"obtained_at": time.time(), "expires_in": 3600}, **tok), f)
+
+
+def test_failed_client_refresh_backs_off(accounts):
+    calls, replies = accounts
+    tm = TokenManager()
+
+    async def run():
+        assert await tm.client_token() is None
+        assert await tm.client_token() is None       # inside the backoff: no POST
+        assert len(calls) == 1
+        assert tm._next_due() > time.time() or not tm.client["token"]
+
+        tm._retry_at["client"] = 0                   # backoff elapsed
+        replies.append(Resp(200, {"access_token": "c1", "expires_in": 3600}))
+        assert await tm.client_token() == "c1"
+        assert tm.failures["client"] == 0
+
+    asyncio.run(run())
+
+
+def test_backoff_grows_and_keeps_valid_token(accounts):
+    calls, _ = accounts
+    tm = TokenManager()
+    # still valid, but inside the proactive refresh window
+    tm.client = {"token": "old", "expires_at": time.time() + 100}
+
+    async def run():
+        for _ in range(3):
+            tm._retry_at["client"] = 0
+            assert await tm.client_token(ahead=300) == "old"
+        return tm._retry_at["client"] - time.time()
+
+    wait = asyncio.run(run())
+    assert len(calls) == 3
+    assert spotify_client.TOKEN_RETRY_BASE * 4 - 1 < wait <= spotify_client.TOKEN_RETRY_BASE * 4
+    # the loop's next wakeup honours the backoff rather than the (past) due time
+    assert tm._next_due() >= tm._retry_at["client"]
+
+
+def test_revoked_refresh_token_is_dropped(accounts):
+    calls, replies = accounts
+    write_token(spotify_client.USER_TOKEN_PATH, access_token="u1", refresh_token="r",
+                obtained_at=time.time() - 7200)
+    tm = TokenManager()
+    replies.append(Resp(400, {"error": "invalid_grant"}))
+
+    async def run():
+        assert await tm.user_token() is None
+        assert tm.user is None
+        assert await tm.user_token() is None         # not retried
+        assert calls == ["refresh_token"]
+
+    asyncio.run(run())
+
+
+def test_login_by_another_process_is_picked_up(accounts):
+    tm = TokenManager()
+    assert asyncio.run(tm.user_token()) is None
+
+    write_token(spotify_client.USER_TOKEN_PATH, access_token="u1", refresh_token="r")
+    assert asyncio.run(tm.user_token()) == "u1"
+
+    # another worker refreshed: newer file wins over the cached copy
+    write_token(spotify_client.USER_TOKEN_PATH, access_token="u2", refresh_token="r")
+    st = os.stat(spotify_client.USER_TOKEN_PATH)
+    os.utime(spotify_client.USER_TOKEN_PATH, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert asyncio.run(tm.user_token()) == "u2"
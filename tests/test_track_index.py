@@ -0,0 +1,99 @@
+import asyncio
+import numpy as np
+
+from backend.utils.track_index import TrackIndex
+from backend.routes import spotify_recommend_v3_routes as routes
+
+
+def make_track(tid, markets=("IN", "US")):
+    return {"id": tid, "name": f"song {tid}", "popularity": 50, "artists": [{"name": "a"}],
+            "album": {"images": [{"url": "x"}]}, "available_markets": list(markets)}
+
+
+def grid_index(path, n=12):
+    # n x n tracks spread evenly over valence/energy
+    index = TrackIndex(str(path))
+    tracks, features = [], {}
+    for i in range(n):
+        for j in range(n):
+            tid = f"t{i}_{j}"
+            tracks.append(make_track(tid))
+            features[tid] = {"valence": i / (n - 1), "energy": j / (n - 1), "danceability": 0.5}
+    index.add_tracks(tracks)
+    index.set_features(features)
+    return index
+
+
+def test_nearest_orders_by_distance(tmp_path):
+    index = grid_index(tmp_path / "index.sqlite", n=5)
+    out = index.nearest(0.0, 0.0, k=3)
+    assert out[0]["id"] == "t0_0"
+    assert {t["id"] for t in out[1:]} == {"t0_1", "t1_0"}
+    assert len(index.nearest(0.5, 0.5, k=100)) == 25
+
+
+def test_nearest_language_and_market_filters(tmp_path):
+    index = TrackIndex(str(tmp_path / "index.sqlite"))
+    index.add_tracks([make_track("ta1"), make_track("us1", markets=["US"])], language="ta")
+    index.add_tracks([make_track("hi1")], language="hi")
+    # a second sighting under another language adds a tag, keeps the first
+    index.add_tracks([make_track("ta1")], language="hi")
+    index.set_features({tid: {"valence": 0.5, "energy": 0.5} for tid in ["ta1", "us1", "hi1"]})
+
+    assert {t["id"] for t in index.nearest(0.5, 0.5, language="ta")} == {"ta1", "us1"}
+    assert {t["id"] for t in index.nearest(0.5, 0.5, language="hi")} == {"ta1", "hi1"}
+    assert {t["id"] for t in index.nearest(0.5, 0.5, language="ta", market="IN")} == {"ta1"}
+    assert index.nearest(0.5, 0.5, language="ko") == []
+
+
+def test_prediction_positions_unfeatured_tracks(tmp_path):
+    index = TrackIndex(str(tmp_path / "index.sqlite"))
+    index.add_tracks([{**make_track("p1"), "preview_url": "http://x/p1.mp3"}, make_track("p2")])
+    assert sorted(index.missing_features()) == ["p1", "p2"]
+    assert index.preview_urls(["p1", "p2"]) == {"p1": "http://x/p1.mp3"}
+
+    index.set_prediction("p1", 9.0, 1.0)
+    assert index.missing_features() == ["p2"]
+    assert [t["id"] for t in index.nearest(1.0, 0.0, k=1)] == ["p1"]
+
+
+def test_typed_moods_get_different_index_candidates(tmp_path, monkeypatch):
+    monkeypatch.setattr(routes, "track_index", grid_index(tmp_path / "index.sqlite"))
+
+    def recommend(mood):
+        # the frontend sends the neutral 5.0/5.0 with every typed mood
+        req = routes.SearchReq(mood=mood, valence=5.0, arousal=5.0)
+        return asyncio.run(routes.recommend(req))
+
+    sad, happy = recommend("sad"), recommend("happy energetic")
+    assert sad["index_candidates"] >= routes.TRACK_INDEX_MIN_CANDIDATES
+    assert sad["queries_used"] == [] and happy["queries_used"] == []
+
+    def mean_valence(out):
+        return np.mean([int(r["id"][1:].split("_")[0]) for r in out["results"]])
+
+    assert {r["id"] for r in sad["results"]} != {r["id"] for r in happy["results"]}
+    assert mean_valence(sad) < mean_valence(happy)
+
+
+def test_index_target():
+    req = routes.SearchReq
+    assert routes.index_target(req(mood="whatever")) is None
+    assert routes.index_target(req(mood="sad", valence=9.0, arousal=1.0)) == (1.0, 0.0)
+    sad, happy = routes.index_target(req(mood="Sad")), routes.index_target(req(mood="happy"))
+    assert sad[0] < 0.5 < happy[0]
+
+
+def test_metadata_upsert_keeps_the_mirror(tmp_path):
+    index = grid_index(tmp_path / "index.sqlite", n=3)
+    index.nearest(0.5, 0.5)
+    # a re-sighting under a new language/market patches tags in place; a new
+    # unpositioned track can't be a candidate, so neither forces a reload
+    index.add_tracks([make_track("t0_0", markets=["JP"]), make_track("new")], language="ja")
+    assert not index._dirty
+    assert [t["id"] for t in index.nearest(0.5, 0.5, language="ja", market="JP")] == ["t0_0"]
+    assert index.nearest(0.5, 0.5, market="JP", k=100)[0]["id"] == "t0_0"
+
+    index.set_features({"new": {"valence": 0.5, "energy": 0.5}})
+    assert index._dirty
+    assert index.nearest(0.5, 0.5, k=1)[0]["id"] in {"t1_1", "new"}
@@ -0,0 +1,267 @@
+# Score a directory tree or file list with the served models, in parallel,
+# resumably. Run from the repo root:
+#
+#   python -m training.bulk_score AUDIO_DIR [...] --out scores.jsonl
+#   python -m training.bulk_score --list files.txt --out scores.csv --workers 8
+#
+# The output file is the checkpoint: rerunning with the same --out skips
+# every path already in it.
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+AUDIO_EXTS = (".mp3", ".wav", ".flac", ".ogg", ".m4a", ".mp4")
+FIELDS = ["path", "valence", "arousal", "mood", "offset_seconds", "used_duration_seconds",
+          "model_version", "error"]
+
+# ------------------------
+# Worker side: models loaded once per process
+# ------------------------
+_registry = None
+_window = "middle"
+
+def _init_worker(model_dir, predictor, window):
+    global _registry, _window
+    from backend.utils.model_registry import ModelRegistry
+    _registry = ModelRegistry(model_dir=model_dir, predictor=predictor).load()
+    _window = window
+
+def score_batch(paths):
+    # one feature pass per file, one predict per batch
+    import numpy as np
+    from backend.utils.audio_window import load_middle_window
+    from backend.utils.inference import map_mood
+    from training.extract_features import extract_librosa_features_from_array, load_audio
+
+    rows, feats = [], []
+    for path in paths:
+        try:
+            if _window == "full":
+                y, sr = load_audio(path, sr=22050)
+                offset, duration = 0.0, len(y) / sr
+            else:
+                y, sr, offset, duration = load_middle_window(path)
+            feats.append(extract_librosa_features_from_array(y, sr))
+            rows.append({"path": path, "offset_seconds": round(offset, 2),
+                         "used_duration_seconds": round(duration, 2)})
+        except Exception as e:
+            rows.append({"path": path, "error": str(e) or type(e).__name__})
+
+    ok = [r for r in rows if "error" not in r]
+    if ok:
+        vals, aros = _registry.predict(np.vstack(feats))
+        for r, v, a in zip(ok, vals, aros):
+            r.update(valence=float(v), arousal=float(a), mood=map_mood(v, a))
+    version = _registry.version
+    for r in rows:
+        r["model_version"] = version
+    return rows
+
+# ------------------------
+# Input / checkpointed output
+# ------------------------
+def collect(inputs, list_file, exts):
+    paths = []
+    if list_file:
+        with open(list_file) as f:
+            paths += [line.strip() for line in f if line.strip()]
+    for p in inputs:
+        if os.path.isdir(p):
+            for root, dirs, files in os.walk(p):
+                dirs.sort()
+                paths += [os.path.join(root, f) for f in sorted(files) if f.lower().endswith(exts)]
+        else:
+            paths.append(p)
+    return list(dict.fromkeys(os.path.abspath(p) for p in paths))
+
+def repair_tail(path):
+    # an interrupted run can leave half a line at the end; cut back to the
+    # last complete one
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end != len(data):
+            f.truncate(end)
+
+def read_rows(path, fmt):
+    with open(path, newline="") as f:
+        if fmt == "csv":
+            return list(csv.DictReader(f))
+        return [json.loads(line) for line in f if line.strip()]
+
+def load_done(path, fmt, retry_errors):
+    # paths already scored. With retry_errors the file is first rewritten
+    # without its error rows, so the rescored rows replace them rather than
+    # sitting next to them (one row per path, last one wins)
+    if not os.path.exists(path):
+        return set()
+    repair_tail(path)
+    rows = {r["path"]: r for r in read_rows(path, fmt)}
+    if retry_errors:
+        kept = {p: r for p, r in rows.items() if not r.get("error")}
+        if len(kept) != len(rows):
+            rewrite(path, fmt, kept.values())
+        rows = kept
+    return set(rows)
+
+def rewrite(path, fmt, rows):
+    # write-then-rename so an interrupted rewrite leaves the old file intact
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".bulk_score.")
+    try:
+        with os.fdopen(fd, "w", newline="") as f:
+            if fmt == "csv":
+                w = csv.DictWriter(f, fieldnames=FIELDS, extrasaction="ignore")
+                w.writeheader()
+                w.writerows(rows)
+            else:
+                f.writelines(json.dumps(r) + "\n" for r in rows)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+class Writer:
+    def __init__(self, path, fmt, sync_every=50):
+        fresh = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.f = open(path, "a", newline="")
+        self.fmt = fmt
+        self.sync_every = sync_every
+        self.pending = 0
+        if fmt == "csv":
+            self.csv = csv.DictWriter(self.f, fieldnames=FIELDS, extrasaction="ignore")
+            if fresh:
+                self.csv.writeheader()
+
+    def write(self, row):
+        if self.fmt == "csv":
+            self.csv.writerow(row)
+        else:
+            self.f.write(json.dumps(row) + "\n")
+        self.pending += 1
+        if self.pending >= self.sync_every:
+            self.sync()
+
+    def sync(self):
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.pending = 0
+
+    def close(self):
+        self.sync()
+        self.f.close()
+
+# ------------------------
+# Driver
+# ------------------------
+def main():
+    ap = argparse.ArgumentParser(description="Bulk mood scoring with resumable output")
+    ap.add_argument("inputs", nargs="*", help="audio files and/or directories (recursed)")
+    ap.add_argument("--list", help="file with one audio path per line")
+    ap.add_argument("--out", required=True, help="results file (.jsonl or .csv)")
+    ap.add_argument("--format", choices=["jsonl", "csv"], default=None, help="default: from --out extension")
+    ap.add_argument("--workers", type=int, default=os.cpu_count())
+    ap.add_argument("--batch", type=int, default=16, help="files per worker task")
+    ap.add_argument("--model-dir", default=os.getenv("MOODCAST_MODEL_DIR", "models"))
+    ap.add_argument("--predictor", default=os.getenv("MOODCAST_PREDICTOR", "sklearn"), choices=["sklearn", "flat"])
+    ap.add_argument("--window", choices=["middle", "full"], default="middle",
+                    help="middle: the service's window (default); full: whole file, like predict_from_audio")
+    ap.add_argument("--exts", default=",".join(AUDIO_EXTS))
+    ap.add_argument("--retry-errors", action="store_true", help="rescore paths that failed last time")
+    args = ap.parse_args()
+
+    fmt = args.format or ("csv" if args.out.lower().endswith(".csv") else "jsonl")
+    paths = collect(args.inputs, args.list, tuple(e.strip().lower() for e in args.exts.split(",")))
+    done = load_done(args.out, fmt, args.retry_errors)
+    todo = [p for p in paths if p not in done]
+    print(f"{len(paths)} files, {len(paths) - len(todo)} already scored, {len(todo)} to go", file=sys.stderr)
+    if not todo:
+        return
+
+    batches = [todo[i:i + args.batch] for i in range(0, len(todo), args.batch)]
+    writer = Writer(args.out, fmt)
+    start = last_report = time.perf_counter()
+    scored = failed = 0
+
+    def new_pool():
+        return ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                   initargs=(args.model_dir, args.predictor, args.window))
+
+    pool = new_pool()
+    try:
+        # bounded submission so a 100k-file run doesn't queue every batch up front
+        queue = iter(batches)
+        # files of a failed batch, rescored one per task to isolate the culprit
+        singles = deque()
+        # singles that were on a pool when it broke alongside other tasks;
+        # each reruns with nothing else in flight so only the file that
+        # kills its worker is blamed
+        suspects = deque()
+        running = {}                    # future -> (batch, pool it ran on, running alone)
+        while True:
+            while len(running) < args.workers * 2 and not any(a for _, _, a in running.values()):
+                if suspects:
+                    if running:
+                        break
+                    batch, alone = [suspects.popleft()], True
+                else:
+                    batch, alone = [singles.popleft()] if singles else next(queue, None), False
+                if batch is None:
+                    break
+                try:
+                    fut = pool.submit(score_batch, batch)
+                except BrokenProcessPool:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = new_pool()
+                    fut = pool.submit(score_batch, batch)
+                running[fut] = (batch, pool, alone)
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                batch, ran_on, alone = running.pop(fut)
+                try:
+                    rows = fut.result()
+                except Exception as e:
+                    # a worker died (OOM, decoder crash) or the task raised
+                    broken = isinstance(e, BrokenProcessPool)
+                    if broken and ran_on is pool:
+                        print("worker pool broken, restarting", file=sys.stderr)
+                        pool.shutdown(wait=False, cancel_futures=True)
+                        pool = new_pool()
+                    if len(batch) > 1:
+                        singles.extend(batch)
+                        continue
+                    if broken and not alone:
+                        suspects.append(batch[0])
+                        continue
+                    rows = [{"path": batch[0], "error": f"worker failed: {str(e) or type(e).__name__}"}]
+                for row in rows:
+                    writer.write(row)
+                    scored += 1
+                    failed += "error" in row
+            now = time.perf_counter()
+            if now - last_report >= 5:
+                rate = scored / (now - start)
+                eta = (len(todo) - scored) / rate if rate else 0
+                print(f"{scored}/{len(todo)}  {rate:.1f} files/s  eta {eta:.0f}s", file=sys.stderr)
+                last_report = now
+    finally:
+        pool.shutdown(cancel_futures=True)
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"scored {scored} files ({failed} failed) in {elapsed:.1f}s: {scored / elapsed:.1f} files/s",
+          file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
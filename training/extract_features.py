@@ -1,13 +1,76 @@
+import os
+import functools
 import numpy as np
 import librosa
 
+# Frame parameters shared by every feature family (librosa defaults, which the
+# shipped scaler/regressors were trained with)
+N_FFT = 2048
+HOP_LENGTH = 512
+N_MFCC = 20
+
+# Resampler used wherever audio is brought to the model rate: librosa's
+# res_type (soxr_vhq, soxr_hq, soxr_mq, soxr_lq, polyphase, ...). soxr_hq is
+# librosa's default and what the shipped models were trained with.
+RESAMPLER = os.getenv("MOODCAST_RESAMPLER", "soxr_hq")
+
+# Bump whenever the 68-dim layout or its numerics change (cache keys use it);
+# a non-default resampler changes the numerics too
+FEATURE_VERSION = "librosa68-v1" + ("" if RESAMPLER == "soxr_hq" else f"+{RESAMPLER}")
+
+def resample(y, orig_sr, target_sr, res_type=None):
+    if orig_sr == target_sr:
+        return y
+    return librosa.resample(y, orig_sr=orig_sr, target_sr=target_sr, res_type=res_type or RESAMPLER)
+
+def load_audio(path, sr=22050, offset=0.0, duration=None, res_type=None):
+    # librosa.load with the configured resampler
+    return librosa.load(path, sr=sr, mono=True, offset=offset, duration=duration,
+                        res_type=res_type or RESAMPLER)
+
 def extract_librosa_features(path):
-    y, sr = librosa.load(path, sr=22050, mono=True)
+    y, sr = load_audio(path, sr=22050)
+    return extract_librosa_features_from_array(y, sr)
+
+# ------------------------
+# DSP kernels, built once per process per parameter set (librosa would
+# rebuild them on every call)
+# ------------------------
+@functools.lru_cache(maxsize=None)
+def stft_window():
+    return librosa.filters.get_window("hann", N_FFT, fftbins=True)
+
+@functools.lru_cache(maxsize=16)
+def mel_basis(sr):
+    return librosa.filters.mel(sr=sr, n_fft=N_FFT)
 
-    mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=20)
-    chroma = librosa.feature.chroma_stft(y=y, sr=sr)
-    centroid = librosa.feature.spectral_centroid(y=y, sr=sr)
-    zcr = librosa.feature.zero_crossing_rate(y)
+@functools.lru_cache(maxsize=256)
+def chroma_basis(sr, tuning):
+    # tuning comes from estimate_tuning at 0.01-bin resolution, so only a
+    # bounded set of keys ever occurs
+    return librosa.filters.chroma(sr=sr, n_fft=N_FFT, tuning=tuning, n_chroma=12)
+
+def feature_frames(y, sr):
+    # One STFT feeds mfcc, chroma and centroid; zcr is time-domain only.
+    # Returns per-frame matrices in the order the 68-dim vector is built.
+    # Same operations as librosa.feature.melspectrogram/chroma_stft, with
+    # the filterbanks taken from the caches above.
+    mag = np.abs(librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH, window=stft_window()))
+    power = mag ** 2
+
+    mel = np.einsum("...ft,mf->...mt", power, mel_basis(sr), optimize=True)
+    mfcc = librosa.feature.mfcc(S=librosa.power_to_db(mel), n_mfcc=N_MFCC)
+    tuning = float(librosa.estimate_tuning(S=power, sr=sr, bins_per_octave=12))
+    raw_chroma = np.einsum("cf,...ft->...ct", chroma_basis(sr, tuning), power, optimize=True)
+    chroma = librosa.util.normalize(raw_chroma, norm=np.inf, axis=-2)
+    centroid = librosa.feature.spectral_centroid(S=mag, sr=sr)
+    zcr = librosa.feature.zero_crossing_rate(y, frame_length=N_FFT, hop_length=HOP_LENGTH)
+
+    return mfcc, chroma, centroid, zcr
+
+def extract_librosa_features_from_array(y, sr):
+    # y: mono float waveform already decoded at sr (22050 for the shipped models)
+    mfcc, chroma, centroid, zcr = feature_frames(y, sr)
 
     def stats(arr):
         return np.hstack([arr.mean(axis=1), arr.std(axis=1)])
@@ -20,3 +83,30 @@ def extract_librosa_features(path):
     ])
 
     return features
+
+def windowed_features(y, sr, starts, window_seconds):
+    # 68-dim vectors for many (possibly overlapping) windows of one signal.
+    # Frames are computed once for the whole signal; each window's mean/std
+    # comes from prefix sums over the frames it covers, so overlap costs
+    # nothing. Window edges see neighbouring samples (no re-padding) and
+    # chroma uses one tuning estimate for the signal, so values are close to,
+    # not bit-identical with, extracting each window on its own.
+    #   starts: window start times in seconds -> X: (len(starts), 68)
+    families = feature_frames(y, sr)
+    n_total = families[0].shape[1]
+    width = 1 + int(window_seconds * sr) // HOP_LENGTH
+    first = np.clip(np.round(np.asarray(starts) * sr / HOP_LENGTH).astype(int), 0, n_total - 1)
+    last = np.minimum(first + width, n_total)
+    counts = (last - first)[:, None]
+
+    parts = []
+    for arr in families:
+        arr = arr.astype(np.float64)
+        zero = np.zeros((arr.shape[0], 1))
+        c1 = np.hstack([zero, np.cumsum(arr, axis=1)])
+        c2 = np.hstack([zero, np.cumsum(arr ** 2, axis=1)])
+        mean = (c1[:, last] - c1[:, first]).T / counts
+        var = (c2[:, last] - c2[:, first]).T / counts - mean ** 2
+        parts += [mean, np.sqrt(np.maximum(var, 0))]
+
+    return np.hstack(parts)
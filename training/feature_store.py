@@ -0,0 +1,50 @@
+import os
+import numpy as np
+
+from extract_features import FEATURE_VERSION
+
+# On-disk cache of extracted feature vectors, keyed by file path, size,
+# mtime and FEATURE_VERSION: a retrain only decodes files that are new,
+# changed, or were extracted by a different feature layout.
+class FeatureStore:
+    def __init__(self, path):
+        self.path = path
+        self.features = {}
+        if os.path.exists(path):
+            with np.load(path, allow_pickle=False) as data:
+                for key, vec in zip(data["keys"], data["features"]):
+                    self.features[str(key)] = vec
+
+    @staticmethod
+    def key(audio_path):
+        st = os.stat(audio_path)
+        return f"{os.path.abspath(audio_path)}|{st.st_size}|{st.st_mtime_ns}|{FEATURE_VERSION}"
+
+    def get(self, audio_path):
+        return self.features.get(self.key(audio_path))
+
+    def put(self, audio_path, vec):
+        self.features[self.key(audio_path)] = np.asarray(vec, dtype=np.float64)
+
+    def _current(self, key):
+        # the key still names the file as it is now, under this FEATURE_VERSION
+        path = key.rsplit("|", 3)[0]
+        try:
+            return self.key(path) == key
+        except OSError:
+            return False
+
+    def save(self):
+        # entries for files that changed, vanished or were extracted under
+        # another layout are dropped, so the store doesn't grow per retrain
+        self.features = {k: v for k, v in self.features.items() if self._current(k)}
+        if not self.features:
+            return
+        keys = sorted(self.features)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = self.path + ".tmp.npz"
+        np.savez(tmp, keys=np.array(keys), features=np.vstack([self.features[k] for k in keys]))
+        os.replace(tmp, self.path)
+
+    def __len__(self):
+        return len(self.features)
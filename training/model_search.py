@@ -0,0 +1,189 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import numpy as np
+import joblib
+from sklearn.model_selection import train_test_split
+from sklearn.ensemble import RandomForestRegressor, HistGradientBoostingRegressor
+from sklearn.preprocessing import StandardScaler
+from sklearn.metrics import mean_absolute_error
+from train_librosa_model import add_dataset_args, load_dataset
+
+# the flat predictor lives with the backend
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from backend.utils.forest_predictor import FlatForest, remove_saved
+
+# ------------------------
+# Candidates: name -> (kind, params). "pair" fits one model per target,
+# "joint" one multi-output model predicting [valence, arousal].
+# ------------------------
+CANDIDATES = {
+    "rf400_full": ("pair", RandomForestRegressor, dict(n_estimators=400)),  # what train_librosa_model ships
+    "rf100_d12": ("pair", RandomForestRegressor, dict(n_estimators=100, max_depth=12, min_samples_leaf=2)),
+    "rf50_d8": ("pair", RandomForestRegressor, dict(n_estimators=50, max_depth=8, min_samples_leaf=4)),
+    "joint_rf200_full": ("joint", RandomForestRegressor, dict(n_estimators=200)),
+    "joint_rf100_d12": ("joint", RandomForestRegressor, dict(n_estimators=100, max_depth=12, min_samples_leaf=2)),
+    "joint_rf50_d8": ("joint", RandomForestRegressor, dict(n_estimators=50, max_depth=8, min_samples_leaf=4)),
+    "hgb200": ("pair", HistGradientBoostingRegressor, dict(max_iter=200, learning_rate=0.05, max_leaf_nodes=15)),
+    "hgb100_d4": ("pair", HistGradientBoostingRegressor, dict(max_iter=100, learning_rate=0.1, max_depth=4)),
+}
+BASELINE = "rf400_full"
+
+def fit(kind, cls, params, Xt, Yt):
+    extra = {"random_state": 42}
+    if cls is RandomForestRegressor:
+        extra["n_jobs"] = -1
+    if kind == "joint":
+        models = {"joint": cls(**params, **extra).fit(Xt, Yt)}
+    else:
+        models = {"valence": cls(**params, **extra).fit(Xt, Yt[:, 0]),
+                  "arousal": cls(**params, **extra).fit(Xt, Yt[:, 1])}
+    for m in models.values():
+        # parallel fit, serial predict: thread fan-out dominates single-row
+        # latency and the service already runs one prediction per worker
+        if hasattr(m, "n_jobs"):
+            m.n_jobs = None
+    return models
+
+def predict(models, X):
+    if "joint" in models:
+        return models["joint"].predict(X)
+    return np.column_stack([models["valence"].predict(X), models["arousal"].predict(X)])
+
+def flat_for(models):
+    # same packing the registry uses for MOODCAST_PREDICTOR=flat; forests only
+    forests = [models[k] for k in ("joint", "valence", "arousal") if k in models]
+    if all(hasattr(m, "estimators_") and hasattr(m.estimators_[0], "tree_") for m in forests):
+        return FlatForest.from_forests(forests)
+    return None
+
+def single_row_ms(fn, rows, repeat):
+    fn(rows[:1])
+    samples = []
+    for i in range(repeat):
+        row = rows[i % len(rows)][None, :]
+        t = time.perf_counter()
+        fn(row)
+        samples.append(time.perf_counter() - t)
+    return round(float(np.percentile(samples, 50)) * 1000, 3)
+
+def artifact_bytes(models, tmp):
+    total = 0
+    for name, m in models.items():
+        path = os.path.join(tmp, f"{name}.pkl")
+        joblib.dump(m, path)
+        total += os.path.getsize(path)
+    return total
+
+def evaluate(name, models, Xv, Yv, tmp, repeat):
+    P = predict(models, Xv)
+    flat = flat_for(models)
+    row = {
+        "name": name,
+        "mae_valence": round(float(mean_absolute_error(Yv[:, 0], P[:, 0])), 4),
+        "mae_arousal": round(float(mean_absolute_error(Yv[:, 1], P[:, 1])), 4),
+        "latency_ms": single_row_ms(lambda r: predict(models, r), Xv, repeat),
+        "flat_latency_ms": single_row_ms(flat.predict, Xv, repeat) if flat is not None else None,
+        "artifact_bytes": artifact_bytes(models, tmp),
+    }
+    row["mae_mean"] = round((row["mae_valence"] + row["mae_arousal"]) / 2, 4)
+    # what the service would actually pay with the best predictor for it
+    row["best_latency_ms"] = min(v for v in (row["latency_ms"], row["flat_latency_ms"]) if v is not None)
+    return row
+
+def pick(rows, max_latency_ms, max_bytes, mae_tolerance):
+    # fastest candidate within the latency/size budget whose MAE stays within
+    # mae_tolerance (relative) of the baseline's
+    base = next(r for r in rows if r["name"] == BASELINE)
+    limit = base["mae_mean"] * (1 + mae_tolerance)
+    for r in rows:
+        r["within_budget"] = (
+            r["mae_mean"] <= limit
+            and (max_latency_ms is None or r["best_latency_ms"] <= max_latency_ms)
+            and (max_bytes is None or r["artifact_bytes"] <= max_bytes)
+        )
+    ok = [r for r in rows if r["within_budget"]]
+    return min(ok, key=lambda r: (r["best_latency_ms"], r["artifact_bytes"])) if ok else None
+
+def deploy(models, scaler, model_dir):
+    # joint: mood_model.pkl (the registry prefers it); pair: drop any joint
+    # model so the registry goes back to valence/arousal
+    os.makedirs(model_dir, exist_ok=True)
+    joblib.dump(scaler, os.path.join(model_dir, "scaler.pkl"))
+    joint_path = os.path.join(model_dir, "mood_model.pkl")
+    if "joint" in models:
+        joblib.dump(models["joint"], joint_path)
+    else:
+        if os.path.exists(joint_path):
+            os.remove(joint_path)
+        joblib.dump(models["valence"], os.path.join(model_dir, "valence_model.pkl"))
+        joblib.dump(models["arousal"], os.path.join(model_dir, "arousal_model.pkl"))
+    remove_saved(os.path.join(model_dir, "forest_flat"))
+
+def main():
+    ap = argparse.ArgumentParser(description="Sweep compact regressors under a latency/size budget")
+    add_dataset_args(ap)
+    ap.add_argument("--candidates", nargs="+", default=list(CANDIDATES), choices=list(CANDIDATES))
+    ap.add_argument("--max-latency-ms", type=float, default=None, help="single-row budget for both targets")
+    ap.add_argument("--max-bytes", type=int, default=None, help="artifact size budget")
+    ap.add_argument("--mae-tolerance", type=float, default=0.02,
+                    help="allowed relative MAE increase over %s" % BASELINE)
+    ap.add_argument("--repeat", type=int, default=200, help="single-row predictions timed per candidate")
+    ap.add_argument("--report", default="../models/model_search_report.json")
+    ap.add_argument("--deploy", default=None, metavar="MODEL_DIR", help="write the picked model there")
+    args = ap.parse_args()
+
+    names = list(dict.fromkeys([BASELINE] + args.candidates))
+    X, Y_val, Y_ar = load_dataset(args)
+    Y = np.column_stack([Y_val, Y_ar])
+
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    # same split train_librosa_model uses for both targets
+    Xt, Xv, Yt, Yv = train_test_split(X_scaled, Y, test_size=0.2, random_state=42)
+
+    rows, fitted = [], {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in names:
+            kind, cls, params = CANDIDATES[name]
+            print(f"\nFitting {name}...")
+            t = time.perf_counter()
+            fitted[name] = fit(kind, cls, params, Xt, Yt)
+            fit_s = time.perf_counter() - t
+            row = evaluate(name, fitted[name], Xv, Yv, tmp, args.repeat)
+            row["fit_seconds"] = round(fit_s, 2)
+            rows.append(row)
+
+    best = pick(rows, args.max_latency_ms, args.max_bytes, args.mae_tolerance)
+
+    print(f"\n{'candidate':<18} {'mae_v':>7} {'mae_a':>7} {'ms':>8} {'flat_ms':>8} {'MB':>7}  ok")
+    for r in rows:
+        flat = f"{r['flat_latency_ms']:.3f}" if r["flat_latency_ms"] is not None else "-"
+        print(f"{r['name']:<18} {r['mae_valence']:>7.4f} {r['mae_arousal']:>7.4f} {r['latency_ms']:>8.3f} "
+              f"{flat:>8} {r['artifact_bytes'] / 2 ** 20:>7.2f}  {'*' if r['within_budget'] else ''}")
+    print("\nPicked:", best["name"] if best else "nothing within budget")
+
+    report = {
+        "baseline": BASELINE,
+        "budget": {"max_latency_ms": args.max_latency_ms, "max_bytes": args.max_bytes,
+                   "mae_tolerance": args.mae_tolerance},
+        "samples": {"train": len(Xt), "validation": len(Xv)},
+        "candidates": rows,
+        "picked": best["name"] if best else None,
+    }
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+    print("Report saved to", args.report)
+
+    if args.deploy and best:
+        # the exact models that were measured against the budget (fit on the
+        # 80% split, like train_librosa_model's); a refit on all rows grows
+        # unbounded-depth trees past what was checked
+        deploy(fitted[best["name"]], scaler, args.deploy)
+        print("Deployed", best["name"], "to", args.deploy)
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 import os
+import argparse
 import numpy as np
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler
@@ -8,73 +10,129 @@ from sklearn.metrics import mean_absolute_error
 import joblib
 from tqdm import tqdm
 from extract_features import extract_librosa_features
+from feature_store import FeatureStore
 
 AUDIO_DIR = "../DEAM/DEAM_audio/MEMD_audio/"
 ANNOT1 = "../DEAM/DEAM_Annotations/annotations/annotations averaged per song/song_level/static_annotations_averaged_songs_1_2000.csv"
 ANNOT2 = "../DEAM/DEAM_Annotations/annotations/annotations averaged per song/song_level/static_annotations_averaged_songs_2000_2058.csv"
-
-print("\nLoading annotations...")
-df1 = pd.read_csv(ANNOT1)
-df2 = pd.read_csv(ANNOT2)
-
-df = pd.concat([df1, df2], ignore_index=True)
-df.columns = [c.strip() for c in df.columns]
-df["song_id"] = df["song_id"].astype(str)
-print("Annotation count:", len(df))
-
-X = []
-Y_val = []
-Y_ar = []
-ids = []
-
-print("\nExtracting librosa features from audio files...")
-for fname in tqdm(os.listdir(AUDIO_DIR)):
-    if not fname.lower().endswith((".mp3", ".wav", ".m4a", ".mp4")):
-        continue
-
-    song_id = os.path.splitext(fname)[0]
-
-    row = df[df["song_id"] == song_id]
-    if row.empty:
-        continue
-
-    path = os.path.join(AUDIO_DIR, fname)
-
-    try:
-        feat = extract_librosa_features(path)
-    except:
-        print("Error reading:", fname)
-        continue
-
-    X.append(feat)
-    Y_val.append(float(row["valence_mean"].iloc[0]))
-    Y_ar.append(float(row["arousal_mean"].iloc[0]))
-    ids.append(song_id)
-
-X = np.array(X)
-Y_val = np.array(Y_val)
-Y_ar = np.array(Y_ar)
-
-print("\nFinal dataset shape:", X.shape)
-
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
-
-joblib.dump(scaler, "../models/scaler.pkl")
-
-print("\nTraining valence model...")
-Xt, Xv, yt, yv = train_test_split(X_scaled, Y_val, test_size=0.2, random_state=42)
-model_val = RandomForestRegressor(n_estimators=400, n_jobs=-1, random_state=42)
-model_val.fit(Xt, yt)
-print("Valence MAE:", mean_absolute_error(yv, model_val.predict(Xv)))
-
-print("\nTraining arousal model...")
-Xt, Xv, yt, yv = train_test_split(X_scaled, Y_ar, test_size=0.2, random_state=42)
-model_ar = RandomForestRegressor(n_estimators=400, n_jobs=-1, random_state=42)
-model_ar.fit(Xt, yt)
-print("Arousal MAE:", mean_absolute_error(yv, model_ar.predict(Xv)))
-
-joblib.dump(model_val, "../models/valence_model.pkl")
-joblib.dump(model_ar, "../models/arousal_model.pkl")
-
-print("\nModels saved in /models folder.")
+FEATURE_STORE = "../DEAM/features_cache.npz"
+AUDIO_EXTS = (".mp3", ".wav", ".m4a", ".mp4")
+# newly extracted vectors between feature store checkpoints
+STORE_SAVE_EVERY = 100
+
+def load_annotations():
+    print("\nLoading annotations...")
+    df1 = pd.read_csv(ANNOT1)
+    df2 = pd.read_csv(ANNOT2)
+
+    df = pd.concat([df1, df2], ignore_index=True)
+    df.columns = [c.strip() for c in df.columns]
+    df["song_id"] = df["song_id"].astype(str)
+    print("Annotation count:", len(df))
+
+    # song_id -> (valence, arousal); first row wins, as the old per-file scan did
+    df = df.drop_duplicates("song_id")
+    return dict(zip(df["song_id"], zip(df["valence_mean"].astype(float), df["arousal_mean"].astype(float))))
+
+def list_audio(annotations):
+    out = []
+    for fname in sorted(os.listdir(AUDIO_DIR)):
+        if not fname.lower().endswith(AUDIO_EXTS):
+            continue
+        song_id = os.path.splitext(fname)[0]
+        if song_id in annotations:
+            out.append((song_id, os.path.join(AUDIO_DIR, fname)))
+    return out
+
+def extract_all(items, store, workers):
+    # cached vectors come straight from the store; the rest are decoded in a
+    # process pool and written back to it
+    feats = {}
+    todo = []
+    for song_id, path in items:
+        vec = store.get(path) if store is not None else None
+        if vec is None:
+            todo.append((song_id, path))
+        else:
+            feats[song_id] = vec
+    print(f"Cached: {len(feats)}  To extract: {len(todo)}")
+
+    if todo:
+        unsaved = 0
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(extract_librosa_features, path): (song_id, path) for song_id, path in todo}
+                for fut in tqdm(as_completed(futures), total=len(futures), unit="file"):
+                    song_id, path = futures[fut]
+                    try:
+                        vec = fut.result()
+                    except Exception:
+                        print("Error reading:", os.path.basename(path))
+                        continue
+                    feats[song_id] = vec
+                    if store is not None:
+                        store.put(path, vec)
+                        unsaved += 1
+                        if unsaved >= STORE_SAVE_EVERY:
+                            store.save()
+                            unsaved = 0
+        finally:
+            # also on Ctrl-C / a dead pool: whatever was extracted is kept
+            if store is not None and unsaved:
+                store.save()
+
+    return feats
+
+def add_dataset_args(ap):
+    ap.add_argument("--workers", type=int, default=os.cpu_count())
+    ap.add_argument("--feature-store", default=FEATURE_STORE)
+    ap.add_argument("--no-cache", action="store_true", help="re-extract everything, don't touch the store")
+
+def load_dataset(args):
+    # -> (X, Y_val, Y_ar) over every annotated, decodable DEAM clip
+    annotations = load_annotations()
+    items = list_audio(annotations)
+
+    print("\nExtracting librosa features from audio files...")
+    store = None if args.no_cache else FeatureStore(args.feature_store)
+    feats = extract_all(items, store, args.workers)
+
+    ids = [song_id for song_id, _ in items if song_id in feats]
+    X = np.array([feats[i] for i in ids])
+    Y_val = np.array([annotations[i][0] for i in ids])
+    Y_ar = np.array([annotations[i][1] for i in ids])
+
+    print("\nFinal dataset shape:", X.shape)
+    return X, Y_val, Y_ar
+
+def main():
+    ap = argparse.ArgumentParser()
+    add_dataset_args(ap)
+    args = ap.parse_args()
+
+    X, Y_val, Y_ar = load_dataset(args)
+
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+
+    joblib.dump(scaler, "../models/scaler.pkl")
+
+    print("\nTraining valence model...")
+    Xt, Xv, yt, yv = train_test_split(X_scaled, Y_val, test_size=0.2, random_state=42)
+    model_val = RandomForestRegressor(n_estimators=400, n_jobs=-1, random_state=42)
+    model_val.fit(Xt, yt)
+    print("Valence MAE:", mean_absolute_error(yv, model_val.predict(Xv)))
+
+    print("\nTraining arousal model...")
+    Xt, Xv, yt, yv = train_test_split(X_scaled, Y_ar, test_size=0.2, random_state=42)
+    model_ar = RandomForestRegressor(n_estimators=400, n_jobs=-1, random_state=42)
+    model_ar.fit(Xt, yt)
+    print("Arousal MAE:", mean_absolute_error(yv, model_ar.predict(Xv)))
+
+    joblib.dump(model_val, "../models/valence_model.pkl")
+    joblib.dump(model_ar, "../models/arousal_model.pkl")
+
+    print("\nModels saved in /models folder.")
+
+if __name__ == "__main__":
+    main()